@@ -0,0 +1,43 @@
+#include <zeta.h>
+
+/**
+ * @brief Dispatch latency of the values read on the callbacks, in cycles.
+ */
+atomic_t consumer_callbacks   = ATOMIC_INIT(0);
+atomic_t consumer_latency_sum = ATOMIC_INIT(0);
+atomic_t consumer_latency_max = ATOMIC_INIT(0);
+
+/**
+ * @brief This is the function used by Zeta to tell the CONSUMER that one(s) of
+ * the channels which it is subscribed has changed. This callback will be called
+ * passing the channel's id in it.
+ *
+ * @param id
+ */
+void CONSUMER_service_callback(zt_channel_e id)
+{
+    u32_t published = 0;
+    int rc          = (id == ZT_LOAD_CHANNEL) ? zt_read_LOAD(&published)
+                                              : zt_read_SEQ_LOAD(&published);
+    if (rc == 0) {
+        atomic_val_t latency = (atomic_val_t)(u32_t)(k_cycle_get_32() - published);
+        atomic_inc(&consumer_callbacks);
+        atomic_add(&consumer_latency_sum, latency);
+        if (latency > atomic_get(&consumer_latency_max)) {
+            atomic_set(&consumer_latency_max, latency);
+        }
+    }
+}
+
+/**
+ * @brief This is the task loop responsible to run the CONSUMER thread
+ * functionality. All the work is done on the callback.
+ */
+void CONSUMER_task()
+{
+    while (1) {
+        k_sleep(K_FOREVER);
+    }
+}
+
+ZT_SERVICE_INIT(CONSUMER, CONSUMER_task, CONSUMER_service_callback);
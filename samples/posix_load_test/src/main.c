@@ -0,0 +1,28 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <zeta.h>
+
+extern atomic_t producer_published;
+extern atomic_t producer_dropped;
+extern atomic_t producer_failed;
+extern atomic_t consumer_callbacks;
+extern atomic_t consumer_latency_sum;
+extern atomic_t consumer_latency_max;
+
+int main(int argc, char **argv)
+{
+    int seconds = (argc > 1) ? atoi(argv[1]) : 5;
+    zt_posix_start();
+    k_sleep(K_SECONDS(seconds));
+
+    long published = atomic_get(&producer_published);
+    long callbacks = atomic_get(&consumer_callbacks);
+    printf("[LOAD]: %d s, %ld publishes (%ld/s), %ld dropped, %ld failed\n", seconds,
+           published, published / seconds, atomic_get(&producer_dropped),
+           atomic_get(&producer_failed));
+    printf("[LOAD]: %ld callbacks, latency mean %.2f us, max %.2f us\n", callbacks,
+           callbacks ? k_cyc_to_ns_floor64(atomic_get(&consumer_latency_sum)) / 1e3 / callbacks
+                     : 0.0,
+           k_cyc_to_ns_floor64(atomic_get(&consumer_latency_max)) / 1e3);
+    return 0;
+}
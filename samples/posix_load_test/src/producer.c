@@ -0,0 +1,50 @@
+#include <zeta.h>
+
+/**
+ * @brief Publishes results, read by main at the end of the test.
+ */
+atomic_t producer_published = ATOMIC_INIT(0);
+atomic_t producer_dropped    = ATOMIC_INIT(0);
+atomic_t producer_failed     = ATOMIC_INIT(0);
+
+static void PRODUCER_count(int rc)
+{
+    if (rc == 0) {
+        atomic_inc(&producer_published);
+    } else if (rc == -EAGAIN) {
+        atomic_inc(&producer_dropped);
+    } else {
+        atomic_inc(&producer_failed);
+    }
+}
+
+/**
+ * @brief This is the function used by Zeta to tell the PRODUCER that one(s) of
+ * the channels which it is subscribed has changed. The PRODUCER has no
+ * subscriptions.
+ *
+ * @param id
+ */
+void PRODUCER_service_callback(zt_channel_e id)
+{
+}
+
+/**
+ * @brief This is the task loop responsible to run the PRODUCER thread
+ * functionality. The channels are published with the publish time, so the
+ * subscriber can measure the dispatch latency. The persistent LOAD_COUNT
+ * channel keeps the publishes count, its flash writes are rate limited by the
+ * storage_min_interval.
+ */
+void PRODUCER_task()
+{
+    while (1) {
+        PRODUCER_count(zt_pub_LOAD(k_cycle_get_32()));
+        PRODUCER_count(zt_pub_SEQ_LOAD(k_cycle_get_32()));
+        if ((atomic_get(&producer_published) & 0x3FF) == 0) {
+            zt_pub_LOAD_COUNT((u32_t) atomic_get(&producer_published));
+        }
+    }
+}
+
+ZT_SERVICE_INIT(PRODUCER, PRODUCER_task, PRODUCER_service_callback);
@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
+import sys
+
 import matplotlib.pyplot as plt
 
 
-def plot():
-    xs = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10']
-    ys = [14, 19, 23, 28, 33, 38, 42, 47, 52, 57]
-    plt.bar(xs, ys)  #, color=(0.4, 0.4, 0.4, 1.0))
+def plot(results_file="latency.json"):
+    with open(results_file, "r") as results:
+        results = json.load(results)["results"]
+    xs = [str(result["case"]["fan_out"]) for result in results]
+    ys = [round(result["latency_us"]["p50"]) for result in results]
+    plt.bar(xs, ys)
     for x, y in zip(xs, ys):
         plt.text(x, y + 1, r"{0}".format(y), horizontalalignment='center')
 
-    plt.ylim([0, 60])
+    plt.ylim([0, max(ys) * 1.25])
     plt.yticks([])
     plt.ylabel(r'Latency ($\mu$s)')
     plt.xlabel('Number of subscribers')
@@ -20,4 +25,4 @@ def plot():
 
 
 if __name__ == "__main__":
-    plot()
+    plot(*sys.argv[1:])
@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
+import sys
+
 import matplotlib.pyplot as plt
 
 
-def channel_latency_ping():
-    xs = ['1', '2', '4', '8', '16', '32', '64', '128', '255']
-    ys = [13, 13, 14, 14, 15, 17, 20, 27, 22]
+def channel_latency_ping(results_file="latency.json"):
+    with open(results_file, "r") as results:
+        results = json.load(results)["results"]
+    xs = [str(result["case"]["size"]) for result in results]
+    ys = [round(result["latency_us"]["p50"]) for result in results]
     plt.bar(xs, ys)
     for x, y in zip(xs, ys):
         plt.text(x, y + 1, r"{0}".format(y), horizontalalignment='center')
 
-    plt.ylim([0, 50])
+    plt.ylim([0, max(ys) * 1.25])
     plt.yticks([])
     plt.ylabel(r'Latency ($\mu$s)')
     plt.xlabel('Channel size (bytes)')
@@ -20,4 +25,4 @@ def channel_latency_ping():
 
 
 if __name__ == "__main__":
-    channel_latency_ping()
+    channel_latency_ping(*sys.argv[1:])
@@ -2,7 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import setuptools
-from zeta import __version__
+
+version = {}
+with open("zeta/_version.py", "r") as fh:
+    exec(fh.read(), version)
+__version__ = version["__version__"]
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
@@ -141,10 +141,32 @@ void PING_task(void)
                   "PONG2 callback was called on a publish procedure without changes on "
                   "channel value!\n");
 
+    /* Testing the CH03 typed accessors */
+    u64_t ch03_value = 0;
+    error            = zt_read_CH03(&ch03_value);
+    zassert_equal(error, 0, "Error executing a valid typed read call!\n");
+    zassert_equal(ch03_value, 0xff, "CH03 typed read value is wrong: %x", ch03_value);
+    error = zt_pub_CH03(0xff);
+    zassert_equal(error, 0, "Error executing a valid typed publish call!\n");
+    zassert_equal(sensor_a_hit, 1,
+                  "PONG2 callback was called on a typed publish without changes on "
+                  "channel value!\n");
+    error = zt_pub_CH03(0x1ff);
+    zassert_equal(error, 0, "Error executing a valid typed publish call!\n");
+    zassert_equal(sensor_a_hit, 2, "PONG2 callback was not called on a typed publish\n");
+    zt_chan_read(ZT_CH03_CHANNEL, ch03);
+    zassert_equal(ch03->u64.value, 0x1ff, "CH03 (%x) isn't the expected value 0x1ff",
+                  ch03->u64.value);
+
     /* Testing react_on field on CH04 creation  */
     error = zt_chan_pub(ZT_CH04_CHANNEL, ZT_DATA_BYTES(128, 1));
     zassert_equal(error, 0, "Error executing a valid publish call!\n");
     zassert_equal(sensor_b_hit, 1, "PONG2 callback was not called with a valid call\n");
+    zt_data_t *ch04 = ZT_DATA_BYTES(128, 0);
+    error           = zt_chan_read(ZT_CH04_CHANNEL, ch04);
+    zassert_equal(error, 0, "Error reading a seqlock channel, error code: %d!\n", error);
+    zassert_equal(ch04->bytes.value[0], 1, "CH04 (%x) isn't the expected value 1",
+                  ch04->bytes.value[0]);
     zt_chan_pub(ZT_CH04_CHANNEL, ZT_DATA_BYTES(128, 1));
     zassert_equal(sensor_b_hit, 2,
                   "PONG2 callback was not called on a channel that react on update!\n");
@@ -158,6 +180,33 @@ void PING_task(void)
     zassert_equal(
         sensor_c_hit, 4,
         "PONG or PONG2 callback was not called on a channel that react on update!\n");
+
+    /* Testing batch publish calls */
+    zt_channel_e unsorted[] = {ZT_CH05_CHANNEL, ZT_CH04_CHANNEL};
+    zt_data_t *batch[]      = {ZT_DATA_BYTES(255, 2), ZT_DATA_BYTES(128, 2)};
+    error                   = zt_chan_pub_batch(unsorted, batch, 2);
+    zassert_equal(error, -EINVAL,
+                  "Batch publish function is allowing unsorted channels, error code: %d!\n",
+                  error);
+    zt_channel_e with_read_only[] = {ZT_CH01_CHANNEL, ZT_CH04_CHANNEL};
+    batch[0]                      = ZT_DATA_U8(2);
+    error                         = zt_chan_pub_batch(with_read_only, batch, 2);
+    zassert_equal(error, -EPERM,
+                  "Batch publish function is not checking the readonly field, error code: "
+                  "%d!\n",
+                  error);
+    zassert_equal(sensor_b_hit, 2, "Batch publish changed a channel of a failed batch!\n");
+    zt_channel_e sorted[] = {ZT_CH04_CHANNEL, ZT_CH05_CHANNEL};
+    batch[0]              = ZT_DATA_BYTES(128, 2);
+    batch[1]              = ZT_DATA_BYTES(255, 2);
+    error                 = zt_chan_pub_batch(sorted, batch, 2);
+    zassert_equal(error, 0, "Error executing a valid batch publish call! %d\n", error);
+    zassert_equal(sensor_b_hit, 3, "PONG2 callback was not called on a batch publish\n");
+    zassert_equal(sensor_c_hit, 6,
+                  "PONG or PONG2 callback was not called on a batch publish\n");
+    zt_chan_read(ZT_CH04_CHANNEL, ch04);
+    zassert_equal(ch04->bytes.value[0], 2, "CH04 (%x) isn't the expected value 2",
+                  ch04->bytes.value[0]);
     k_sleep(K_MSEC(100));
     k_sem_give(&ztest_sem);
 }
@@ -180,6 +229,12 @@ void PONG2_service_callback(zt_channel_e id)
 
 void PONG2_task(void)
 {
+    /* PONG2 is not a CH02 publisher */
+    int error = zt_chan_pub(ZT_CH02_CHANNEL, ZT_DATA_U16(0xcc));
+    zassert_equal(error, -EACCES,
+                  "Publish function is allowing a service that is not a publisher to "
+                  "change the channel, error code: %d!\n",
+                  error);
 }
 
 ZT_SERVICE_INIT(PING, PING_task, PING_service_callback);
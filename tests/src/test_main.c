@@ -228,12 +228,116 @@ void test_channels_routine(void)
     k_sem_take(&ztest_sem, K_FOREVER);
 }
 
+void test_storage_flush(void)
+{
+    struct zt_storage_stats before = {0};
+    struct zt_storage_stats after  = {0};
+    int error                      = 0;
+
+    /* Checking an invalid call */
+    error = zt_storage_stats_get(NULL);
+    zassert_equal(error, -EFAULT, "[%s] zt_storage_stats_get is allowing a NULL stats!\n",
+                  __FUNCTION__);
+
+    /* CH02 was published by PING and is pending to be stored */
+    zt_storage_stats_get(&before);
+    error = zt_storage_flush(K_SECONDS(1));
+    zassert_equal(error, 0, "[%s] zt_storage_flush returned %d in a valid call!\n",
+                  __FUNCTION__, error);
+    zt_storage_stats_get(&after);
+    zassert_equal(after.writes, before.writes + 1,
+                  "[%s] zt_storage_flush wrote %d records instead of 1!\n", __FUNCTION__,
+                  after.writes - before.writes);
+    zassert_equal(after.bytes_written, before.bytes_written + 2,
+                  "[%s] zt_storage_flush wrote %d bytes instead of 2!\n", __FUNCTION__,
+                  after.bytes_written - before.bytes_written);
+
+    /* Nothing is pending, so a new flush does not write on the flash */
+    before = after;
+    error  = zt_storage_flush(K_SECONDS(1));
+    zassert_equal(error, 0, "[%s] zt_storage_flush returned %d in a valid call!\n",
+                  __FUNCTION__, error);
+    zt_storage_stats_get(&after);
+    zassert_equal(after.flushes, before.flushes,
+                  "[%s] zt_storage_flush wrote without pending channels!\n", __FUNCTION__);
+}
+
+#if ZT_STATS
+void test_stats(void)
+{
+    static struct zt_stats stats;
+    int error = 0;
+
+    /* Checking an invalid call */
+    error = zt_stats_get(NULL);
+    zassert_equal(error, -EFAULT, "[%s] zt_stats_get is allowing a NULL stats!\n",
+                  __FUNCTION__);
+
+    error = zt_stats_get(&stats);
+    zassert_equal(error, 0, "[%s] zt_stats_get returned %d in a valid call!\n",
+                  __FUNCTION__, error);
+
+    /* PING published CH03 four times, two of them without changes */
+    zassert_equal(stats.channels[ZT_CH03_CHANNEL].publishes, 4,
+                  "[%s] CH03 was counted with %d publishes instead of 4!\n", __FUNCTION__,
+                  stats.channels[ZT_CH03_CHANNEL].publishes);
+    zassert_equal(stats.channels[ZT_CH03_CHANNEL].suppressed, 2,
+                  "[%s] CH03 was counted with %d suppressed publishes instead of 2!\n",
+                  __FUNCTION__, stats.channels[ZT_CH03_CHANNEL].suppressed);
+    zassert_equal(stats.channels[ZT_CH01_CHANNEL].publishes, 0,
+                  "[%s] The read only CH01 was counted with publishes!\n", __FUNCTION__);
+
+    /* PONG2 was called twice by CH03 and three times by CH04 and CH05 */
+    zassert_equal(stats.services[ZT_PONG2_SERVICE].callbacks, 8,
+                  "[%s] PONG2 was counted with %d callbacks instead of 8!\n", __FUNCTION__,
+                  stats.services[ZT_PONG2_SERVICE].callbacks);
+    zassert_true(stats.services[ZT_PONG2_SERVICE].callback_max_us
+                     <= stats.services[ZT_PONG2_SERVICE].callback_time_us,
+                 "[%s] PONG2 longest callback is longer than all of them!\n",
+                 __FUNCTION__);
+    zassert_equal(stats.services[ZT_PING_SERVICE].callbacks, 0,
+                  "[%s] PING was counted with callbacks without subscriptions!\n",
+                  __FUNCTION__);
+}
+#define ZT_STATS_TESTS ztest_unit_test(test_stats),
+#else
+#define ZT_STATS_TESTS
+#endif
+
+#if ZT_TRACE
+void test_trace(void)
+{
+    static u8_t records[ZT_TRACE_BUFFER_SIZE];
+    size_t size = 0;
+
+    /* The first record is the PING publish of CH02: timestamp, id and channel */
+    size = zt_trace_read(records, sizeof(records));
+    zassert_true(size > 5, "[%s] zt_trace_read returned only %d bytes!\n", __FUNCTION__,
+                 size);
+    zassert_equal(records[4], ZT_TRACE_PUB_ENTER,
+                  "[%s] The first trace record is the event %d!\n", __FUNCTION__,
+                  records[4]);
+    zassert_equal(records[5], ZT_CH02_CHANNEL,
+                  "[%s] The first trace record is of the channel #%d!\n", __FUNCTION__,
+                  records[5]);
+
+    /* The records read are removed from the buffer */
+    size = zt_trace_read(records, sizeof(records));
+    zassert_equal(size, 0, "[%s] zt_trace_read returned %d bytes already read!\n",
+                  __FUNCTION__, size);
+}
+#define ZT_TRACE_TESTS ztest_unit_test(test_trace),
+#else
+#define ZT_TRACE_TESTS
+#endif
+
 void test_main(void)
 {
     ztest_test_suite(ZT_CHECK_CHANNELS_GENERATION, ztest_unit_test(test_data),
                      ztest_unit_test(test_channels_name),
                      ztest_unit_test(test_channels_size),
-                     ztest_unit_test(test_channels_routine));
+                     ztest_unit_test(test_channels_routine),
+                     ZT_STATS_TESTS ZT_TRACE_TESTS ztest_unit_test(test_storage_flush));
 
     ztest_run_test_suite(ZT_CHECK_CHANNELS_GENERATION);
 }
@@ -1,3 +1,4 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from ._version import __version__
+from .zeta import ZetaContext, check_project, generate, generate_many
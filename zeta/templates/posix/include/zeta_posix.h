@@ -0,0 +1,370 @@
+/* ***************************************************************** */
+/*                      FILE GENERATED BY ZetaCLI                    */
+/*                         DON'T EDIT THIS FILE                      */
+/* ***************************************************************** */
+
+#ifndef ZETA_POSIX_H_
+#define ZETA_POSIX_H_
+
+/**
+ * @file
+ * @brief Thin pthread shim of the Zephyr kernel API used by Zeta. It is
+ * included by zeta.h when the files are generated with the posix
+ * backend, so the same zeta.yaml can be built and load-tested as a host
+ * program. The threads priorities are ignored and the scheduler lock is
+ * a global mutex, so the Zeta logic is the same of the board, but not
+ * the timing.
+ */
+
+#include <errno.h>
+#include <pthread.h>
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <sys/types.h>
+
+#if defined(CONFIG_ZETA_STORAGE) && !defined(CONFIG_ZETA_STORAGE_NVS_SIM)
+/* There is no flash on the host, the storage always uses the simulator */
+#define CONFIG_ZETA_STORAGE_NVS_SIM 1
+#endif
+
+#ifndef CONFIG_ZETA_LOG_LEVEL
+#define CONFIG_ZETA_LOG_LEVEL 3
+#endif
+
+typedef int8_t s8_t;
+typedef int16_t s16_t;
+typedef int32_t s32_t;
+typedef int64_t s64_t;
+typedef uint8_t u8_t;
+typedef uint16_t u16_t;
+typedef uint32_t u32_t;
+typedef uint64_t u64_t;
+
+#define BIT(n) (1UL << (n))
+#define ARRAY_SIZE(array) (sizeof(array) / sizeof((array)[0]))
+#ifndef MIN
+#define MIN(a, b) (((a) < (b)) ? (a) : (b))
+#endif
+#ifndef MAX
+#define MAX(a, b) (((a) > (b)) ? (a) : (b))
+#endif
+#define __aligned(x) __attribute__((__aligned__(x)))
+#define __packed __attribute__((__packed__))
+#define __weak __attribute__((__weak__))
+
+/* ************************* LOGGING ******************************* */
+
+#define LOG_LEVEL_NONE 0
+#define LOG_LEVEL_ERR 1
+#define LOG_LEVEL_WRN 2
+#define LOG_LEVEL_INF 3
+#define LOG_LEVEL_DBG 4
+
+void zt_posix_log(const char *level, const char *format, ...);
+void zt_posix_hexdump(const void *data, size_t length, const char *title);
+
+#define LOG_MODULE_REGISTER(name, ...) \
+    static const char __zt_posix_log_module_##name[] __attribute__((unused)) = #name
+#define LOG_MODULE_DECLARE(name, ...) LOG_MODULE_REGISTER(name)
+
+#define ZT_POSIX_LOG(_level, _tag, ...)               \
+    do {                                              \
+        if (CONFIG_ZETA_LOG_LEVEL >= (_level)) {      \
+            zt_posix_log(_tag, __VA_ARGS__);          \
+        }                                             \
+    } while (0)
+
+#define LOG_ERR(...) ZT_POSIX_LOG(LOG_LEVEL_ERR, "err", __VA_ARGS__)
+#define LOG_WRN(...) ZT_POSIX_LOG(LOG_LEVEL_WRN, "wrn", __VA_ARGS__)
+#define LOG_INF(...) ZT_POSIX_LOG(LOG_LEVEL_INF, "inf", __VA_ARGS__)
+#define LOG_DBG(...) ZT_POSIX_LOG(LOG_LEVEL_DBG, "dbg", __VA_ARGS__)
+#define LOG_HEXDUMP_INF(_data, _length, _title)               \
+    do {                                                      \
+        if (CONFIG_ZETA_LOG_LEVEL >= LOG_LEVEL_INF) {         \
+            zt_posix_hexdump((_data), (_length), (_title));   \
+        }                                                     \
+    } while (0)
+#define printk printf
+
+/* ************************* TIMEOUTS ****************************** */
+
+/**
+ * @brief Timeout in milliseconds, negative waits forever.
+ */
+typedef struct {
+    s64_t ms;
+} k_timeout_t;
+
+#define MSEC_PER_SEC 1000
+#define USEC_PER_MSEC 1000
+#define NSEC_PER_USEC 1000
+
+#define K_NO_WAIT ((k_timeout_t){.ms = 0})
+#define K_FOREVER ((k_timeout_t){.ms = -1})
+#define K_MSEC(_ms) ((k_timeout_t){.ms = (_ms)})
+#define K_SECONDS(_s) K_MSEC((_s) * MSEC_PER_SEC)
+
+/* The host cycles counter is the monotonic clock in nanoseconds */
+#define sys_clock_hw_cycles_per_sec() 1000000000UL
+#define k_cyc_to_ns_floor64(_cycles) ((u64_t)(_cycles))
+#define k_cyc_to_us_floor64(_cycles) ((u64_t)(_cycles) / 1000)
+
+s64_t k_uptime_get(void);
+u32_t k_uptime_get_32(void);
+u32_t k_cycle_get_32(void);
+s32_t k_sleep(k_timeout_t timeout);
+s32_t k_msleep(s32_t ms);
+s32_t k_usleep(s32_t us);
+void k_busy_wait(u32_t usec_to_wait);
+void k_yield(void);
+
+static inline bool k_is_in_isr(void)
+{
+    return false;
+}
+
+/* ************************* ATOMICS ******************************* */
+
+typedef long atomic_t;
+typedef atomic_t atomic_val_t;
+
+#define ATOMIC_INIT(i) (i)
+#define ATOMIC_BITS (sizeof(atomic_val_t) * 8)
+#define ATOMIC_MASK(bit) (1UL << ((unsigned long) (bit) & (ATOMIC_BITS - 1)))
+#define ATOMIC_ELEM(addr, bit) ((addr) + ((bit) / ATOMIC_BITS))
+#define ATOMIC_BITMAP_SIZE(num_bits) (1 + ((num_bits) - 1) / ATOMIC_BITS)
+#define ATOMIC_DEFINE(name, num_bits) atomic_t name[ATOMIC_BITMAP_SIZE(num_bits)]
+
+static inline atomic_val_t atomic_get(const atomic_t *target)
+{
+    return __atomic_load_n(target, __ATOMIC_SEQ_CST);
+}
+
+static inline atomic_val_t atomic_set(atomic_t *target, atomic_val_t value)
+{
+    return __atomic_exchange_n(target, value, __ATOMIC_SEQ_CST);
+}
+
+static inline atomic_val_t atomic_clear(atomic_t *target)
+{
+    return atomic_set(target, 0);
+}
+
+static inline atomic_val_t atomic_add(atomic_t *target, atomic_val_t value)
+{
+    return __atomic_fetch_add(target, value, __ATOMIC_SEQ_CST);
+}
+
+static inline atomic_val_t atomic_sub(atomic_t *target, atomic_val_t value)
+{
+    return __atomic_fetch_sub(target, value, __ATOMIC_SEQ_CST);
+}
+
+static inline atomic_val_t atomic_inc(atomic_t *target)
+{
+    return atomic_add(target, 1);
+}
+
+static inline atomic_val_t atomic_dec(atomic_t *target)
+{
+    return atomic_sub(target, 1);
+}
+
+static inline atomic_val_t atomic_or(atomic_t *target, atomic_val_t value)
+{
+    return __atomic_fetch_or(target, value, __ATOMIC_SEQ_CST);
+}
+
+static inline atomic_val_t atomic_and(atomic_t *target, atomic_val_t value)
+{
+    return __atomic_fetch_and(target, value, __ATOMIC_SEQ_CST);
+}
+
+static inline bool atomic_cas(atomic_t *target, atomic_val_t old_value, atomic_val_t new_value)
+{
+    return __atomic_compare_exchange_n(target, &old_value, new_value, false,
+                                       __ATOMIC_SEQ_CST, __ATOMIC_SEQ_CST);
+}
+
+static inline bool atomic_test_bit(const atomic_t *target, int bit)
+{
+    return (atomic_get(ATOMIC_ELEM(target, bit)) & ATOMIC_MASK(bit)) != 0;
+}
+
+static inline void atomic_set_bit(atomic_t *target, int bit)
+{
+    (void) atomic_or(ATOMIC_ELEM(target, bit), ATOMIC_MASK(bit));
+}
+
+static inline void atomic_clear_bit(atomic_t *target, int bit)
+{
+    (void) atomic_and(ATOMIC_ELEM(target, bit), ~ATOMIC_MASK(bit));
+}
+
+static inline bool atomic_test_and_set_bit(atomic_t *target, int bit)
+{
+    return (atomic_or(ATOMIC_ELEM(target, bit), ATOMIC_MASK(bit)) & ATOMIC_MASK(bit)) != 0;
+}
+
+static inline bool atomic_test_and_clear_bit(atomic_t *target, int bit)
+{
+    return (atomic_and(ATOMIC_ELEM(target, bit), ~ATOMIC_MASK(bit)) & ATOMIC_MASK(bit))
+           != 0;
+}
+
+/* ************************* THREADS ******************************* */
+
+typedef void (*k_thread_entry_t)(void *p1, void *p2, void *p3);
+
+/**
+ * @brief Static thread. It is registered before main and started by
+ * zt_posix_start, which takes the place of the Zephyr boot.
+ */
+struct k_thread {
+    pthread_t pthread;
+    const char *name;
+    k_thread_entry_t entry;
+    void *p1;
+    void *p2;
+    void *p3;
+    int priority;
+    s32_t delay;
+    bool started;
+    struct k_thread *next;
+};
+typedef struct k_thread *k_tid_t;
+
+void zt_posix_thread_register(struct k_thread *thread);
+
+#define K_THREAD_DEFINE(_name, _stack_size, _entry, _p1, _p2, _p3, _prio, _options, _delay) \
+    static struct k_thread __zt_posix_thread_##_name = {                                  \
+        .name     = #_name,                                                               \
+        .entry    = (k_thread_entry_t) _entry,                                            \
+        .p1       = (_p1),                                                                \
+        .p2       = (_p2),                                                                \
+        .p3       = (_p3),                                                                \
+        .priority = (_prio),                                                              \
+        .delay    = (_delay)};                                                            \
+    __attribute__((constructor)) static void __zt_posix_register_##_name(void)            \
+    {                                                                                     \
+        zt_posix_thread_register(&__zt_posix_thread_##_name);                             \
+    }                                                                                     \
+    const k_tid_t _name = &__zt_posix_thread_##_name
+
+/**
+ * @brief Start every thread defined by K_THREAD_DEFINE, in the priority
+ * order. It must be called once by the host program main before using
+ * the Zeta API, as the Zephyr kernel does before its main.
+ */
+void zt_posix_start(void);
+
+k_tid_t k_current_get(void);
+void k_thread_custom_data_set(void *value);
+void *k_thread_custom_data_get(void);
+
+/**
+ * @brief The scheduler lock is a global recursive mutex. As the threads
+ * run in parallel on the host, it is what keeps the seqlock channels
+ * writers mutually exclusive.
+ */
+void k_sched_lock(void);
+void k_sched_unlock(void);
+
+/**
+ * @brief There are no interrupts on the host, so the interrupts lock is
+ * the scheduler lock, which keeps the code it protects exclusive.
+ */
+static inline unsigned int irq_lock(void)
+{
+    k_sched_lock();
+    return 0;
+}
+
+static inline void irq_unlock(unsigned int key)
+{
+    (void) key;
+    k_sched_unlock();
+}
+
+/* ************************* SEMAPHORES **************************** */
+
+struct k_sem {
+    pthread_mutex_t lock;
+    pthread_cond_t cond;
+    unsigned int count;
+    unsigned int limit;
+};
+
+#define Z_SEM_INITIALIZER(_initial_count, _count_limit)                 \
+    {                                                                   \
+        .lock = PTHREAD_MUTEX_INITIALIZER, .cond = PTHREAD_COND_INITIALIZER, \
+        .count = (_initial_count), .limit = (_count_limit)              \
+    }
+#define K_SEM_DEFINE(_name, _initial_count, _count_limit) \
+    struct k_sem _name = Z_SEM_INITIALIZER(_initial_count, _count_limit)
+
+int k_sem_init(struct k_sem *sem, unsigned int initial_count, unsigned int limit);
+int k_sem_take(struct k_sem *sem, k_timeout_t timeout);
+void k_sem_give(struct k_sem *sem);
+void k_sem_reset(struct k_sem *sem);
+unsigned int k_sem_count_get(struct k_sem *sem);
+
+/* ************************* MUTEXES ******************************* */
+
+struct k_mutex {
+    pthread_mutex_t lock;
+    pthread_cond_t cond;
+    pthread_t owner;
+    unsigned int lock_count;
+};
+
+#define K_MUTEX_DEFINE(_name)                                                \
+    struct k_mutex _name = {.lock       = PTHREAD_MUTEX_INITIALIZER,         \
+                            .cond       = PTHREAD_COND_INITIALIZER,          \
+                            .lock_count = 0}
+
+int k_mutex_init(struct k_mutex *mutex);
+int k_mutex_lock(struct k_mutex *mutex, k_timeout_t timeout);
+int k_mutex_unlock(struct k_mutex *mutex);
+
+/* ************************* MESSAGE QUEUES ************************ */
+
+struct k_msgq {
+    pthread_mutex_t lock;
+    pthread_cond_t not_empty;
+    pthread_cond_t not_full;
+    char *buffer_start;
+    size_t msg_size;
+    u32_t max_msgs;
+    u32_t used_msgs;
+    u32_t read_index;
+    u32_t write_index;
+};
+
+#define K_MSGQ_DEFINE(_name, _msg_size, _max_msgs, _align)                                 \
+    static char __aligned(_align) __zt_posix_msgq_buffer_##_name[(_max_msgs) * (_msg_size)]; \
+    struct k_msgq _name = {.lock         = PTHREAD_MUTEX_INITIALIZER,                     \
+                           .not_empty    = PTHREAD_COND_INITIALIZER,                      \
+                           .not_full     = PTHREAD_COND_INITIALIZER,                      \
+                           .buffer_start = __zt_posix_msgq_buffer_##_name,                \
+                           .msg_size     = (_msg_size),                                   \
+                           .max_msgs     = (_max_msgs)}
+
+int k_msgq_put(struct k_msgq *msgq, const void *data, k_timeout_t timeout);
+int k_msgq_get(struct k_msgq *msgq, void *data, k_timeout_t timeout);
+void k_msgq_purge(struct k_msgq *msgq);
+u32_t k_msgq_num_used_get(struct k_msgq *msgq);
+u32_t k_msgq_num_free_get(struct k_msgq *msgq);
+
+/* ************************* TRACING ******************************* */
+
+/**
+ * @brief Append the trace records to the file named by the ZT_TRACE_FILE
+ * environment variable, zeta_trace.stream by default. The file is the
+ * stream of a CTF trace described by the generated zeta/trace/metadata.
+ */
+void zt_posix_trace_write(const void *data, size_t size);
+
+#endif  // ZETA_POSIX_H_
@@ -0,0 +1,451 @@
+/* ***************************************************************** */
+/*                      FILE GENERATED BY ZetaCLI                    */
+/*                         DON'T EDIT THIS FILE                      */
+/* ***************************************************************** */
+
+#define _POSIX_C_SOURCE 200809L
+
+#include "zeta_posix.h"
+
+#include <sched.h>
+#include <stdarg.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+
+/**
+ * @brief Threads defined by K_THREAD_DEFINE. The list is filled by the
+ * constructors before main, so it is not protected.
+ */
+static struct k_thread *__zt_posix_threads = NULL;
+static bool __zt_posix_started             = false;
+static struct timespec __zt_posix_boot;
+static __thread struct k_thread *__zt_posix_current = NULL;
+static __thread void *__zt_posix_custom_data        = NULL;
+static K_MUTEX_DEFINE(__zt_posix_sched_mutex);
+
+__attribute__((constructor)) static void __zt_posix_boot_time(void)
+{
+    clock_gettime(CLOCK_MONOTONIC, &__zt_posix_boot);
+}
+
+/* ************************* LOGGING ******************************* */
+
+void zt_posix_log(const char *level, const char *format, ...)
+{
+    va_list args;
+    flockfile(stdout);
+    printf("[%08u] <%s> zeta: ", k_uptime_get_32(), level);
+    va_start(args, format);
+    vprintf(format, args);
+    va_end(args);
+    putchar('\n');
+    funlockfile(stdout);
+}
+
+void zt_posix_hexdump(const void *data, size_t length, const char *title)
+{
+    const u8_t *bytes = data;
+    flockfile(stdout);
+    printf("[%08u] <inf> zeta: %s\n", k_uptime_get_32(), title);
+    for (size_t i = 0; i < length; ++i) {
+        printf("%02x%s", bytes[i], ((i + 1) % 16 == 0 || i + 1 == length) ? "\n" : " ");
+    }
+    funlockfile(stdout);
+}
+
+/* ************************* TIMEOUTS ****************************** */
+
+static s64_t __zt_posix_elapsed_ns(void)
+{
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (s64_t)(now.tv_sec - __zt_posix_boot.tv_sec) * 1000000000LL
+           + (now.tv_nsec - __zt_posix_boot.tv_nsec);
+}
+
+s64_t k_uptime_get(void)
+{
+    return __zt_posix_elapsed_ns() / 1000000LL;
+}
+
+u32_t k_uptime_get_32(void)
+{
+    return (u32_t) k_uptime_get();
+}
+
+u32_t k_cycle_get_32(void)
+{
+    return (u32_t) __zt_posix_elapsed_ns();
+}
+
+s32_t k_usleep(s32_t us)
+{
+    struct timespec duration = {.tv_sec = us / 1000000, .tv_nsec = (us % 1000000) * 1000L};
+    while (nanosleep(&duration, &duration) != 0 && errno == EINTR) {
+    }
+    return 0;
+}
+
+s32_t k_msleep(s32_t ms)
+{
+    return k_usleep(ms * 1000);
+}
+
+s32_t k_sleep(k_timeout_t timeout)
+{
+    if (timeout.ms < 0) {
+        while (1) {
+            pause();
+        }
+    }
+    return k_msleep((s32_t) timeout.ms);
+}
+
+void k_busy_wait(u32_t usec_to_wait)
+{
+    s64_t end = __zt_posix_elapsed_ns() + (s64_t) usec_to_wait * 1000LL;
+    while (__zt_posix_elapsed_ns() < end) {
+    }
+}
+
+void k_yield(void)
+{
+    sched_yield();
+}
+
+/**
+ * @brief Compute the absolute time a wait with timeout must end. The
+ * pthread condition variables are on the realtime clock by default.
+ *
+ * @param timeout Relative timeout
+ * @param deadline Absolute time
+ */
+static void __zt_posix_deadline(k_timeout_t timeout, struct timespec *deadline)
+{
+    clock_gettime(CLOCK_REALTIME, deadline);
+    if (timeout.ms > 0) {
+        deadline->tv_sec += timeout.ms / 1000;
+        deadline->tv_nsec += (timeout.ms % 1000) * 1000000L;
+        if (deadline->tv_nsec >= 1000000000L) {
+            deadline->tv_sec += 1;
+            deadline->tv_nsec -= 1000000000L;
+        }
+    }
+}
+
+/**
+ * @brief Wait on the condition variable until it is signaled or the
+ * deadline is reached.
+ *
+ * @param cond Condition variable
+ * @param lock Mutex locked by the caller
+ * @param timeout Relative timeout, negative waits forever
+ * @param deadline Absolute time computed by __zt_posix_deadline
+ *
+ * @return true if the deadline was reached
+ */
+static bool __zt_posix_wait(pthread_cond_t *cond, pthread_mutex_t *lock,
+                            k_timeout_t timeout, const struct timespec *deadline)
+{
+    if (timeout.ms < 0) {
+        pthread_cond_wait(cond, lock);
+        return false;
+    }
+    return pthread_cond_timedwait(cond, lock, deadline) == ETIMEDOUT;
+}
+
+/* ************************* THREADS ******************************* */
+
+void zt_posix_thread_register(struct k_thread *thread)
+{
+    thread->next       = __zt_posix_threads;
+    __zt_posix_threads = thread;
+}
+
+static void *__zt_posix_thread_entry(void *arg)
+{
+    struct k_thread *thread = arg;
+    __zt_posix_current      = thread;
+    if (thread->delay > 0) {
+        k_msleep(thread->delay);
+    }
+    thread->entry(thread->p1, thread->p2, thread->p3);
+    return NULL;
+}
+
+void zt_posix_start(void)
+{
+    if (__zt_posix_started) {
+        return;
+    }
+    __zt_posix_started = true;
+    /* The most urgent threads (lower priority values) are created first */
+    while (1) {
+        struct k_thread *next = NULL;
+        for (struct k_thread *thread = __zt_posix_threads; thread != NULL;
+             thread                  = thread->next) {
+            if (!thread->started && (next == NULL || thread->priority < next->priority)) {
+                next = thread;
+            }
+        }
+        if (next == NULL) {
+            break;
+        }
+        next->started = true;
+        if (pthread_create(&next->pthread, NULL, __zt_posix_thread_entry, next) != 0) {
+            LOG_ERR("Could not create the thread %s", next->name);
+        }
+    }
+}
+
+k_tid_t k_current_get(void)
+{
+    return __zt_posix_current;
+}
+
+void k_thread_custom_data_set(void *value)
+{
+    __zt_posix_custom_data = value;
+}
+
+void *k_thread_custom_data_get(void)
+{
+    return __zt_posix_custom_data;
+}
+
+void k_sched_lock(void)
+{
+    k_mutex_lock(&__zt_posix_sched_mutex, K_FOREVER);
+}
+
+void k_sched_unlock(void)
+{
+    k_mutex_unlock(&__zt_posix_sched_mutex);
+}
+
+/* ************************* SEMAPHORES **************************** */
+
+int k_sem_init(struct k_sem *sem, unsigned int initial_count, unsigned int limit)
+{
+    if (limit == 0 || initial_count > limit) {
+        return -EINVAL;
+    }
+    pthread_mutex_init(&sem->lock, NULL);
+    pthread_cond_init(&sem->cond, NULL);
+    sem->count = initial_count;
+    sem->limit = limit;
+    return 0;
+}
+
+int k_sem_take(struct k_sem *sem, k_timeout_t timeout)
+{
+    int error = 0;
+    struct timespec deadline;
+    __zt_posix_deadline(timeout, &deadline);
+    pthread_mutex_lock(&sem->lock);
+    while (sem->count == 0) {
+        if (timeout.ms == 0) {
+            error = -EBUSY;
+            break;
+        }
+        if (__zt_posix_wait(&sem->cond, &sem->lock, timeout, &deadline)
+            && sem->count == 0) {
+            error = -EAGAIN;
+            break;
+        }
+    }
+    if (error == 0) {
+        sem->count--;
+    }
+    pthread_mutex_unlock(&sem->lock);
+    return error;
+}
+
+void k_sem_give(struct k_sem *sem)
+{
+    pthread_mutex_lock(&sem->lock);
+    if (sem->count < sem->limit) {
+        sem->count++;
+    }
+    pthread_cond_signal(&sem->cond);
+    pthread_mutex_unlock(&sem->lock);
+}
+
+void k_sem_reset(struct k_sem *sem)
+{
+    pthread_mutex_lock(&sem->lock);
+    sem->count = 0;
+    pthread_mutex_unlock(&sem->lock);
+}
+
+unsigned int k_sem_count_get(struct k_sem *sem)
+{
+    pthread_mutex_lock(&sem->lock);
+    unsigned int count = sem->count;
+    pthread_mutex_unlock(&sem->lock);
+    return count;
+}
+
+/* ************************* MUTEXES ******************************* */
+
+int k_mutex_init(struct k_mutex *mutex)
+{
+    pthread_mutex_init(&mutex->lock, NULL);
+    pthread_cond_init(&mutex->cond, NULL);
+    mutex->lock_count = 0;
+    return 0;
+}
+
+int k_mutex_lock(struct k_mutex *mutex, k_timeout_t timeout)
+{
+    int error      = 0;
+    pthread_t self = pthread_self();
+    struct timespec deadline;
+    __zt_posix_deadline(timeout, &deadline);
+    pthread_mutex_lock(&mutex->lock);
+    if (mutex->lock_count > 0 && pthread_equal(mutex->owner, self)) {
+        mutex->lock_count++;
+        pthread_mutex_unlock(&mutex->lock);
+        return 0;
+    }
+    while (mutex->lock_count > 0) {
+        if (timeout.ms == 0) {
+            error = -EBUSY;
+            break;
+        }
+        if (__zt_posix_wait(&mutex->cond, &mutex->lock, timeout, &deadline)
+            && mutex->lock_count > 0) {
+            error = -EAGAIN;
+            break;
+        }
+    }
+    if (error == 0) {
+        mutex->owner      = self;
+        mutex->lock_count = 1;
+    }
+    pthread_mutex_unlock(&mutex->lock);
+    return error;
+}
+
+int k_mutex_unlock(struct k_mutex *mutex)
+{
+    int error = 0;
+    pthread_mutex_lock(&mutex->lock);
+    if (mutex->lock_count == 0) {
+        error = -EINVAL;
+    } else if (!pthread_equal(mutex->owner, pthread_self())) {
+        error = -EPERM;
+    } else if (--mutex->lock_count == 0) {
+        pthread_cond_signal(&mutex->cond);
+    }
+    pthread_mutex_unlock(&mutex->lock);
+    return error;
+}
+
+/* ************************* MESSAGE QUEUES ************************ */
+
+int k_msgq_put(struct k_msgq *msgq, const void *data, k_timeout_t timeout)
+{
+    int error = 0;
+    struct timespec deadline;
+    __zt_posix_deadline(timeout, &deadline);
+    pthread_mutex_lock(&msgq->lock);
+    while (msgq->used_msgs == msgq->max_msgs) {
+        if (timeout.ms == 0) {
+            error = -ENOMSG;
+            break;
+        }
+        if (__zt_posix_wait(&msgq->not_full, &msgq->lock, timeout, &deadline)
+            && msgq->used_msgs == msgq->max_msgs) {
+            error = -EAGAIN;
+            break;
+        }
+    }
+    if (error == 0) {
+        memcpy(&msgq->buffer_start[msgq->write_index * msgq->msg_size], data,
+               msgq->msg_size);
+        msgq->write_index = (msgq->write_index + 1) % msgq->max_msgs;
+        msgq->used_msgs++;
+        pthread_cond_signal(&msgq->not_empty);
+    }
+    pthread_mutex_unlock(&msgq->lock);
+    return error;
+}
+
+int k_msgq_get(struct k_msgq *msgq, void *data, k_timeout_t timeout)
+{
+    int error = 0;
+    struct timespec deadline;
+    __zt_posix_deadline(timeout, &deadline);
+    pthread_mutex_lock(&msgq->lock);
+    while (msgq->used_msgs == 0) {
+        if (timeout.ms == 0) {
+            error = -ENOMSG;
+            break;
+        }
+        if (__zt_posix_wait(&msgq->not_empty, &msgq->lock, timeout, &deadline)
+            && msgq->used_msgs == 0) {
+            error = -EAGAIN;
+            break;
+        }
+    }
+    if (error == 0) {
+        memcpy(data, &msgq->buffer_start[msgq->read_index * msgq->msg_size],
+               msgq->msg_size);
+        msgq->read_index = (msgq->read_index + 1) % msgq->max_msgs;
+        msgq->used_msgs--;
+        pthread_cond_signal(&msgq->not_full);
+    }
+    pthread_mutex_unlock(&msgq->lock);
+    return error;
+}
+
+void k_msgq_purge(struct k_msgq *msgq)
+{
+    pthread_mutex_lock(&msgq->lock);
+    msgq->used_msgs  = 0;
+    msgq->read_index = msgq->write_index;
+    pthread_cond_broadcast(&msgq->not_full);
+    pthread_mutex_unlock(&msgq->lock);
+}
+
+u32_t k_msgq_num_used_get(struct k_msgq *msgq)
+{
+    pthread_mutex_lock(&msgq->lock);
+    u32_t used = msgq->used_msgs;
+    pthread_mutex_unlock(&msgq->lock);
+    return used;
+}
+
+u32_t k_msgq_num_free_get(struct k_msgq *msgq)
+{
+    pthread_mutex_lock(&msgq->lock);
+    u32_t free_msgs = msgq->max_msgs - msgq->used_msgs;
+    pthread_mutex_unlock(&msgq->lock);
+    return free_msgs;
+}
+
+/* ************************* TRACING ******************************* */
+
+static FILE *__zt_posix_trace_file = NULL;
+
+static void __zt_posix_trace_close(void)
+{
+    fclose(__zt_posix_trace_file);
+}
+
+void zt_posix_trace_write(const void *data, size_t size)
+{
+    if (__zt_posix_trace_file == NULL) {
+        const char *path      = getenv("ZT_TRACE_FILE");
+        __zt_posix_trace_file = fopen(path ? path : "zeta_trace.stream", "wb");
+        if (__zt_posix_trace_file == NULL) {
+            perror("zeta trace file");
+            abort();
+        }
+        atexit(__zt_posix_trace_close);
+    }
+    fwrite(data, 1, size, __zt_posix_trace_file);
+}
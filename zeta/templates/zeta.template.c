@@ -6,14 +6,21 @@
 #include "zeta.h"
 
 
+#include <string.h>
+
+#if !ZT_BACKEND_POSIX
 #include <drivers/flash.h>
 #include <fs/nvs.h>
 #include <logging/log.h>
 #include <storage/flash_map.h>
-#include <string.h>
 #include <zephyr.h>
 
 #include "devicetree_fixups.h"
+#endif
+
+#if (ZT_STATS || ZT_TRACE) && defined(CONFIG_ZETA_SHELL)
+#include <shell/shell.h>
+#endif
 
 
 LOG_MODULE_REGISTER(zeta, CONFIG_ZETA_LOG_LEVEL);
@@ -22,33 +29,179 @@ LOG_MODULE_REGISTER(zeta, CONFIG_ZETA_LOG_LEVEL);
 
 #define NVS_SECTOR_COUNT $sector_count
 #define NVS_STORAGE_PARTITION $storage_partition
+#define ZT_STORAGE_PACKED_ID ZT_CHANNEL_COUNT
+
+// <ZT_CODE_INJECTION>$storage_config// </ZT_CODE_INJECTION>
 
 // <ZT_CODE_INJECTION>$channels_sems// </ZT_CODE_INJECTION>
 
-static void __zt_channels_thread(void);
-K_THREAD_DEFINE(zt_channels_thread_id, ZT_CHANNELS_THREAD_STACK_SIZE,
-                __zt_channels_thread, NULL, NULL, NULL, ZT_CHANNELS_THREAD_PRIORITY, 0,
-                0);
+/**
+ * @brief Define Zeta dispatcher type. Each dispatcher thread calls the
+ * callbacks of the subscribers routed to it.
+ */
+struct zt_dispatcher {
+#if ZT_DISPATCH_COALESCING
+    struct k_sem *event; /**< Signals that some pending bit was set */
+#else
+    struct k_msgq *msgq; /**< Changed channels ids */
+#endif
+    atomic_t *pending; /**< Channels with callbacks pending on this dispatcher */
+};
+
+#define ZT_PENDING_WORDS (1 + (ZT_CHANNEL_COUNT - 1) / ATOMIC_BITS)
+
+static void __zt_dispatcher_thread(void *p1, void *p2, void *p3);
+
+// <ZT_CODE_INJECTION>$dispatchers_creation// </ZT_CODE_INJECTION>
 
 #ifdef CONFIG_ZETA_STORAGE
 static void __zt_storage_thread(void);
 K_THREAD_DEFINE(zt_storage_thread_id, ZT_STORAGE_THREAD_STACK_SIZE, __zt_storage_thread,
                 NULL, NULL, NULL, ZT_STORAGE_THREAD_PRIORITY, 0, 0);
+K_SEM_DEFINE(zt_storage_flush_sem, 0, 1);
+K_SEM_DEFINE(zt_storage_done_sem, 0, 1);
+K_MUTEX_DEFINE(zt_storage_flush_mutex);
+#ifndef CONFIG_ZETA_STORAGE_NVS_SIM
 static struct nvs_fs zt_fs;
 #endif
+#endif
+
+#ifdef CONFIG_ZETA_CHANNEL_NAMES
+#define ZT_CHANNEL_NAME(channel_name) .name = channel_name,
+#else
+#define ZT_CHANNEL_NAME(channel_name)
+#endif
+
+/**
+ * @brief Channels with data not persisted on the flash yet. It is the
+ * only channel state that changes at runtime besides the data.
+ */
+static ATOMIC_DEFINE(__zt_channels_pend_persistent, ZT_CHANNEL_COUNT);
+
+#if ZT_STATS
+/**
+ * @brief Channels counters, changed by any publisher or reader, so they
+ * are atomic.
+ */
+static struct {
+    atomic_t publishes;
+    atomic_t suppressed;
+    atomic_t queue_drops;
+    atomic_t sem_timeouts;
+} __zt_channels_stats[ZT_CHANNEL_COUNT];
+
+/**
+ * @brief Services counters in cycles. Each service is called by a single
+ * dispatcher, which is the only writer of its counters.
+ */
+static struct {
+    u32_t callbacks;
+    u32_t callback_max;
+    u64_t callback_time;
+} __zt_services_stats[ZT_SERVICE_COUNT];
+
+#define ZT_STATS_INC(_id, _counter) atomic_inc(&__zt_channels_stats[_id]._counter)
+#else
+#define ZT_STATS_INC(_id, _counter)
+#endif
 
-K_MSGQ_DEFINE(zt_channels_changed_msgq, sizeof(u8_t), 30, 4);
+#if ZT_TRACE
+/**
+ * @brief Trace events fields, as declared on the zeta/trace/metadata.
+ */
+struct __zt_trace_channel {
+    u8_t channel;
+} __packed;
+
+struct __zt_trace_pub_exit {
+    u8_t channel;
+    s32_t error;
+} __packed;
+
+struct __zt_trace_enqueue {
+    u8_t channel;
+    u8_t dispatcher;
+} __packed;
+
+struct __zt_trace_dispatch {
+    u8_t channel;
+    u8_t service;
+    u8_t dispatcher;
+} __packed;
+
+struct __zt_trace_flush {
+    u32_t writes;
+    u32_t bytes;
+} __packed;
+
+/**
+ * @brief Emit a trace record. The timestamp is taken with the interrupts
+ * locked, so the records are emitted in the timestamps order.
+ *
+ * @param event Event id
+ * @param fields Event fields
+ * @param size Fields size
+ */
+static void __zt_trace(zt_trace_event_e event, const void *fields, size_t size)
+{
+    struct {
+        u32_t timestamp;
+        u8_t id;
+        u8_t fields[sizeof(struct __zt_trace_flush)];
+    } __packed record;
+    unsigned int key = irq_lock();
+    record.timestamp = k_cycle_get_32();
+    record.id        = (u8_t) event;
+    memcpy(record.fields, fields, size);
+    zt_trace_emit(&record, sizeof(record) - sizeof(record.fields) + size);
+    irq_unlock(key);
+}
+
+#define ZT_TRACE_EVENT(_event, _fields, ...)                   \
+    do {                                                       \
+        const struct _fields __fields = {__VA_ARGS__};         \
+        __zt_trace(_event, &__fields, sizeof(__fields));       \
+    } while (0)
+#else
+#define ZT_TRACE_EVENT(_event, _fields, ...)
+#endif
+
+#define ZT_TRACE_PUB_ENTER_HOOK(_channel) \
+    ZT_TRACE_EVENT(ZT_TRACE_PUB_ENTER, __zt_trace_channel, _channel)
+#define ZT_TRACE_PUB_EXIT_HOOK(_channel, _error) \
+    ZT_TRACE_EVENT(ZT_TRACE_PUB_EXIT, __zt_trace_pub_exit, _channel, _error)
+#define ZT_TRACE_ENQUEUE_HOOK(_channel, _dispatcher)                   \
+    ZT_TRACE_EVENT(ZT_TRACE_ENQUEUE, __zt_trace_enqueue, _channel, \
+                   (_dispatcher) - __zt_dispatchers)
+#define ZT_TRACE_DISPATCH_START_HOOK(_channel, _service, _dispatcher)                    \
+    ZT_TRACE_EVENT(ZT_TRACE_DISPATCH_START, __zt_trace_dispatch, _channel, (_service)->id, \
+                   (_dispatcher) - __zt_dispatchers)
+#define ZT_TRACE_DISPATCH_END_HOOK(_channel, _service, _dispatcher)                    \
+    ZT_TRACE_EVENT(ZT_TRACE_DISPATCH_END, __zt_trace_dispatch, _channel, (_service)->id, \
+                   (_dispatcher) - __zt_dispatchers)
+#define ZT_TRACE_STORAGE_FLUSH_HOOK(_writes, _bytes) \
+    ZT_TRACE_EVENT(ZT_TRACE_STORAGE_FLUSH, __zt_trace_flush, _writes, _bytes)
+
+// <ZT_CODE_INJECTION>$channels_relations// </ZT_CODE_INJECTION>
+
+// <ZT_CODE_INJECTION>$services_table// </ZT_CODE_INJECTION>
 
 // <ZT_CODE_INJECTION>$channels_creation// </ZT_CODE_INJECTION>
 
 const char *zt_channel_name(zt_channel_e id, int *error)
 {
     if (id < ZT_CHANNEL_COUNT) {
-        zt_channel_t *p = &__zt_channels[id];
+#ifdef CONFIG_ZETA_CHANNEL_NAMES
         if (error) {
             *error = 0;
         }
-        return p->name;
+        return __zt_channels[id].name;
+#else
+        if (error) {
+            *error = -ENOTSUP;
+        }
+        return NULL;
+#endif
     } else {
         LOG_INF("The channel #%d there isn't!", id);
         if (error) {
@@ -61,7 +214,7 @@ const char *zt_channel_name(zt_channel_e id, int *error)
 size_t zt_channel_size(zt_channel_e id, int *error)
 {
     if (id < ZT_CHANNEL_COUNT) {
-        zt_channel_t *p = &__zt_channels[id];
+        const zt_channel_t *p = &__zt_channels[id];
         if (error) {
             *error = 0;
         }
@@ -75,19 +228,129 @@ size_t zt_channel_size(zt_channel_e id, int *error)
     }
 }
 
+/**
+ * @brief Copy the channel data. The channels data are naturally aligned
+ * on the pool, so 2, 4 and 8 bytes channels are copied with a single
+ * access when the other buffer is aligned as well.
+ *
+ * @param dst Destination buffer
+ * @param src Source buffer
+ * @param size Channel size
+ */
+static inline void __zt_copy(u8_t *dst, const u8_t *src, size_t size)
+{
+    uintptr_t alignment = (uintptr_t) dst | (uintptr_t) src;
+    if (size == sizeof(u32_t) && (alignment & (sizeof(u32_t) - 1)) == 0) {
+        *(u32_t *) dst = *(const u32_t *) src;
+    } else if (size == sizeof(u16_t) && (alignment & (sizeof(u16_t) - 1)) == 0) {
+        *(u16_t *) dst = *(const u16_t *) src;
+    } else if (size == sizeof(u64_t) && (alignment & (sizeof(u64_t) - 1)) == 0) {
+        *(u64_t *) dst = *(const u64_t *) src;
+    } else {
+        memcpy(dst, src, size);
+    }
+}
+
+/**
+ * @brief Lock the channel against other writers. Seqlock channels keep
+ * the scheduler locked while they are written, so the writers never
+ * wait for the readers.
+ *
+ * @param channel Channel reference
+ * @param timeout Time waiting for the semaphore of sem channels
+ *
+ * @return 0 on success or -EBUSY if the semaphore was not taken
+ */
+static int __zt_channel_lock(const zt_channel_t *channel, k_timeout_t timeout)
+{
+    if (channel->seq != NULL) {
+        k_sched_lock();
+        return 0;
+    }
+    if (k_sem_take(channel->sem, timeout) != 0) {
+        ZT_STATS_INC(channel->id, sem_timeouts);
+        return -EBUSY;
+    }
+    return 0;
+}
+
+static void __zt_channel_unlock(const zt_channel_t *channel)
+{
+    if (channel->seq != NULL) {
+        k_sched_unlock();
+    } else {
+        k_sem_give(channel->sem);
+    }
+}
+
+/**
+ * @brief Write the channel data. It must be called with the channel
+ * locked. On seqlock channels the sequence counter is odd while the
+ * data is being changed.
+ *
+ * @param channel Channel reference
+ * @param value New channel data
+ */
+static void __zt_channel_write(const zt_channel_t *channel, const u8_t *value)
+{
+    if (channel->seq != NULL) {
+        atomic_inc(channel->seq);
+        __zt_copy(channel->data, value, channel->size);
+        atomic_inc(channel->seq);
+    } else {
+        __zt_copy(channel->data, value, channel->size);
+    }
+}
+
+/**
+ * @brief Copy the channel data. Seqlock channels are read without
+ * locking: the copy is retried while a writer changes the data in
+ * between.
+ *
+ * @param channel Channel reference
+ * @param value Buffer with the channel size
+ * @param timeout Time waiting for the semaphore of sem channels
+ *
+ * @return 0 on success, -EBUSY if the semaphore was not taken or -EAGAIN
+ * if a seqlock channel is read by an ISR that interrupted its writer
+ */
+static int __zt_channel_read(const zt_channel_t *channel, u8_t *value, k_timeout_t timeout)
+{
+    if (channel->seq != NULL) {
+        atomic_val_t seq;
+        do {
+            seq = atomic_get(channel->seq);
+            if (seq & 1) {
+                if (k_is_in_isr()) {
+                    return -EAGAIN;
+                }
+                continue;
+            }
+            __zt_copy(value, channel->data, channel->size);
+        } while ((seq & 1) || atomic_get(channel->seq) != seq);
+        return 0;
+    }
+    if (k_sem_take(channel->sem, timeout) != 0) {
+        ZT_STATS_INC(channel->id, sem_timeouts);
+        return -EBUSY;
+    }
+    __zt_copy(value, channel->data, channel->size);
+    k_sem_give(channel->sem);
+    return 0;
+}
+
 int zt_chan_read(zt_channel_e id, zt_data_t *channel_data)
 {
     if (id < ZT_CHANNEL_COUNT) {
-        zt_channel_t *channel = &__zt_channels[id];
+        int error             = 0;
+        const zt_channel_t *channel = &__zt_channels[id];
         ZT_CHECK_VAL(channel_data, NULL, -EFAULT,
                      "publish function was called with channel_value paramater as NULL!");
         ZT_CHECK(channel_data->bytes.size != channel->size, -EINVAL,
                  "channel #%d has a different size!(%d)(%d)", id,
                  channel_data->bytes.size, channel->size);
-        ZT_CHECK(k_sem_take(channel->sem, K_MSEC(200)) != 0, -EBUSY,
-                 "Could not read the channel. Channel is busy");
-        memcpy(channel_data->bytes.value, channel->data, channel->size);
-        k_sem_give(channel->sem);
+        error = __zt_channel_read(channel, channel_data->bytes.value, K_MSEC(200));
+        ZT_CHECK(error != 0, error, "Could not read the channel. Channel is busy");
         return 0;
     } else {
         LOG_INF("The channel #%d was not found!", id);
@@ -95,67 +358,362 @@ int zt_chan_read(zt_channel_e id, zt_data_t *channel_data)
     }
 }
 
-int zt_chan_pub(zt_channel_e id, zt_data_t *channel_data)
+/**
+ * @brief Check if the current thread belongs to a service allowed to
+ * publish on the channel. The service index is read from the thread
+ * custom data reserved by ZT_SERVICE_INIT and checked against the
+ * service thread id on the services table.
+ *
+ * @param channel Channel reference
+ *
+ * @return true if the current service is a channel publisher
+ */
+static inline bool __zt_is_publisher(const zt_channel_t *channel)
 {
-    if (id < ZT_CHANNEL_COUNT) {
-        int error             = 0;
-        zt_channel_t *channel = &__zt_channels[id];
-        zt_service_t **pub;
+    uintptr_t service = (uintptr_t) k_thread_custom_data_get();
+    if (service == 0 || service > ZT_SERVICE_COUNT) {
+        return false;
+    }
+    service -= 1;
+    if (*__zt_services[service]->thread_id != k_current_get()) {
+        return false;
+    }
+    return (channel->pub_mask[service >> 3] & BIT(service & 0x7)) != 0;
+}
 
-        for (pub = channel->publishers; *pub != NULL; ++pub) {
-            if ((*(*pub)->thread_id) == k_current_get()) {
-                break;
-            }
+/**
+ * @brief Notify every dispatcher that has subscribers of the channel
+ * that the channel has changed.
+ *
+ * @param channel Channel reference
+ *
+ * @return Error code of the last failed notification or 0
+ */
+static int __zt_notify_dispatchers(const zt_channel_t *channel)
+{
+    int error = 0;
+    for (const zt_route_t *route = channel->routes; route->dispatcher != NULL; ++route) {
+        ZT_TRACE_ENQUEUE_HOOK(channel->id, route->dispatcher);
+#if ZT_DISPATCH_COALESCING
+        if (!atomic_test_and_set_bit(route->dispatcher->pending, channel->id)) {
+            k_sem_give(route->dispatcher->event);
         }
-        ZT_CHECK_VAL(*pub, NULL, -EACCES,
-                     "The current thread has not the permission to change channel #%d!",
-                     id);
+#else
+        zt_channel_e id = channel->id;
+        atomic_set_bit(route->dispatcher->pending, id);
+        if (k_msgq_put(route->dispatcher->msgq, &id, K_MSEC(500)) != 0) {
+            LOG_INF("[Channel #%d] Error sending channels change message to ZT "
+                    "thread!",
+                    channel->id);
+            ZT_STATS_INC(channel->id, queue_drops);
+            error = -EAGAIN;
+        }
+#endif
+    }
+    return error;
+}
+
+/**
+ * @brief Write the channel value and notify the dispatchers.
+ *
+ * @param channel Channel reference
+ * @param value New channel data
+ *
+ * @return Error code
+ */
+static inline int __zt_chan_update(const zt_channel_t *channel, const u8_t *value)
+{
+    ZT_CHECK(__zt_channel_lock(channel, K_MSEC(200)) != 0, -EBUSY,
+             "Could not publish the channel. Channel is busy");
+    ZT_STATS_INC(channel->id, publishes);
+    if (channel->flag.field.on_changed) {  // CHANGE
+        if (memcmp(channel->data, value, channel->size) == 0) {
+            ZT_STATS_INC(channel->id, suppressed);
+            __zt_channel_unlock(channel);
+            return 0;
+        }
+    }
+    __zt_channel_write(channel, value);
+    if (channel->persistent) {
+        atomic_set_bit(__zt_channels_pend_persistent, channel->id);
+    }
+    __zt_channel_unlock(channel);
+    return __zt_notify_dispatchers(channel);
+}
+
+/**
+ * @brief Publish the channel value already checked to have the channel
+ * size and to be published by the current service. It is inlined by the
+ * typed publish functions, so the channel fields are constants there.
+ *
+ * @param channel Channel reference
+ * @param value New channel data
+ *
+ * @return Error code
+ */
+static inline int __zt_chan_pub(const zt_channel_t *channel, const u8_t *value)
+{
+    ZT_TRACE_PUB_ENTER_HOOK(channel->id);
+    int error = __zt_chan_update(channel, value);
+    ZT_TRACE_PUB_EXIT_HOOK(channel->id, error);
+    return error;
+}
+
+int zt_chan_pub(zt_channel_e id, zt_data_t *channel_data)
+{
+    if (id < ZT_CHANNEL_COUNT) {
+        const zt_channel_t *channel = &__zt_channels[id];
+        ZT_CHECK(!__zt_is_publisher(channel), -EACCES,
+                 "The current thread has not the permission to change channel #%d!", id);
         ZT_CHECK_VAL(channel_data, NULL, -EFAULT,
                      "publish function was called with channel_value paramater as NULL!");
         ZT_CHECK(channel->read_only != 0, -EPERM, "The channel #%d is read only!", id);
         ZT_CHECK(channel_data->bytes.size != channel->size, -EINVAL,
                  "The channel #%d has a different size!", id);
-        ZT_CHECK(k_sem_take(channel->sem, K_MSEC(200)) != 0, -EBUSY,
-                 "Could not publish the channel. Channel is busy");
-        if (channel->flag.field.on_changed) {  // CHANGE
-            if (memcmp(channel->data, channel_data->bytes.value, channel->size) == 0) {
-                channel->flag.field.pend_callback = 0;
-                k_sem_give(channel->sem);
-                return 0;
-            }
-        }
-        channel->flag.field.pend_callback = 1;
-        memcpy(channel->data, channel_data->bytes.value, channel->size);
-        error = k_msgq_put(&zt_channels_changed_msgq, (u8_t *) &id, K_MSEC(500));
-        if (error != 0) {
-            LOG_INF("[Channel #%d] Error sending channels change message to ZT "
-                    "thread!",
-                    id);
-        }
-        channel->flag.field.pend_persistent = (channel->persistent) ? 1 : 0;
-        k_sem_give(channel->sem);
-        return error;
+        return __zt_chan_pub(channel, channel_data->bytes.value);
     } else {
         LOG_INF("The channel #%d was not found!", id);
         return -ENODATA;
     }
 }
 
-void __zt_channels_thread(void)
+#if ZT_STATS && !ZT_DISPATCH_COALESCING
+/**
+ * @brief Count a lost batch notification on the changed channels routed
+ * to the dispatcher.
+ *
+ * @param ids Published channels ids
+ * @param count Number of channels
+ * @param changed Bitmap of the channels that were changed
+ * @param dispatcher Dispatcher that was not notified
+ */
+static void __zt_stats_batch_drop(const zt_channel_e *ids, size_t count,
+                                  const atomic_t *changed,
+                                  const zt_dispatcher_t *dispatcher)
 {
-    // <ZT_CODE_INJECTION>$set_publishers    // </ZT_CODE_INJECTION>
+    for (size_t i = 0; i < count; ++i) {
+        if (!atomic_test_bit(changed, ids[i])) {
+            continue;
+        }
+        for (const zt_route_t *route = __zt_channels[ids[i]].routes;
+             route->dispatcher != NULL; ++route) {
+            if (route->dispatcher == dispatcher) {
+                ZT_STATS_INC(ids[i], queue_drops);
+            }
+        }
+    }
+}
+#endif
 
-    // <ZT_CODE_INJECTION>$set_subscribers    // </ZT_CODE_INJECTION>
+/**
+ * @brief Mark the changed channels as pending on their dispatchers and
+ * wake up each dispatcher once. The scheduler is locked while the channels
+ * are marked, so the dispatchers only run after all of them were marked.
+ *
+ * @param ids Published channels ids
+ * @param count Number of channels
+ * @param changed Bitmap of the channels that were changed
+ *
+ * @return Error code of the last failed notification or 0
+ */
+static int __zt_notify_dispatchers_batch(const zt_channel_e *ids, size_t count,
+                                         const atomic_t *changed)
+{
+    int error                         = 0;
+    bool wakeup[ZT_DISPATCHER_COUNT] = {false};
+    /* Every pending flag of the batch is set before any dispatcher runs.
+     * The dispatchers are woken up after the unlock, so a full queue does
+     * not block the threads that need the scheduler lock. */
+    k_sched_lock();
+    for (size_t i = 0; i < count; ++i) {
+        if (!atomic_test_bit(changed, ids[i])) {
+            continue;
+        }
+        for (const zt_route_t *route = __zt_channels[ids[i]].routes;
+             route->dispatcher != NULL; ++route) {
+            ZT_TRACE_ENQUEUE_HOOK(ids[i], route->dispatcher);
+#if ZT_DISPATCH_COALESCING
+            if (!atomic_test_and_set_bit(route->dispatcher->pending, ids[i])) {
+                wakeup[route->dispatcher - __zt_dispatchers] = true;
+            }
+#else
+            atomic_set_bit(route->dispatcher->pending, ids[i]);
+            wakeup[route->dispatcher - __zt_dispatchers] = true;
+#endif
+        }
+    }
+    k_sched_unlock();
+    for (int index = 0; index < ZT_DISPATCHER_COUNT; ++index) {
+        if (!wakeup[index]) {
+            continue;
+        }
+#if ZT_DISPATCH_COALESCING
+        k_sem_give(__zt_dispatchers[index].event);
+#else
+        zt_channel_e scan = ZT_CHANNEL_COUNT;
+        if (k_msgq_put(__zt_dispatchers[index].msgq, &scan, K_MSEC(500)) != 0) {
+            LOG_INF("[Dispatcher #%d] Error sending batch change message to ZT thread!",
+                    index);
+#if ZT_STATS
+            __zt_stats_batch_drop(ids, count, changed, &__zt_dispatchers[index]);
+#endif
+            error = -EAGAIN;
+        }
+#endif
+    }
+    return error;
+}
+
+/**
+ * @brief Write the batch channels values, already checked, and notify
+ * the dispatchers.
+ *
+ * @param ids Channels Ids, in ascending order and without repetition
+ * @param channels_data pointers to the zt_data_t of each channel.
+ * @param count Number of channels
+ *
+ * @return Error code
+ */
+static int __zt_chan_update_batch(const zt_channel_e *ids, zt_data_t **channels_data,
+                                  size_t count)
+{
+    size_t locked = 0;
+    ATOMIC_DEFINE(changed, ZT_CHANNEL_COUNT) = {0};
+    /* The channels are locked in ascending order, so batches never deadlock */
+    for (; locked < count; ++locked) {
+        if (__zt_channel_lock(&__zt_channels[ids[locked]], K_MSEC(200)) != 0) {
+            while (locked > 0) {
+                __zt_channel_unlock(&__zt_channels[ids[--locked]]);
+            }
+            LOG_INF("Could not publish the batch. Channel is busy");
+            return -EBUSY;
+        }
+    }
+    for (size_t i = 0; i < count; ++i) {
+        const zt_channel_t *channel = &__zt_channels[ids[i]];
+        ZT_STATS_INC(ids[i], publishes);
+        if (channel->flag.field.on_changed
+            && memcmp(channel->data, channels_data[i]->bytes.value, channel->size) == 0) {
+            ZT_STATS_INC(ids[i], suppressed);
+            continue;
+        }
+        __zt_channel_write(channel, channels_data[i]->bytes.value);
+        if (channel->persistent) {
+            atomic_set_bit(__zt_channels_pend_persistent, ids[i]);
+        }
+        atomic_set_bit(changed, ids[i]);
+    }
+    while (locked > 0) {
+        __zt_channel_unlock(&__zt_channels[ids[--locked]]);
+    }
+    return __zt_notify_dispatchers_batch(ids, count, changed);
+}
+
+int zt_chan_pub_batch(const zt_channel_e *ids, zt_data_t **channels_data, size_t count)
+{
+    ZT_CHECK_VAL(ids, NULL, -EFAULT, "batch publish function was called with ids as NULL!");
+    ZT_CHECK_VAL(channels_data, NULL, -EFAULT,
+                 "batch publish function was called with channels_data as NULL!");
+    for (size_t i = 0; i < count; ++i) {
+        ZT_CHECK(ids[i] >= ZT_CHANNEL_COUNT, -ENODATA, "The channel #%d was not found!",
+                 ids[i]);
+        ZT_CHECK(i > 0 && ids[i] <= ids[i - 1], -EINVAL,
+                 "The batch channels must be sorted and unique (#%d)!", ids[i]);
+        const zt_channel_t *channel = &__zt_channels[ids[i]];
+        ZT_CHECK(!__zt_is_publisher(channel), -EACCES,
+                 "The current thread has not the permission to change channel #%d!",
+                 ids[i]);
+        ZT_CHECK_VAL(channels_data[i], NULL, -EFAULT,
+                     "batch publish function was called with a NULL channel value!");
+        ZT_CHECK(channel->read_only != 0, -EPERM, "The channel #%d is read only!", ids[i]);
+        ZT_CHECK(channels_data[i]->bytes.size != channel->size, -EINVAL,
+                 "The channel #%d has a different size!", ids[i]);
+    }
+    for (size_t i = 0; i < count; ++i) {
+        ZT_TRACE_PUB_ENTER_HOOK(ids[i]);
+    }
+    int error = __zt_chan_update_batch(ids, channels_data, count);
+    for (size_t i = 0; i < count; ++i) {
+        ZT_TRACE_PUB_EXIT_HOOK(ids[i], error);
+    }
+    return error;
+}
+
+/**
+ * @brief Call the service callback, measuring its duration when the
+ * stats are enabled and tracing it when the trace is enabled.
+ *
+ * @param dispatcher Dispatcher that calls the callback
+ * @param service Subscriber service
+ * @param id Changed channel Id
+ */
+static inline void __zt_callback(zt_dispatcher_t *dispatcher, const zt_service_t *service,
+                                 zt_channel_e id)
+{
+    ZT_TRACE_DISPATCH_START_HOOK(id, service, dispatcher);
+#if ZT_STATS
+    u32_t start = k_cycle_get_32();
+    service->cb(id);
+    u32_t cycles = k_cycle_get_32() - start;
+    __zt_services_stats[service->id].callbacks++;
+    __zt_services_stats[service->id].callback_time += cycles;
+    if (cycles > __zt_services_stats[service->id].callback_max) {
+        __zt_services_stats[service->id].callback_max = cycles;
+    }
+#else
+    service->cb(id);
+#endif
+    ZT_TRACE_DISPATCH_END_HOOK(id, service, dispatcher);
+}
+
+static void __zt_dispatch(zt_dispatcher_t *dispatcher, const zt_channel_t *channel)
+{
+    for (const zt_route_t *route = channel->routes; route->dispatcher != NULL; ++route) {
+        if (route->dispatcher == dispatcher) {
+            for (zt_service_t *const *s = route->subscribers; *s != NULL; ++s) {
+                __zt_callback(dispatcher, *s, channel->id);
+            }
+            return;
+        }
+    }
+}
+
+/**
+ * @brief Call the callbacks of every channel with the pending bit set on
+ * the dispatcher, clearing the bits.
+ *
+ * @param dispatcher Dispatcher reference
+ */
+static void __zt_dispatch_pending(zt_dispatcher_t *dispatcher)
+{
+    for (int word = 0; word < ZT_PENDING_WORDS; ++word) {
+        atomic_val_t pending = atomic_clear(&dispatcher->pending[word]);
+        while (pending) {
+            int bit = __builtin_ctzl(pending);
+            pending &= ~BIT(bit);
+            __zt_dispatch(dispatcher, &__zt_channels[word * ATOMIC_BITS + bit]);
+        }
+    }
+}
 
+static void __zt_dispatcher_thread(void *p1, void *p2, void *p3)
+{
+    zt_dispatcher_t *dispatcher = (zt_dispatcher_t *) p1;
+#if ZT_DISPATCH_COALESCING
+    while (1) {
+        k_sem_take(dispatcher->event, K_FOREVER);
+        __zt_dispatch_pending(dispatcher);
+    }
+#else
     u8_t id = 0;
     while (1) {
-        k_msgq_get(&zt_channels_changed_msgq, &id, K_FOREVER);
-        if (id < ZT_CHANNEL_COUNT) {
-            if (__zt_channels[id].flag.field.pend_callback) {
-                for (zt_service_t **s = __zt_channels[id].subscribers; *s != NULL; ++s) {
-                    (*s)->cb(id);
-                }
-                __zt_channels[id].flag.field.pend_callback = 0;
+        k_msgq_get(dispatcher->msgq, &id, K_FOREVER);
+        if (id == ZT_CHANNEL_COUNT) {
+            /* Sent by a batch publish, every pending channel is dispatched */
+            __zt_dispatch_pending(dispatcher);
+        } else if (id < ZT_CHANNEL_COUNT) {
+            if (atomic_test_and_clear_bit(dispatcher->pending, id)) {
+                __zt_dispatch(dispatcher, &__zt_channels[id]);
             } else {
                 LOG_INF("[ZT-THREAD]: Received pend_callback from a channel(#%d) "
                         "without changes!",
@@ -165,66 +723,297 @@ void __zt_channels_thread(void)
             LOG_INF("[ZT-THREAD]: Received an invalid ID channel #%d", id);
         }
     }
+#endif
 }
 
 #ifdef CONFIG_ZETA_STORAGE
 
+#ifdef CONFIG_ZETA_STORAGE_NVS_SIM
+
+/**
+ * @brief RAM simulator of the NVS backend. Each record id keeps only its
+ * last value and, as the NVS does, a write of the value already stored
+ * returns 0 and writes nothing.
+ */
+static u8_t __zt_nvs_sim_memory[ZT_STORAGE_SIM_SIZE];
+static size_t __zt_nvs_sim_used = 0;
+static struct {
+    u16_t offset;
+    u16_t len;
+} __zt_nvs_sim_records[ZT_STORAGE_PACKED_ID + 1];
+
+static int __zt_nvs_init(void)
+{
+    memset(__zt_nvs_sim_records, 0, sizeof(__zt_nvs_sim_records));
+    __zt_nvs_sim_used = 0;
+    return 0;
+}
+
+static ssize_t __zt_nvs_read(u16_t id, void *data, size_t len)
+{
+    if (id > ZT_STORAGE_PACKED_ID || __zt_nvs_sim_records[id].len == 0) {
+        return -ENOENT;
+    }
+    memcpy(data, &__zt_nvs_sim_memory[__zt_nvs_sim_records[id].offset],
+           MIN(len, __zt_nvs_sim_records[id].len));
+    return __zt_nvs_sim_records[id].len;
+}
+
+static ssize_t __zt_nvs_write(u16_t id, const void *data, size_t len)
+{
+    if (id > ZT_STORAGE_PACKED_ID || len == 0) {
+        return -EINVAL;
+    }
+    if (__zt_nvs_sim_records[id].len == 0) {
+        if (__zt_nvs_sim_used + len > ZT_STORAGE_SIM_SIZE) {
+            return -ENOSPC;
+        }
+        __zt_nvs_sim_records[id].offset = __zt_nvs_sim_used;
+        __zt_nvs_sim_records[id].len    = len;
+        __zt_nvs_sim_used += len;
+    } else if (__zt_nvs_sim_records[id].len != len) {
+        return -EINVAL;
+    } else if (memcmp(&__zt_nvs_sim_memory[__zt_nvs_sim_records[id].offset], data, len)
+               == 0) {
+        return 0;
+    }
+    memcpy(&__zt_nvs_sim_memory[__zt_nvs_sim_records[id].offset], data, len);
+    return len;
+}
+
+#else
+
+static int __zt_nvs_init(void)
+{
+    struct flash_pages_info info;
+    zt_fs.offset = FLASH_AREA_OFFSET(NVS_STORAGE_PARTITION);
+    int rc       = flash_get_page_info_by_offs(
+        device_get_binding(DT_CHOSEN_ZEPHYR_FLASH_CONTROLLER_LABEL), zt_fs.offset, &info);
+    if (rc) {
+        printk("Unable to get page info");
+    }
+    zt_fs.sector_size  = info.size;
+    zt_fs.sector_count = NVS_SECTOR_COUNT;
+    return nvs_init(&zt_fs, DT_CHOSEN_ZEPHYR_FLASH_CONTROLLER_LABEL);
+}
+
+static ssize_t __zt_nvs_read(u16_t id, void *data, size_t len)
+{
+    return nvs_read(&zt_fs, id, data, len);
+}
+
+static ssize_t __zt_nvs_write(u16_t id, const void *data, size_t len)
+{
+    return nvs_write(&zt_fs, id, data, len);
+}
+
+#endif
+
+#if ZT_STORAGE_PACKED
+/**
+ * @brief Record with the data of all the persistent channels. The data is
+ * a copy of the persistent region at the start of the channels data pool,
+ * so each channel has the same offset on both. The layout key identifies
+ * the channels names and sizes the record was stored with.
+ */
+static struct {
+    u32_t layout_key;
+    u8_t data[ZT_STORAGE_RECORD_SIZE] __aligned(8);
+} __zt_storage_record;
+#define ZT_STORAGE_RECORD_DATA(channel) \
+    (&__zt_storage_record.data[(channel)->data - __zt_channels_pool])
+#else
+/**
+ * @brief Scratch buffer used to move the channels data from and to the
+ * flash without keeping the channels locked during the flash access.
+ */
+static u8_t __zt_storage_buffer[UINT8_MAX];
+#endif
+
+#if ZT_STORAGE_RATE_LIMIT
+static u32_t __zt_storage_last_write[ZT_CHANNEL_COUNT];
+#endif
+
+static struct zt_storage_stats __zt_storage_stats;
+
+/**
+ * @brief Check if the minimum interval between two flash writes of the
+ * channel has elapsed.
+ *
+ * @param id Channel Id
+ * @param now Current uptime in ms
+ *
+ * @return true if the channel can be written
+ */
+static inline bool __zt_storage_is_due(zt_channel_e id, u32_t now)
+{
+#if ZT_STORAGE_RATE_LIMIT
+    return (now - __zt_storage_last_write[id]) >= __zt_storage_min_interval[id];
+#else
+    return true;
+#endif
+}
+
+static inline void __zt_storage_written(zt_channel_e id, u32_t now)
+{
+#if ZT_STORAGE_RATE_LIMIT
+    __zt_storage_last_write[id] = now;
+#endif
+}
+
 static void __zt_recover_data_from_flash(void)
 {
     int rc = 0;
     LOG_INF("[ ] Recovering data from flash");
+#if ZT_STORAGE_PACKED
+    rc = __zt_nvs_read(ZT_STORAGE_PACKED_ID, &__zt_storage_record,
+                       sizeof(__zt_storage_record));
+    if (rc != sizeof(__zt_storage_record)
+        || __zt_storage_record.layout_key != ZT_STORAGE_LAYOUT_KEY) {
+        LOG_INF("No valid record found for the persistent channels");
+        memset(&__zt_storage_record, 0, sizeof(__zt_storage_record));
+        return;
+    }
+#endif
     for (u16_t id = 0; id < ZT_CHANNEL_COUNT; ++id) {
-        if (__zt_channels[id].persistent) {
-            if (!k_sem_take(__zt_channels[id].sem, K_SECONDS(5))) {
-                rc = nvs_read(&zt_fs, id, __zt_channels[id].data, __zt_channels[id].size);
-                if (rc > 0) { /* item was found, show it */
-                    LOG_INF("Id: %d", id);
-                    LOG_HEXDUMP_INF(__zt_channels[id].data, __zt_channels[id].size,
-                                    "Value: ");
-                } else { /* item was not found, add it */
-                    LOG_INF("No values found for channel #%d", id);
-                }
-                k_sem_give(__zt_channels[id].sem);
-            } else {
-                LOG_INF("Could not recover the channel. Channel is busy");
-            }
+        const zt_channel_t *channel = &__zt_channels[id];
+        if (!channel->persistent) {
+            continue;
+        }
+#if ZT_STORAGE_PACKED
+        u8_t *value = ZT_STORAGE_RECORD_DATA(channel);
+#else
+        u8_t *value = __zt_storage_buffer;
+        rc          = __zt_nvs_read(id, value, channel->size);
+        if (rc <= 0) { /* item was not found */
+            LOG_INF("No values found for channel #%d", id);
+            continue;
+        }
+#endif
+        if (!__zt_channel_lock(channel, K_SECONDS(5))) {
+            __zt_channel_write(channel, value);
+            __zt_channel_unlock(channel);
+            LOG_INF("Id: %d", id);
+            LOG_HEXDUMP_INF(value, channel->size, "Value: ");
+        } else {
+            LOG_INF("Could not recover the channel. Channel is busy");
         }
     }
     LOG_INF("[X] Recovering data from flash");
 }
 
-static void __zt_persist_data_on_flash(void)
+/**
+ * @brief Copy the channel to the buffer clearing its pending flag. The
+ * flag is restored if the copy fails and it was set, the caller restores
+ * it if the later write fails.
+ *
+ * @return 1 if the channel was pending, 0 if it was not and -EBUSY if the
+ * channel could not be read
+ */
+static int __zt_storage_take(const zt_channel_t *channel, u8_t *value)
+{
+    bool pending = atomic_test_and_clear_bit(__zt_channels_pend_persistent, channel->id);
+    if (__zt_channel_read(channel, value, K_SECONDS(5)) != 0) {
+        if (pending) {
+            atomic_set_bit(__zt_channels_pend_persistent, channel->id);
+        }
+        LOG_INF("Could not persist the channel. Channel is busy");
+        return -EBUSY;
+    }
+    return pending;
+}
+
+/**
+ * @brief Write the pending persistent channels on the flash. On packed
+ * mode a single record with every persistent channel is written when
+ * any pending channel is due.
+ *
+ * @param force Ignores the channels minimum write interval
+ */
+static void __zt_persist_data_on_flash(bool force)
 {
-    int bytes_written = 0;
+    ssize_t bytes_written = 0;
+    u32_t now             = k_uptime_get_32();
+#if ZT_STORAGE_PACKED
+    bool due = false;
+    for (u16_t id = 0; id < ZT_CHANNEL_COUNT && !due; ++id) {
+        due = atomic_test_bit(__zt_channels_pend_persistent, id)
+              && (force || __zt_storage_is_due(id, now));
+    }
+    if (!due) {
+        return;
+    }
+    /* Only the pending flags cleared here are restored if the write fails */
+    ATOMIC_DEFINE(taken, ZT_CHANNEL_COUNT) = {0};
+    for (u16_t id = 0; id < ZT_CHANNEL_COUNT && bytes_written >= 0; ++id) {
+        const zt_channel_t *channel = &__zt_channels[id];
+        if (channel->persistent) {
+            bytes_written = __zt_storage_take(channel, ZT_STORAGE_RECORD_DATA(channel));
+            if (bytes_written > 0) {
+                atomic_set_bit(taken, id);
+            }
+        }
+    }
+    if (bytes_written >= 0) {
+        __zt_storage_record.layout_key = ZT_STORAGE_LAYOUT_KEY;
+        bytes_written = __zt_nvs_write(ZT_STORAGE_PACKED_ID, &__zt_storage_record,
+                                       sizeof(__zt_storage_record));
+    }
+    if (bytes_written < 0) {
+        LOG_INF("persistent channels record could not be stored");
+    }
+    for (u16_t id = 0; id < ZT_CHANNEL_COUNT; ++id) {
+        if (bytes_written < 0) {
+            if (atomic_test_bit(taken, id)) {
+                atomic_set_bit(__zt_channels_pend_persistent, id);
+            }
+        } else if (__zt_channels[id].persistent) {
+            __zt_storage_written(id, now);
+        }
+    }
+    if (bytes_written > 0) {
+        __zt_storage_stats.flushes++;
+        __zt_storage_stats.writes++;
+        __zt_storage_stats.bytes_written += bytes_written;
+        ZT_TRACE_STORAGE_FLUSH_HOOK(1, bytes_written);
+        LOG_INF("persistent channels record updated on the flash");
+    }
+#else
+    u32_t writes = 0;
+    u32_t bytes  = 0;
     for (u16_t id = 0; id < ZT_CHANNEL_COUNT; ++id) {
-        if (__zt_channels[id].persistent
-            && __zt_channels[id].flag.field.pend_persistent) {
-            bytes_written =
-                nvs_write(&zt_fs, id, __zt_channels[id].data, __zt_channels[id].size);
+        const zt_channel_t *channel = &__zt_channels[id];
+        if (atomic_test_bit(__zt_channels_pend_persistent, id)
+            && (force || __zt_storage_is_due(id, now))) {
+            if (__zt_storage_take(channel, __zt_storage_buffer) < 0) {
+                continue;
+            }
+            bytes_written = __zt_nvs_write(id, __zt_storage_buffer, channel->size);
             if (bytes_written > 0) { /* item was found and updated*/
-                __zt_channels[id].flag.field.pend_persistent = 0;
+                __zt_storage_written(id, now);
+                writes++;
+                bytes += bytes_written;
                 LOG_INF("channel #%d value updated on the flash", id);
             } else if (bytes_written == 0) {
                 /* LOG_INF("channel #%d value is already on the flash.", id); */
             } else { /* item was not found, add it */
+                atomic_set_bit(__zt_channels_pend_persistent, id);
                 LOG_INF("channel #%d could not be stored", id);
             }
         }
     }
+    if (writes > 0) {
+        __zt_storage_stats.flushes++;
+        __zt_storage_stats.writes += writes;
+        __zt_storage_stats.bytes_written += bytes;
+        ZT_TRACE_STORAGE_FLUSH_HOOK(writes, bytes);
+    }
+#endif
 }
 
 void __zt_storage_thread(void)
 {
-    struct flash_pages_info info;
-    zt_fs.offset = FLASH_AREA_OFFSET(NVS_STORAGE_PARTITION);
-    int rc       = flash_get_page_info_by_offs(
-        device_get_binding(DT_CHOSEN_ZEPHYR_FLASH_CONTROLLER_LABEL), zt_fs.offset, &info);
-    if (rc) {
-        printk("Unable to get page info");
-    }
-    zt_fs.sector_size  = info.size;
-    zt_fs.sector_count = NVS_SECTOR_COUNT;
-    rc                 = nvs_init(&zt_fs, DT_CHOSEN_ZEPHYR_FLASH_CONTROLLER_LABEL);
+    int rc = __zt_nvs_init();
     if (rc) {
         LOG_INF("Flash Init failed");
     } else {
@@ -233,9 +1022,200 @@ void __zt_storage_thread(void)
     __zt_recover_data_from_flash();
 
     while (1) {
-        k_sleep(K_SECONDS(ZT_STORAGE_SLEEP_TIME));
-        __zt_persist_data_on_flash();
+        bool force = k_sem_take(&zt_storage_flush_sem, K_SECONDS(ZT_STORAGE_SLEEP_TIME)) == 0;
+        __zt_persist_data_on_flash(force);
+        if (force) {
+            k_sem_give(&zt_storage_done_sem);
+        }
+    }
+}
+
+#endif
+
+int zt_storage_flush(k_timeout_t timeout)
+{
+#ifdef CONFIG_ZETA_STORAGE
+    int error = 0;
+    ZT_CHECK(k_mutex_lock(&zt_storage_flush_mutex, timeout) != 0, -EBUSY,
+             "Could not flush the storage. Another flush is running");
+    k_sem_reset(&zt_storage_done_sem);
+    k_sem_give(&zt_storage_flush_sem);
+    if (k_sem_take(&zt_storage_done_sem, timeout) != 0) {
+        LOG_INF("The storage flush did not finish in time");
+        error = -EAGAIN;
+    }
+    k_mutex_unlock(&zt_storage_flush_mutex);
+    return error;
+#else
+    return -ENOTSUP;
+#endif
+}
+
+int zt_storage_stats_get(struct zt_storage_stats *stats)
+{
+    ZT_CHECK_VAL(stats, NULL, -EFAULT, "storage stats function was called with NULL!");
+#ifdef CONFIG_ZETA_STORAGE
+    *stats = __zt_storage_stats;
+    return 0;
+#else
+    return -ENOTSUP;
+#endif
+}
+
+#if ZT_STATS
+static void __zt_channel_stats_get(zt_channel_e id, struct zt_channel_stats *stats)
+{
+    stats->publishes    = atomic_get(&__zt_channels_stats[id].publishes);
+    stats->suppressed   = atomic_get(&__zt_channels_stats[id].suppressed);
+    stats->queue_drops  = atomic_get(&__zt_channels_stats[id].queue_drops);
+    stats->sem_timeouts = atomic_get(&__zt_channels_stats[id].sem_timeouts);
+}
+
+/**
+ * @brief Copy the service counters converted to microseconds. The
+ * scheduler is locked, so the dispatcher does not change them halfway.
+ */
+static void __zt_service_stats_get(zt_service_e id, struct zt_service_stats *stats)
+{
+    k_sched_lock();
+    stats->callbacks        = __zt_services_stats[id].callbacks;
+    stats->callback_max_us  = k_cyc_to_us_floor64(__zt_services_stats[id].callback_max);
+    stats->callback_time_us = k_cyc_to_us_floor64(__zt_services_stats[id].callback_time);
+    k_sched_unlock();
+}
+#endif
+
+int zt_stats_get(struct zt_stats *stats)
+{
+    ZT_CHECK_VAL(stats, NULL, -EFAULT, "stats function was called with NULL!");
+#if ZT_STATS
+    for (int id = 0; id < ZT_CHANNEL_COUNT; ++id) {
+        __zt_channel_stats_get(id, &stats->channels[id]);
+    }
+    for (int id = 0; id < ZT_SERVICE_COUNT; ++id) {
+        __zt_service_stats_get(id, &stats->services[id]);
     }
+    return 0;
+#else
+    return -ENOTSUP;
+#endif
 }
 
+#if ZT_TRACE && !ZT_BACKEND_POSIX
+/**
+ * @brief Trace records buffer. The records that do not fit are dropped
+ * until the buffer is read.
+ */
+static u8_t __zt_trace_buffer[ZT_TRACE_BUFFER_SIZE];
+static size_t __zt_trace_used;
+static u32_t __zt_trace_dropped;
 #endif
+
+#if ZT_TRACE
+__weak void zt_trace_emit(const void *record, size_t size)
+{
+#if ZT_BACKEND_POSIX
+    zt_posix_trace_write(record, size);
+#else
+    if (__zt_trace_used + size <= ZT_TRACE_BUFFER_SIZE) {
+        memcpy(&__zt_trace_buffer[__zt_trace_used], record, size);
+        __zt_trace_used += size;
+    } else {
+        __zt_trace_dropped++;
+    }
+#endif
+}
+#endif
+
+size_t zt_trace_read(u8_t *buffer, size_t size)
+{
+#if ZT_TRACE && !ZT_BACKEND_POSIX
+    ZT_CHECK_VAL(buffer, NULL, 0, "trace read function was called with NULL!");
+    unsigned int key = irq_lock();
+    size             = MIN(size, __zt_trace_used);
+    memcpy(buffer, __zt_trace_buffer, size);
+    __zt_trace_used -= size;
+    memmove(__zt_trace_buffer, &__zt_trace_buffer[size], __zt_trace_used);
+    irq_unlock(key);
+    return size;
+#else
+    return 0;
+#endif
+}
+
+#if (ZT_STATS || ZT_TRACE) && defined(CONFIG_ZETA_SHELL)
+
+static int __zt_shell_stats(const struct shell *shell, size_t argc, char **argv)
+{
+#if ZT_STATS
+    struct zt_channel_stats channel;
+    struct zt_service_stats service;
+    shell_print(shell, "%-24s %10s %10s %10s %10s", "channel", "publishes", "suppressed",
+                "drops", "timeouts");
+    for (int id = 0; id < ZT_CHANNEL_COUNT; ++id) {
+        const char *name = zt_channel_name(id, NULL);
+        __zt_channel_stats_get(id, &channel);
+        if (name != NULL) {
+            shell_print(shell, "%-24s %10u %10u %10u %10u", name, channel.publishes,
+                        channel.suppressed, channel.queue_drops, channel.sem_timeouts);
+        } else {
+            shell_print(shell, "#%-23d %10u %10u %10u %10u", id, channel.publishes,
+                        channel.suppressed, channel.queue_drops, channel.sem_timeouts);
+        }
+    }
+    shell_print(shell, "%-24s %10s %10s %10s %10s", "service", "callbacks", "mean_us",
+                "max_us", "total_ms");
+    for (int id = 0; id < ZT_SERVICE_COUNT; ++id) {
+        __zt_service_stats_get(id, &service);
+        shell_print(shell, "%-24s %10u %10u %10u %10u", __zt_services[id]->name,
+                    service.callbacks,
+                    service.callbacks
+                        ? (u32_t)(service.callback_time_us / service.callbacks)
+                        : 0,
+                    service.callback_max_us, (u32_t)(service.callback_time_us / 1000));
+    }
+    return 0;
+#else
+    shell_error(shell, "The stats are disabled on the zeta.yaml");
+    return -ENOTSUP;
+#endif
+}
+
+/**
+ * @brief Dump the trace records as hexadecimal lines, which are turned
+ * back into the CTF stream by the zeta-trace analyzer.
+ */
+static int __zt_shell_trace(const struct shell *shell, size_t argc, char **argv)
+{
+#if ZT_TRACE && !ZT_BACKEND_POSIX
+    u8_t chunk[32];
+    char line[2 * sizeof(chunk) + 1];
+    size_t size      = 0;
+    unsigned int key = irq_lock();
+    u32_t dropped    = __zt_trace_dropped;
+    __zt_trace_dropped = 0;
+    irq_unlock(key);
+    while ((size = zt_trace_read(chunk, sizeof(chunk))) > 0) {
+        for (size_t i = 0; i < size; ++i) {
+            snprintk(&line[2 * i], 3, "%02x", chunk[i]);
+        }
+        shell_print(shell, "ZT_TRACE %s", line);
+    }
+    shell_print(shell, "ZT_TRACE_DROPPED %u", dropped);
+    return 0;
+#else
+    shell_error(shell, "The trace is disabled on the zeta.yaml");
+    return -ENOTSUP;
+#endif
+}
+
+SHELL_STATIC_SUBCMD_SET_CREATE(__zt_shell_commands,
+                               SHELL_CMD(stats, NULL, "Dump the channels and services counters",
+                                         __zt_shell_stats),
+                               SHELL_CMD(trace, NULL, "Dump and clear the trace records",
+                                         __zt_shell_trace),
+                               SHELL_SUBCMD_SET_END);
+SHELL_CMD_REGISTER(zeta, &__zt_shell_commands, "Zeta commands", NULL);
+#endif
+
+// <ZT_CODE_INJECTION>$channels_accessors// </ZT_CODE_INJECTION>
@@ -4,13 +4,29 @@
 # ################################################################# #
 message("[ZETA]: Running zeta.cmake")
 
-execute_process(COMMAND zeta gen -b "$${CMAKE_CURRENT_LIST_DIR}/build"
-                        $${CMAKE_CURRENT_LIST_DIR}/zeta.yaml RESULT_VARIABLE ztcli_gen_exit_code)
+# configure: zeta gen runs at every configure.
+# build: zeta gen runs at configure only to bootstrap the files, and after
+# that at build time (zeta/CMakeLists.txt), when any of the inputs listed
+# on the depfile changes.
+set(ZETA_GEN_MODE "configure" CACHE STRING "When zeta gen runs: configure or build")
+set_property(CACHE ZETA_GEN_MODE PROPERTY STRINGS configure build)
+set(ZETA_YAML_FILE "$${CMAKE_CURRENT_LIST_DIR}/zeta.yaml")
+set(ZETA_BUILD_DIR "$${CMAKE_CURRENT_LIST_DIR}/build")
+
+execute_process(COMMAND zeta gen -b "$${ZETA_BUILD_DIR}"
+                        --depfile "$${ZETA_BUILD_DIR}/zeta_gen.d"
+                        "$${ZETA_YAML_FILE}" RESULT_VARIABLE ztcli_gen_exit_code)
 
 if(ztcli_gen_exit_code GREATER 0)
   message( FATAL_ERROR "ZetaCli generation failed with exit code: $${ztcli_gen_exit_code}")
 endif()
 
+if(ZETA_GEN_MODE STREQUAL "build")
+  # zeta.conf is read by Kconfig, so changing it needs a new configure
+  set_property(DIRECTORY APPEND PROPERTY CMAKE_CONFIGURE_DEPENDS
+               "$${ZETA_YAML_FILE}" "$${ZETA_BUILD_DIR}/zeta/zeta.conf")
+endif()
+
 if(CONF_FILE)
   # CONF_FILE has either been specified on the cmake CLI or is already
   # in the CMakeCache.txt. This has precedence over the environment
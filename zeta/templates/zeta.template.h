@@ -7,9 +7,21 @@
 #define ZETA_H_
 
 
+/**
+ * @brief Runtime backend. When it is 1 the kernel API used by Zeta is
+ * provided by the pthread shim of zeta_posix.h instead of Zephyr, so the
+ * generated files can be built and load-tested as a host program.
+ *
+ */
+#define ZT_BACKEND_POSIX $backend_posix
+
 #include <stddef.h>
+#if ZT_BACKEND_POSIX
+#include "zeta_posix.h"
+#else
 #include <zephyr.h>
 #include <zephyr/types.h>
+#endif
 
 /**
  * @brief Stack size that is used in Zeta thread that manages the
@@ -43,9 +55,58 @@
  */
 #define ZT_CHANNELS_THREAD_PRIORITY 0
 
+/**
+ * @brief Dispatchers queue mode. When it is 1 each changed channel is
+ * marked on a pending bitmap and the dispatcher is woken up by a
+ * semaphore, so a channel is queued at most once until it is
+ * dispatched and publish never blocks. When it is 0 the changed
+ * channels ids are put on a message queue.
+ *
+ */
+#define ZT_DISPATCH_COALESCING $dispatch_coalescing
+
+/**
+ * @brief Depth of the dispatchers changed channels message queue.
+ *
+ */
+#define ZT_DISPATCH_QUEUE_DEPTH $queue_depth
+
+/**
+ * @brief Runtime statistics. When it is 1 Zeta counts the publishes,
+ * queue drops and semaphore timeouts of each channel and the callback
+ * calls and durations of each service, see zt_stats_get.
+ *
+ */
+#define ZT_STATS $stats
+
+/**
+ * @brief Trace hooks. When it is 1 Zeta emits a CTF event record on the
+ * publish entry and exit, the dispatchers notification, the start and
+ * end of each subscriber callback and the storage flushes, see
+ * zt_trace_emit.
+ *
+ */
+#define ZT_TRACE $trace
+
+/**
+ * @brief Size of the RAM buffer that keeps the trace records until they
+ * are read by zt_trace_read.
+ *
+ */
+#define ZT_TRACE_BUFFER_SIZE $trace_buffer_size
+
+#if ZT_STATS || ZT_TRACE
+#define ZT_SERVICE_ID(_name) .id = ZT_##_name##_SERVICE,
+#else
+#define ZT_SERVICE_ID(_name)
+#endif
 
 /**
- * @brief Initialize a zeta service.
+ * @brief Initialize a zeta service. The service thread starts on a Zeta
+ * entry that stores the service index (+1) as the thread custom data,
+ * which is used by Zeta to check the publish permission in constant
+ * time. The custom data of the services threads is reserved by Zeta and
+ * must not be changed by the application.
  *
  * @param _name Service name
  * @param _task Task pointer function
@@ -53,10 +114,16 @@
  *
  */
 #define ZT_SERVICE_INIT(_name, _task, _cb)                                          \
-    K_THREAD_DEFINE(_name##_thread_id, _name##_STACK_SIZE, _task, NULL, NULL, NULL, \
-                    _name##_TASK_PRIORITY, 0, 0);                                   \
+    static void _name##_entry(void *p1, void *p2, void *p3)                         \
+    {                                                                               \
+        k_thread_custom_data_set((void *) (uintptr_t)(ZT_##_name##_SERVICE + 1));   \
+        ((k_thread_entry_t) _task)(p1, p2, p3);                                     \
+    }                                                                               \
+    K_THREAD_DEFINE(_name##_thread_id, _name##_STACK_SIZE, _name##_entry, NULL,     \
+                    NULL, NULL, _name##_TASK_PRIORITY, 0, 0);                       \
     zt_service_t _name##_service = {                                                \
-        .name = #_name, .cb = _cb, .thread_id = &_name##_thread_id}
+        ZT_SERVICE_ID(_name) .name = #_name, .cb = _cb,                             \
+        .thread_id = &_name##_thread_id}
 
 
 /**
@@ -238,6 +305,8 @@ typedef union data zt_data_t;
 
 // <ZT_CODE_INJECTION>$channels_enum// </ZT_CODE_INJECTION>
 
+// <ZT_CODE_INJECTION>$services_enum// </ZT_CODE_INJECTION>
+
 /**
  * @brief zeta_callback_f define the callback function type of Zeta.
  *
@@ -253,38 +322,58 @@ struct zt_service {
     const char *name;         /**< Service name */
     const k_tid_t *thread_id; /**< Service thread id */
     zt_callback_f cb;         /**< Service callback */
+#if ZT_STATS || ZT_TRACE
+    zt_service_e id; /**< Service index on the statistics and trace */
+#endif
 };
 typedef struct zt_service zt_service_t;
 
 /**
- * @brief Define pendent options that a channel can have.
+ * @brief Define Zeta dispatcher type. A dispatcher is a thread that
+ * calls the callbacks of the subscribers routed to it.
+ */
+typedef struct zt_dispatcher zt_dispatcher_t;
+
+/**
+ * @brief Define the subscribers of a channel called by one dispatcher.
+ */
+struct zt_route {
+    zt_dispatcher_t *dispatcher;       /**< Dispatcher that calls the subscribers */
+    zt_service_t *const *subscribers; /**< Subscribers routed to the dispatcher */
+};
+typedef struct zt_route zt_route_t;
+
+/**
+ * @brief Define options that a channel can have.
  */
 union flag_data {
     struct {
-        u8_t pend_persistent : 1; /**< Active represent that channel must be saved in
-                                     flash by zeta_thread_nvs */
-        u8_t pend_callback : 1;   /**< Active represent that services callbacks from
-                                     subscribers must be called by zeta_thread */
-        u8_t on_changed : 1;      /**< Active represent that the service callback will
-                                            be called on change and not on update */
+        u8_t on_changed : 1; /**< Active represent that the service callback will
+                                       be called on change and not on update */
     } field;
     u8_t data; /**< Raw data */
 };
 
 /**
- * @brief Define Zeta channel type
+ * @brief Define Zeta channel type. The channels descriptors are
+ * constant and kept on the flash, only the channel data and the
+ * synchronization objects they point to are on the RAM.
  */
 struct zt_channel {
+#ifdef CONFIG_ZETA_CHANNEL_NAMES
     const char *name; /**< Channel name */
+#endif
     u8_t *data;       /**< Channel raw data */
     u8_t read_only;
     u8_t size;                  /**< Channel size */
     u8_t persistent;            /**< Persistent type */
     zt_channel_e id;            /**< Channel Id */
     union flag_data flag;       /**< Options */
-    struct k_sem *sem;          /**< Preserve shared-memory */
-    zt_service_t **publishers;  /**< Publishers */
-    zt_service_t **subscribers; /**< Subscribers */
+    struct k_sem *sem;          /**< Preserve shared-memory, NULL on seqlock channels */
+    atomic_t *seq;              /**< Seqlock sequence counter, NULL on sem channels */
+    u8_t pub_mask[ZT_SERVICE_MASK_SIZE]; /**< Publishers bitmask by service index */
+    zt_service_t *const *publishers; /**< Publishers */
+    const zt_route_t *routes;   /**< Subscribers by dispatcher */
 };
 typedef struct zt_channel zt_channel_t;
 
@@ -302,9 +391,10 @@ size_t zt_channel_size(zt_channel_e id, int *error);
  * @brief Return the channel name.
  *
  * @param id Channel Id
- * @param error Handle possible errors
+ * @param error Handle possible errors, -ENOTSUP when the channels names
+ * are disabled (CONFIG_ZETA_CHANNEL_NAMES)
  *
- * @return Channel name
+ * @return Channel name or NULL
  */
 const char *zt_channel_name(zt_channel_e id, int *error);
 
@@ -338,6 +428,149 @@ int zt_chan_read(zt_channel_e id, zt_data_t *channel_data);
  */
 int zt_chan_pub(zt_channel_e id, zt_data_t *channel_data);
 
+/**
+ * @brief Publish several channels values at once. All the channels are
+ * checked before any of them is changed, they are written while locked
+ * together and each dispatcher is woken up a single time.
+ *
+ * @param ids Channels Ids, in ascending order and without repetition
+ * @param channels_data pointers to the zt_data_t of each channel.
+ * @param count Number of channels
+ *
+ * @return Error code
+ * @retval -ENODATA Some channel was not found
+ * @retval -EACCESS Current thread hasn't permission to publish some channel
+ * @retval -EFAULT Ids, data or some channel value is NULL
+ * @retval -EPERM Some channel is read only
+ * @retval -EINVAL Ids are not ascending or a size is different to channel size
+ * @retval -EBUSY Some channel could not be locked
+ * @retval -EAGAIN Some dispatcher could not be notified
+ */
+int zt_chan_pub_batch(const zt_channel_e *ids, zt_data_t **channels_data, size_t count);
+
+/**
+ * @brief Define the storage counters.
+ */
+struct zt_storage_stats {
+    u32_t flushes;       /**< Storage cycles that wrote some record */
+    u32_t writes;        /**< Records written on the flash */
+    u32_t bytes_written; /**< Data bytes written on the flash */
+};
+
+/**
+ * @brief Write the pending persistent channels on the flash now,
+ * ignoring the channels minimum write interval.
+ *
+ * @param timeout Time waiting for the flush to finish
+ *
+ * @return Error code
+ * @retval -EBUSY Another flush is running
+ * @retval -EAGAIN The flush did not finish in time
+ * @retval -ENOTSUP Zeta storage is disabled
+ */
+int zt_storage_flush(k_timeout_t timeout);
+
+/**
+ * @brief Return the storage counters.
+ *
+ * @param stats pointer to a zt_storage_stats where the counters will be retrieved.
+ *
+ * @return Error code
+ * @retval -EFAULT Stats is NULL
+ * @retval -ENOTSUP Zeta storage is disabled
+ */
+int zt_storage_stats_get(struct zt_storage_stats *stats);
+
+/**
+ * @brief Define the channel counters.
+ */
+struct zt_channel_stats {
+    u32_t publishes;    /**< Publishes that took the channel, suppressed included */
+    u32_t suppressed;   /**< Publishes without changes on on_changed channels */
+    u32_t queue_drops;  /**< Dispatchers notifications lost on a full queue */
+    u32_t sem_timeouts; /**< Channel semaphore takes that timed out */
+};
+
+/**
+ * @brief Define the service counters. The durations are measured around
+ * each callback call on the dispatcher thread.
+ */
+struct zt_service_stats {
+    u32_t callbacks;        /**< Callback calls */
+    u32_t callback_max_us;  /**< Longest callback call */
+    u64_t callback_time_us; /**< Time spent on all the callback calls */
+};
+
+/**
+ * @brief Define the Zeta counters, sized by the channels and services
+ * of the zeta.yaml.
+ */
+struct zt_stats {
+    struct zt_channel_stats channels[ZT_CHANNEL_COUNT]; /**< By channel Id */
+    struct zt_service_stats services[ZT_SERVICE_COUNT]; /**< By service index */
+};
+
+/**
+ * @brief Return the channels and services counters, enabled by the stats
+ * option of the zeta.yaml Config. They are also dumped by the "zeta stats"
+ * shell command.
+ *
+ * @param stats pointer to a zt_stats where the counters will be retrieved.
+ *
+ * @return Error code
+ * @retval -EFAULT Stats is NULL
+ * @retval -ENOTSUP Zeta stats are disabled
+ */
+int zt_stats_get(struct zt_stats *stats);
+
+/**
+ * @brief Define the trace events ids, the same of the zeta/trace/metadata
+ * CTF events.
+ */
+typedef enum {
+    ZT_TRACE_PUB_ENTER = 0,  /**< channel */
+    ZT_TRACE_PUB_EXIT,       /**< channel, error */
+    ZT_TRACE_ENQUEUE,        /**< channel, dispatcher */
+    ZT_TRACE_DISPATCH_START, /**< channel, service, dispatcher */
+    ZT_TRACE_DISPATCH_END,   /**< channel, service, dispatcher */
+    ZT_TRACE_STORAGE_FLUSH,  /**< records written, bytes written */
+} zt_trace_event_e;
+
+/**
+ * @brief Receive each trace record: a packed CTF event with a 32 bits
+ * k_cycle_get_32 timestamp, the event id and its fields. It is called
+ * with the interrupts locked, so the records are in the timestamps order.
+ * The default one keeps the records on a RAM buffer, or appends them to
+ * the ZT_TRACE_FILE file on the posix backend, and it can be replaced by
+ * the application to send them elsewhere.
+ *
+ * @param record Trace record
+ * @param size Record size
+ */
+void zt_trace_emit(const void *record, size_t size);
+
+/**
+ * @brief Move the trace records kept on the RAM buffer to the buffer.
+ * The records are a byte stream, so a record can be split between two
+ * reads. They are also dumped by the "zeta trace" shell command.
+ *
+ * @param buffer Buffer where the records will be copied
+ * @param size Buffer size
+ *
+ * @return Number of bytes copied, 0 when the trace is disabled or the
+ * records are not kept on the RAM buffer
+ */
+size_t zt_trace_read(u8_t *buffer, size_t size);
+
+/**
+ * @brief Typed publish and read functions, generated for the channels
+ * with typed_accessors set. zt_pub_<CHANNEL> and zt_read_<CHANNEL> work
+ * as zt_chan_pub and zt_chan_read, but the value size is checked by its
+ * type at compile time and it is copied with a fixed size. The read
+ * value must not be NULL.
+ */
+// <ZT_CODE_INJECTION>$channels_accessors// </ZT_CODE_INJECTION>
+
 // <ZT_CODE_INJECTION>$services_reference// </ZT_CODE_INJECTION>
 
 #endif
@@ -1,15 +1,23 @@
 #!/usr/bin/python3
 
 import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
 import os
+import pickle
 import re
-import shutil
 import sys
+import tempfile
 import textwrap
+import time
 import traceback
-import subprocess
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from string import Template
+from typing import Iterator
 
 import yaml
 
@@ -24,11 +32,19 @@ PROJECT_DIR = "."
 ZETA_DIR = "."
 ZETA_SRC_DIR = "."
 ZETA_INCLUDE_DIR = "."
+ZETA_MODEL_CACHE = "zeta_model.pickle"
+ZETA_BACKENDS = ("zephyr", "posix")
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
-class YamlRefLoader(yaml.SafeLoader):
+
+class YamlRefLoader(SafeLoader):
     """Modifies the SafeLoader object and generates a correct
-    dictionary-based in the YAML file.
+    dictionary-based in the YAML file. The libyaml based loader is used
+    when it is available.
     """
     def __init__(self, stream):
         """YamlRefloader constructor.
@@ -52,16 +68,24 @@ class YamlRefLoader(yaml.SafeLoader):
         return self.construct_scalar(node)
 
 
+YamlRefLoader.add_constructor('!ref', YamlRefLoader.ref)
+
+
 class Channel(object):
     """Represents a channel written on YAML file.
     """
+    SYNC_MODES = ('sem', 'seqlock')
+
     def __init__(self,
                  name: str,
                  initial_value: list = None,
                  read_only: bool = False,
                  on_changed: bool = False,
                  size: int = 1,
-                 persistent: int = 0) -> None:
+                 persistent: int = 0,
+                 sync: str = 'sem',
+                 storage_min_interval: int = None,
+                 typed_accessors: bool = None) -> None:
         """Channel constructor.
 
         :param name: Channel name
@@ -72,22 +96,58 @@ class Channel(object):
         :param size: Channel size
         :param persistent: Defines if the channel that must be saved on
         flash
+        :param sync: Defines how the channel data is protected: sem (a
+        semaphore shared by readers and writers) or seqlock (a sequence
+        counter, the readers never block)
+        :param storage_min_interval: Minimum time in seconds between two
+        flash writes of a persistent channel, overrides the Config one. It
+        is only allowed on the per_channel storage mode
+        :param typed_accessors: Generates the channel typed publish and
+        read functions, overrides the Config one
         :returns: None
         :rtype: None
+        :raise ZetaCLIError: Invalid size, sync mode, storage interval
+        or initial value
 
         """
+        if not isinstance(size, int) or size < 1:
+            raise ZetaCLIError(
+                f"Invalid size {size} on channel {name}. It must be a"
+                f" positive integer", EZTFIELD)
+        if sync not in self.SYNC_MODES:
+            raise ZetaCLIError(
+                f"Invalid sync mode {sync} on channel {name}. It must be one"
+                f" of {', '.join(self.SYNC_MODES)}", EZTFIELD)
+        if storage_min_interval is not None and (
+                not isinstance(storage_min_interval, int)
+                or storage_min_interval < 0):
+            raise ZetaCLIError(
+                f"Invalid storage_min_interval {storage_min_interval} on"
+                f" channel {name}. It must be a non-negative integer",
+                EZTFIELD)
         self.name = name.strip()
         self.read_only = int(read_only)
         self.on_changed = int(on_changed)
         self.size = size
         self.persistent = 1 if persistent else 0
+        self.storage_min_interval = storage_min_interval
+        self.typed_accessors = typed_accessors
+        self.sync = sync
         self.sem = f"zt_{name.lower()}_channel_sem"
+        self.seq = f"zt_{name.lower()}_channel_seq"
         self.id = f"ZT_{name.upper()}_CHANNEL"
         self.initial_value = initial_value
         if initial_value is None:
             self.initial_value = [hex(x) for x in [0] * self.size]
+        elif len(initial_value) > self.size:
+            raise ZetaCLIError(
+                f"The initial_value of channel {name} is bigger than the"
+                f" channel size {self.size}", EZTFIELD)
         else:
-            self.initial_value = [hex(x) for x in initial_value]
+            self.initial_value = [
+                hex(x)
+                for x in initial_value + [0] * (self.size - len(initial_value))
+            ]
 
         self.pub_services_obj = []
         self.sub_services_obj = []
@@ -116,6 +176,9 @@ class Service(object):
 
         """
         self.name = name
+        self.id = f"ZT_{name}_SERVICE"
+        self.index = 0
+        self.dispatcher = None
         self.priority = priority
         self.stack_size = stack_size
         self.pub_channels_names = pub_channels
@@ -124,11 +187,51 @@ class Service(object):
         self.sub_channels_obj = []
 
 
+class Dispatcher(object):
+    """Represents a thread that calls the callbacks of the subscribers
+    routed to it.
+    """
+    def __init__(self, name: str, priority, index: int) -> None:
+        """Dispatcher constructor.
+
+        :param name: Dispatcher name, used to name the C symbols
+        :param priority: Dispatcher thread priority
+        :param index: Dispatcher index on the dispatchers table
+        :returns: None
+        :rtype: None
+
+        """
+        self.name = name
+        self.priority = priority
+        self.index = index
+        self.thread = f"zt_{name}_thread_id"
+        self.msgq = f"zt_{name}_changed_msgq"
+        self.event = f"zt_{name}_changed_sem"
+        self.pending = f"zt_{name}_pending"
+        self.services = []
+
+
 class Config(object):
+    DISPATCH_MODES = ('single', 'per_priority', 'per_service')
+    QUEUE_MODES = ('msgq', 'coalescing')
+    STORAGE_MODES = ('per_channel', 'packed')
+
     def __init__(self,
                  sector_count: int = 4,
                  storage_partition: str = 'storage',
-                 storage_period: int = 30) -> None:
+                 storage_period: int = 30,
+                 dispatch: str = 'single',
+                 queue_mode: str = 'msgq',
+                 queue_depth: int = 30,
+                 storage_mode: str = 'per_channel',
+                 storage_min_interval: int = 0,
+                 ram_budget: int = 0,
+                 rom_budget: int = 0,
+                 typed_accessors: bool = False,
+                 stats: bool = False,
+                 trace: bool = False,
+                 trace_buffer_size: int = 4096,
+                 trace_clock_hz: int = 0) -> None:
         """Config constructor.
 
         :param sector_count: Sector count that must be used
@@ -136,13 +239,86 @@ class Config(object):
         used to save channel data
         :param storage_period: Defines the period that zeta will be save
         channel data pending
+        :param dispatch: Defines how the subscribers callbacks are split
+        between dispatcher threads: single, per_priority or per_service
+        :param queue_mode: Defines how the changed channels are queued to
+        the dispatchers: msgq (one message per publish) or coalescing (a
+        pending bitmap where each channel is queued at most once)
+        :param queue_depth: Message queue depth used on msgq mode
+        :param storage_mode: Defines how the persistent channels are saved:
+        per_channel (one flash record per channel) or packed (all the
+        persistent channels in a single record per flush)
+        :param storage_min_interval: Minimum time in seconds between two
+        flash writes of a persistent channel. On packed mode it is the
+        interval of the single record
+        :param ram_budget: Maximum static RAM in bytes estimated for Zeta,
+        0 disables the check
+        :param rom_budget: Maximum ROM in bytes estimated for Zeta, 0
+        disables the check
+        :param typed_accessors: Generates typed publish and read functions
+        for every channel
+        :param stats: Generates the channels and services runtime
+        counters returned by zt_stats_get
+        :param trace: Generates the publish, dispatch and storage trace
+        hooks, which emit CTF events described by zeta/trace/metadata
+        :param trace_buffer_size: Size in bytes of the RAM buffer that
+        keeps the trace records on Zephyr
+        :param trace_clock_hz: Frequency of the cycles counter used as the
+        trace timestamp, 0 uses the backend default
         :returns: None
         :rtype: None
+        :raise ZetaCLIError: Invalid dispatch, queue, storage, budget or
+        trace configuration
 
         """
         self.sector_count = sector_count
         self.storage_partition = storage_partition
         self.storage_period = storage_period
+        if dispatch not in self.DISPATCH_MODES:
+            raise ZetaCLIError(
+                f"Invalid dispatch mode {dispatch}. It must be one of"
+                f" {', '.join(self.DISPATCH_MODES)}", EZTFIELD)
+        self.dispatch = dispatch
+        if queue_mode not in self.QUEUE_MODES:
+            raise ZetaCLIError(
+                f"Invalid queue mode {queue_mode}. It must be one of"
+                f" {', '.join(self.QUEUE_MODES)}", EZTFIELD)
+        self.queue_mode = queue_mode
+        if not isinstance(queue_depth, int) or queue_depth < 1:
+            raise ZetaCLIError(
+                f"Invalid queue depth {queue_depth}. It must be a positive"
+                f" integer", EZTFIELD)
+        self.queue_depth = queue_depth
+        if storage_mode not in self.STORAGE_MODES:
+            raise ZetaCLIError(
+                f"Invalid storage mode {storage_mode}. It must be one of"
+                f" {', '.join(self.STORAGE_MODES)}", EZTFIELD)
+        self.storage_mode = storage_mode
+        if not isinstance(storage_min_interval,
+                          int) or storage_min_interval < 0:
+            raise ZetaCLIError(
+                f"Invalid storage_min_interval {storage_min_interval}. It"
+                f" must be a non-negative integer", EZTFIELD)
+        self.storage_min_interval = storage_min_interval
+        for budget, value in (('ram_budget', ram_budget), ('rom_budget',
+                                                          rom_budget)):
+            if not isinstance(value, int) or value < 0:
+                raise ZetaCLIError(
+                    f"Invalid {budget} {value}. It must be a non-negative"
+                    f" integer", EZTFIELD)
+        self.ram_budget = ram_budget
+        self.rom_budget = rom_budget
+        self.typed_accessors = bool(typed_accessors)
+        self.stats = bool(stats)
+        self.trace = bool(trace)
+        for option, value in (('trace_buffer_size', trace_buffer_size),
+                              ('trace_clock_hz', trace_clock_hz)):
+            if not isinstance(value, int) or value < 0:
+                raise ZetaCLIError(
+                    f"Invalid {option} {value}. It must be a non-negative"
+                    f" integer", EZTFIELD)
+        self.trace_buffer_size = trace_buffer_size
+        self.trace_clock_hz = trace_clock_hz
 
 
 class Zeta(object):
@@ -152,41 +328,188 @@ class Zeta(object):
     def __init__(self, yamlfile: TextIOWrapper) -> None:
         """Zeta constructor.
 
-        :param yamlfile: Zeta yaml file config
+        :param yamlfile: Zeta yaml file config or the dictionary already
+        loaded from it
         :returns: None
         :rtype: None
         :raise ZetaCLIError: Error creating Channel object or Service object
 
         """
-        YamlRefLoader.add_constructor('!ref', YamlRefLoader.ref)
-        yaml_dict = yaml.load(yamlfile, Loader=YamlRefLoader)
+        if isinstance(yamlfile, dict):
+            yaml_dict = yamlfile
+        else:
+            yaml_dict = yaml.load(yamlfile, Loader=YamlRefLoader)
         try:
             self.config = Config(**yaml_dict['Config'])
         except KeyError:
             self.config = Config()
+        except TypeError as terr:
+            raise ZetaCLIError(
+                f"Error creating Config object. {terr.__str__()}", EZTFIELD)
         self.channels = []
+        self.channels_index = {}
         for channel_description in yaml_dict['Channels']:
             for name, fields in channel_description.items():
                 try:
-                    self.channels.append(Channel(name, **fields))
+                    channel = Channel(name, **fields)
                 except TypeError as terr:
                     raise ZetaCLIError(
                         f"Error creating Channel object. {terr.__str__()}",
                         EZTFIELD)
+                if channel.name in self.channels_index:
+                    raise ZetaCLIError(
+                        f"Channel {channel.name} is defined more than once",
+                        EZTFIELD)
+                if (channel.storage_min_interval is not None
+                        and self.config.storage_mode == 'packed'):
+                    raise ZetaCLIError(
+                        f"Channel {channel.name} storage_min_interval is not"
+                        f" allowed on packed storage mode, all the persistent"
+                        f" channels are written together with the Config"
+                        f" storage_min_interval", EZTFIELD)
+                self.channels_index[channel.name] = channel
+                self.channels.append(channel)
         self.services = []
         for service_description in yaml_dict['Services']:
             for name, fields in service_description.items():
                 try:
-                    self.services.append(Service(name, **fields))
+                    service = Service(name, **fields)
                 except TypeError as terr:
                     raise ZetaCLIError(
                         f"Error creating Service object. {terr.__str__()}",
                         EZTFIELD)
+                service.index = len(self.services)
+                self.services.append(service)
+        self.services_mask_size = max(1, (len(self.services) + 7) // 8)
         self.__check_service_channel_relation()
+        self.__create_dispatchers()
+
+    def typed_channels(self) -> list:
+        """Lists the channels with typed publish and read functions.
+
+        :returns: Channel objects
+        :rtype: list
+
+        """
+        return [
+            channel for channel in self.channels
+            if (self.config.typed_accessors if channel.typed_accessors is None
+                else channel.typed_accessors)
+        ]
+
+    @staticmethod
+    def data_alignment(channel: Channel) -> int:
+        """Gets the natural alignment of the channel data: the biggest
+        power of two, up to 8, that divides its size.
+
+        :param channel: Channel object
+        :returns: Alignment in bytes
+        :rtype: int
+
+        """
+        return min(8, channel.size & -channel.size)
+
+    def data_pool(self) -> tuple:
+        """Lays out the data of all the channels on a single pool. The
+        persistent channels come first, so they are a contiguous region
+        at the pool start, and each group is sorted by alignment, so
+        padding is only needed between the groups.
+
+        :returns: Pool size, persistent region size and the channels data
+        offsets by channel name
+        :rtype: tuple
+
+        """
+        offsets = {}
+        offset = 0
+        persistent_size = 0
+        for persistent in (1, 0):
+            group = [
+                channel for channel in self.channels
+                if channel.persistent == persistent
+            ]
+            for channel in sorted(group, key=lambda c: -self.data_alignment(c)):
+                alignment = self.data_alignment(channel)
+                offset = -(-offset // alignment) * alignment
+                offsets[channel.name] = offset
+                offset += channel.size
+            if persistent:
+                persistent_size = offset
+        return max(1, offset), persistent_size, offsets
+
+    def storage_layout_key(self) -> int:
+        """Computes the key of the packed storage record layout, a hash of
+        the persistent channels names and sizes in the record order. A
+        record stored by a firmware with another layout has another key.
+
+        :returns: 32 bits layout key
+        :rtype: int
+
+        """
+        offsets = self.data_pool()[2]
+        persistent = sorted(
+            [channel for channel in self.channels if channel.persistent],
+            key=lambda channel: offsets[channel.name])
+        layout = ''.join([
+            f"{channel.name}:{channel.size}:{offsets[channel.name]};"
+            for channel in persistent
+        ])
+        return int.from_bytes(
+            hashlib.sha256(layout.encode()).digest()[:4], 'little')
+
+    @classmethod
+    def load(cls, yamlfile: str, cache_dir: str = None) -> 'Zeta':
+        """Creates the Zeta object of a yaml file. When cache_dir is
+        given, the validated yaml dictionary is saved there and reused
+        by the next calls while the yaml file, the ZetaCLI version and
+        this module stay the same, skipping the YAML parsing.
+
+        :param yamlfile: Zeta yaml file path
+        :param cache_dir: Directory where the model cache is kept
+        :returns: Zeta object
+        :rtype: Zeta
+        :raise ZetaCLIError: Error creating Channel object or Service object
+
+        """
+        with open(yamlfile, 'rb') as yaml_file:
+            content = yaml_file.read()
+        if cache_dir is None:
+            return cls(content)
+        digest = hashlib.sha256()
+        digest.update(__version__.encode())
+        digest.update(Path(__file__).read_bytes())
+        digest.update(content)
+        digest = digest.hexdigest()
+        cache_file = Path(cache_dir, ZETA_MODEL_CACHE)
+        try:
+            with cache_file.open('rb') as cache:
+                cached_digest, yaml_dict = pickle.load(cache)
+            if cached_digest == digest:
+                return cls(yaml_dict)
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            # A corrupt cache is removed and written again below
+            try:
+                cache_file.unlink()
+            except OSError:
+                pass
+        yaml_dict = yaml.load(content, Loader=YamlRefLoader)
+        zeta = cls(yaml_dict)
+        try:
+            temporary_file = cache_file.with_suffix('.tmp')
+            with temporary_file.open('wb') as cache:
+                pickle.dump((digest, yaml_dict), cache,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_file, cache_file)
+        except OSError:
+            pass
+        return zeta
 
     def __check_service_channel_relation(self) -> None:
         """Checks if the use of !ref is correct or is used some
-        nonexistent channel.
+        nonexistent channel. The references are resolved through the
+        channels index built on the constructor.
 
         :returns: None
         :rtype: None
@@ -195,23 +518,62 @@ class Zeta(object):
         """
         for service in self.services:
             for channel_name in service.pub_channels_names:
-                for channel in self.channels:
-                    if channel.name == channel_name:
-                        channel.pub_services_obj.append(service)
-                        service.pub_channels_obj.append(channel)
-                        break
-                else:
+                try:
+                    channel = self.channels_index[channel_name]
+                except KeyError:
                     raise ZetaCLIError(
                         f"Channel {channel_name} does not exists", EZTINVREF)
+                channel.pub_services_obj.append(service)
+                service.pub_channels_obj.append(channel)
             for channel_name in service.sub_channels_names:
-                for channel in self.channels:
-                    if channel.name == channel_name:
-                        channel.sub_services_obj.append(service)
-                        service.sub_channels_obj.append(channel)
-                        break
-                else:
+                try:
+                    channel = self.channels_index[channel_name]
+                except KeyError:
                     raise ZetaCLIError(
                         f"Channel {channel_name} does not exists", EZTINVREF)
+                channel.sub_services_obj.append(service)
+                service.sub_channels_obj.append(channel)
+
+    def __create_dispatchers(self) -> None:
+        """Splits the subscriber services between the dispatcher
+        threads based on the dispatch mode. On per_priority mode there
+        is one dispatcher per subscribers priority and on per_service
+        mode one per subscriber, running with the same priority of the
+        services it serves. The single mode, or a project without
+        subscribers, has only the zt_channels dispatcher.
+
+        :returns: None
+        :rtype: None
+
+        """
+        self.dispatchers = []
+        subscribers = [
+            service for service in self.services if service.sub_channels_obj
+        ]
+        if self.config.dispatch == 'per_priority':
+            groups = {}
+            for service in subscribers:
+                groups.setdefault(service.priority, []).append(service)
+            for priority in sorted(groups):
+                dispatcher = Dispatcher(f"dispatcher{len(self.dispatchers)}",
+                                        priority, len(self.dispatchers))
+                dispatcher.services = groups[priority]
+                self.dispatchers.append(dispatcher)
+        elif self.config.dispatch == 'per_service':
+            for service in subscribers:
+                dispatcher = Dispatcher(f"{service.name.lower()}_dispatcher",
+                                        service.priority,
+                                        len(self.dispatchers))
+                dispatcher.services = [service]
+                self.dispatchers.append(dispatcher)
+        if not self.dispatchers:
+            dispatcher = Dispatcher("channels", "ZT_CHANNELS_THREAD_PRIORITY",
+                                    0)
+            dispatcher.services = subscribers
+            self.dispatchers.append(dispatcher)
+        for dispatcher in self.dispatchers:
+            for service in dispatcher.services:
+                service.dispatcher = dispatcher
 
     def __process_file(self, yaml_dict: dict):
         """Continues the processing of yamfile
@@ -224,15 +586,266 @@ class Zeta(object):
         pass
 
 
+# The umask can only be read by setting it, so it is read once, before
+# any thread is started
+_umask = os.umask(0o022)
+os.umask(_umask)
+
+
+def write_if_changed(destination_file: str, content) -> bool:
+    """Writes the content on the destination file only when it differs
+    from the current file content, so identical outputs keep their
+    mtime and do not trigger rebuilds. The file is written on a
+    temporary file and renamed over the destination, so it is never
+    seen partially written. A new file gets the mode open() would give it
+    and an existing file keeps its mode.
+
+    :param destination_file: Path of the file to be written
+    :param content: File content, str or bytes
+    :returns: True if the file was written
+    :rtype: bool
+
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    try:
+        with open(destination_file, 'rb') as current_file:
+            if current_file.read() == content:
+                return False
+        mode = os.stat(destination_file).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_umask
+    destination_dir = os.path.dirname(destination_file) or "."
+    descriptor, temporary_file = tempfile.mkstemp(
+        dir=destination_dir,
+        prefix=f".{os.path.basename(destination_file)}.",
+        suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as result_file:
+            result_file.write(content)
+        os.chmod(temporary_file, mode)
+        os.replace(temporary_file, destination_file)
+    except BaseException:
+        os.unlink(temporary_file)
+        raise
+    return True
+
+
+def sync_tree(source_dir: str, destination_dir: str) -> tuple:
+    """Copies a folder tree file by file with write_if_changed. Files
+    that only exist on the destination are kept.
+
+    :param source_dir: Folder to be copied
+    :param destination_dir: Folder where the files will be copied
+    :returns: Files written and files skipped because they are unchanged
+    :rtype: tuple
+
+    """
+    written = []
+    skipped = []
+    source = Path(source_dir)
+    for source_file in sorted(source.rglob('*')):
+        if not source_file.is_file():
+            continue
+        destination_file = Path(destination_dir,
+                                source_file.relative_to(source))
+        destination_file.parent.mkdir(parents=True, exist_ok=True)
+        if write_if_changed(str(destination_file), source_file.read_bytes()):
+            written.append(str(destination_file))
+        else:
+            skipped.append(str(destination_file))
+    return written, skipped
+
+
+class CompiledTemplate(object):
+    """Represents a template split on pairs of literal text and
+    placeholder name (None after the last literal).
+    """
+    def __init__(self, template_file: str, text: str) -> None:
+        """CompiledTemplate constructor.
+
+        :param template_file: Template file path, used on the errors
+        :param text: Template content
+        :returns: None
+        :rtype: None
+        :raise ZetaCLIError: The template has an invalid placeholder
+
+        """
+        self.template_file = template_file
+        self.pieces = []
+        literal = ""
+        position = 0
+        for match in Template.pattern.finditer(text):
+            literal += text[position:match.start()]
+            position = match.end()
+            if match.group('escaped') is not None:
+                literal += Template.delimiter
+                continue
+            name = match.group('named') or match.group('braced')
+            if name is None:
+                line = text.count("\n", 0, match.start()) + 1
+                raise ZetaCLIError(
+                    f"Invalid placeholder in {template_file} at line {line}",
+                    EZTTEMPLATE)
+            self.pieces.append((literal, name))
+            literal = ""
+        self.pieces.append((literal + text[position:], None))
+        self.placeholders = frozenset(name for _, name in self.pieces
+                                      if name is not None)
+
+    def validate(self, substitutions: dict) -> None:
+        """Checks if all the template placeholders have a substitution
+        before anything is rendered.
+
+        :param substitutions: Substitutions that will be used to render
+        :returns: None
+        :rtype: None
+        :raise ZetaCLIError: There are placeholders without substitution
+
+        """
+        missing = self.placeholders.difference(substitutions)
+        if missing:
+            raise ZetaCLIError(
+                f"No substitution for {', '.join(sorted(missing))}"
+                f" on {self.template_file}", EZTTEMPLATE)
+
+
+class TemplateRegistry(object):
+    """Process-wide registry of the compiled templates. Each template is
+    read and compiled once and reused by all the renders, including the
+    ones made by several generations on the same process, until its
+    mtime or size changes.
+    """
+    templates = {}
+
+    @staticmethod
+    def default_dir() -> str:
+        """Gets the templates folder shipped with the zeta package.
+
+        :returns: Templates folder path
+        :rtype: str
+
+        """
+        try:
+            from importlib.resources import files
+            return str(files(__package__) / "templates")
+        except ImportError:
+            return os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                "templates")
+
+    @classmethod
+    def get(cls, template_file: str) -> CompiledTemplate:
+        """Gets the compiled template, compiling it on the first use and
+        after the template file changes.
+
+        :param template_file: Template file path
+        :returns: Compiled template
+        :rtype: CompiledTemplate
+        :raise ZetaCLIError: The template has an invalid placeholder
+        :raise FileNotFoundError: The template does not exist
+
+        """
+        stat = os.stat(template_file)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = cls.templates.get(template_file)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(template_file, 'r') as template:
+            compiled = CompiledTemplate(template_file, template.read())
+        cls.templates[template_file] = (signature, compiled)
+        return compiled
+
+    @classmethod
+    def preload(cls, templates_dir: str = None) -> list:
+        """Compiles all the templates of a folder, so the invalid ones are
+        reported before anything is generated.
+
+        :param templates_dir: Templates folder, the package one by default
+        :returns: Compiled templates
+        :rtype: list
+        :raise ZetaCLIError: A template has an invalid placeholder
+
+        """
+        templates = Path(templates_dir or cls.default_dir())
+        return [
+            cls.get(str(template_file))
+            for template_file in sorted(templates.glob("*.template*"))
+        ]
+
+
+class ZetaContext(object):
+    """Represents the directories used by a generation and where its
+    progress is reported. It takes the place of the module globals, so
+    several generations can run on the same process.
+    """
+    def __init__(self,
+                 build_dir: str = ".",
+                 templates_dir: str = None,
+                 verbose: bool = False,
+                 backend: str = "zephyr") -> None:
+        """ZetaContext constructor.
+
+        :param build_dir: The folder where the files will be generated
+        :param templates_dir: Templates folder, the ZetaCLI one by default
+        :param verbose: Prints the generation progress
+        :param backend: Runtime backend, zephyr or posix (the pthread
+        shim used to build the generated files as a host program)
+        :returns: None
+        :rtype: None
+        :raise ZetaCLIError: Unknown backend
+
+        """
+        if backend not in ZETA_BACKENDS:
+            raise ZetaCLIError(
+                f"Invalid backend {backend}, it must be one of"
+                f" {', '.join(ZETA_BACKENDS)}", EZTFIELD)
+        self.module_dir = os.path.dirname(os.path.realpath(__file__))
+        self.templates_dir = templates_dir or TemplateRegistry.default_dir()
+        self.project_dir = build_dir
+        self.zeta_dir = f"{build_dir}/zeta"
+        self.src_dir = f"{build_dir}/zeta/src"
+        self.include_dir = f"{build_dir}/zeta/include"
+        self.verbose = verbose
+        self.backend = backend
+
+    @classmethod
+    def from_globals(cls) -> 'ZetaContext':
+        """Creates a context with the directories set on the module
+        globals.
+
+        :returns: ZetaContext object
+        :rtype: ZetaContext
+
+        """
+        context = cls(PROJECT_DIR, ZETA_TEMPLATES_DIR, True)
+        context.module_dir = ZETA_MODULE_DIR
+        context.zeta_dir = ZETA_DIR
+        context.src_dir = ZETA_SRC_DIR
+        context.include_dir = ZETA_INCLUDE_DIR
+        return context
+
+    def log(self, *message, **kwargs) -> None:
+        """Prints the message when the context is verbose.
+
+        :returns: None
+        :rtype: None
+
+        """
+        if self.verbose:
+            print(*message, **kwargs)
+
+
 class FileFactory(object):
     """Represents a generic class responsible to generate a file-based
     in a template and your respective substitutions.
     """
+
     def __init__(self,
                  destination_dir: str,
                  template_file: str,
                  zeta: Zeta,
-                 destination_file_name: str = "") -> None:
+                 destination_file_name: str = "",
+                 context: ZetaContext = None) -> None:
         """FileFactory constructor.
 
         :param destination_dir: The directory where the generated file
@@ -240,19 +853,23 @@ class FileFactory(object):
         :param template_file: Template file
         :param zeta: Zeta object
         :param destination_file_name: The file name that will be saved
+        :param context: Generation context, built from the module globals
+        by default
         :returns: None
         :rtype: None
 
         """
+        self.context = context or ZetaContext.from_globals()
         if destination_file_name:
             self.destination_file = (
                 f"{destination_dir}/{destination_file_name}")
         else:
             self.destination_file = (
                 f'{destination_dir}/{template_file.replace(".template", "")}')
-        self.template_file = f'{ZETA_TEMPLATES_DIR}/{template_file}'
+        self.template_file = f'{self.context.templates_dir}/{template_file}'
         self.zeta = zeta
         self.substitutions = {}
+        self.written = False
 
     def create_substitutions(self) -> None:
         """The function that will be implemented by classes inherited.
@@ -263,18 +880,43 @@ class FileFactory(object):
         """
         pass
 
+    def render(self) -> Iterator[str]:
+        """Yields the output file content chunk by chunk. The
+        substitutions can be strings or iterables of strings (list,
+        generators), the latter are emitted without being concatenated.
+
+        :returns: Chunks of the output file
+        :rtype: Iterator[str]
+        :raise ZetaCLIError: The template has an invalid placeholder or a
+        placeholder without substitution
+
+        """
+        template = TemplateRegistry.get(self.template_file)
+        template.validate(self.substitutions)
+        for literal, name in template.pieces:
+            yield literal
+            if name is None:
+                continue
+            value = self.substitutions[name]
+            if isinstance(value, str):
+                yield value
+            elif isinstance(value, Iterable):
+                yield from value
+            else:
+                yield str(value)
+
     def generate_file(self) -> None:
         """Writes the output file with the respective substitutions
-        assigned in create_substitutions function.
+        assigned in create_substitutions function. The file is only
+        rewritten when its content actually changes, so the build
+        system does not see a new mtime for identical outputs.
 
         :returns: None
         :rtype: None
 
         """
-        with open(self.template_file, 'r') as template:
-            t = Template(template.read())
-            with open(self.destination_file, 'w') as result_file:
-                result_file.write(t.substitute(**self.substitutions))
+        self.written = write_if_changed(self.destination_file,
+                                        "".join(self.render()))
 
     def run(self) -> None:
         """Runs the routine responsible for assigns substitutions and
@@ -292,37 +934,57 @@ class HeaderFileFactory(FileFactory):
     """Represents a generic class for creation of header files that will
     be used by Zeta.
     """
-    def __init__(self, template_file: str, zeta: Zeta) -> None:
+    def __init__(self,
+                 template_file: str,
+                 zeta: Zeta,
+                 context: ZetaContext = None) -> None:
         """Headerfilefactory constructor.
 
         :param template_file: Template file
         :param zeta: Zeta object
+        :param context: Generation context
         :returns: None
         :rtype: None
 
         """
-        super().__init__(ZETA_INCLUDE_DIR, template_file, zeta)
+        context = context or ZetaContext.from_globals()
+        super().__init__(context.include_dir,
+                         template_file,
+                         zeta,
+                         context=context)
 
 
 class SourceFileFactory(FileFactory):
     """Represents a generic class for creation of source files that will
     be used by Zeta.
     """
-    def __init__(self, template_file: str, zeta: Zeta) -> None:
+    def __init__(self,
+                 template_file: str,
+                 zeta: Zeta,
+                 context: ZetaContext = None) -> None:
         """SourceFilefactory constructor.
 
         :param template_file: Template file
         :param zeta: Zeta object
+        :param context: Generation context
         :returns: None
         :rtype: None
 
         """
-        super().__init__(ZETA_SRC_DIR, template_file, zeta)
+        context = context or ZetaContext.from_globals()
+        super().__init__(context.src_dir,
+                         template_file,
+                         zeta,
+                         context=context)
 
 
 class ZetaConf(FileFactory):
-    def __init__(self, zeta: Zeta) -> None:
-        super().__init__(ZETA_DIR, "zeta.template.conf", zeta)
+    def __init__(self, zeta: Zeta, context: ZetaContext = None) -> None:
+        context = context or ZetaContext.from_globals()
+        super().__init__(context.zeta_dir,
+                         "zeta.template.conf",
+                         zeta,
+                         context=context)
 
     def create_substitutions(self):
         storage = "n"
@@ -331,8 +993,85 @@ class ZetaConf(FileFactory):
                 storage = "y"
                 break
         else:
-            print("[ZETA]: Zeta storage disabled")
+            self.context.log("[ZETA]: Zeta storage disabled")
         self.substitutions['storage'] = storage
+        # There is no Kconfig on the posix backend, so its CMake gets the
+        # defaults of the Zeta Kconfig options from this file
+        backend_options = ""
+        if self.context.backend == "posix":
+            backend_options = "\nCONFIG_ZETA_CHANNEL_NAMES=y"
+        self.substitutions['backend_options'] = backend_options
+
+
+class ZetaTraceMetadata(FileFactory):
+    """Represents a class that generates the CTF metadata of the trace
+    records emitted by the generated code. The channels, services and
+    dispatchers are described as enumerations, so the trace readers show
+    their names.
+    """
+    CLOCK_HZ = {'zephyr': 32768, 'posix': 1000000000}
+
+    def __init__(self, zeta: Zeta, context: ZetaContext = None) -> None:
+        """ZetaTraceMetadata constructor.
+
+        :param zeta: Zeta object
+        :param context: Generation context
+        :returns: None
+        :rtype: None
+
+        """
+        context = context or ZetaContext.from_globals()
+        super().__init__(f"{context.zeta_dir}/trace",
+                         "zeta_trace.template.tsdl",
+                         zeta,
+                         destination_file_name="metadata",
+                         context=context)
+
+    @staticmethod
+    def enumeration(names: list, alias: str) -> str:
+        """Declares the type of a field that holds an index of the
+        names. It is a plain integer when there are no names, as a CTF
+        enumeration must have some item.
+
+        :param names: Names by index
+        :param alias: Type alias
+        :returns: TSDL type alias declaration
+        :rtype: str
+
+        """
+        if not names:
+            return f"typealias uint8_t := {alias};\n"
+        items = ''.join(
+            [f"    \"{name}\" = {index},\n" for index, name in enumerate(names)])
+        return f"typealias enum : uint8_t {{\n{items}}} := {alias};\n"
+
+    def create_substitutions(self) -> None:
+        """Responsible for assigns the needed substitutions to be
+        written on the output file.
+
+        :returns: None
+        :rtype: None
+
+        """
+        self.substitutions['clock_hz'] = (self.zeta.config.trace_clock_hz
+                                          or self.CLOCK_HZ[self.context.backend])
+        self.substitutions['channels_enum'] = self.enumeration(
+            [channel.name for channel in self.zeta.channels], "zt_channel_t")
+        self.substitutions['services_enum'] = self.enumeration(
+            [service.name for service in self.zeta.services], "zt_service_t")
+        self.substitutions['dispatchers_enum'] = self.enumeration(
+            [dispatcher.name for dispatcher in self.zeta.dispatchers],
+            "zt_dispatcher_t")
+
+    def generate_file(self) -> None:
+        """Writes the metadata file, creating the trace folder.
+
+        :returns: None
+        :rtype: None
+
+        """
+        os.makedirs(os.path.dirname(self.destination_file), exist_ok=True)
+        super().generate_file()
 
 
 class ZetaHeader(HeaderFileFactory):
@@ -340,16 +1079,62 @@ class ZetaHeader(HeaderFileFactory):
     goal to assigns all the substitutions needed to Zeta works
     properly.
     """
-    def __init__(self, zeta: Zeta) -> None:
+    SERVICE_REFERENCE = ("\n"
+                         "/* BEGIN {name} SECTION */\n"
+                         "extern zt_service_t {name}_service;\n"
+                         "#define {name}_TASK_PRIORITY {priority}\n"
+                         "#define {name}_STACK_SIZE {stack_size}\n"
+                         "/* END {name} SECTION */\n")
+    SCALAR_TYPES = {1: 'u8_t', 2: 'u16_t', 4: 'u32_t', 8: 'u64_t'}
+
+    def __init__(self, zeta: Zeta, context: ZetaContext = None) -> None:
         """ZetaHeader constructor.
 
         :param zeta: Zeta object
+        :param context: Generation context
         :returns: None
         :rtype: None
 
         """
-        super().__init__('zeta.template.h', zeta)
-        self.services_reference = ""
+        super().__init__('zeta.template.h', zeta, context)
+        self.services_reference = []
+        self.channels_accessors = []
+
+    @classmethod
+    def accessors_parameters(cls, channel: Channel) -> tuple:
+        """Gets the value parameter of the channel typed publish and read
+        functions. Channels of 1, 2, 4 or 8 bytes use an integer type and
+        the others a fixed size array.
+
+        :param channel: Channel object
+        :returns: Publish and read parameters declarations
+        :rtype: tuple
+
+        """
+        scalar = cls.SCALAR_TYPES.get(channel.size)
+        if scalar:
+            return f"{scalar} value", f"{scalar} *value"
+        return (f"const u8_t value[{channel.size}]",
+                f"u8_t value[{channel.size}]")
+
+    def gen_accessors(self) -> None:
+        """Responsible for declares the typed publish and read functions
+        of the channels. Read only channels have only the read one.
+
+        :returns: None
+        :rtype: None
+
+        """
+        for channel in self.zeta.typed_channels():
+            pub_parameter, read_parameter = self.accessors_parameters(channel)
+            self.channels_accessors.append(
+                f"\n/* BEGIN {channel.name} ACCESSORS */\n")
+            if not channel.read_only:
+                self.channels_accessors.append(
+                    f"int zt_pub_{channel.name}({pub_parameter});\n")
+            self.channels_accessors.append(
+                f"int zt_read_{channel.name}({read_parameter});\n"
+                f"/* END {channel.name} ACCESSORS */\n")
 
     def create_substitutions(self) -> None:
         """Responsible for assigns the needed substitutions to be
@@ -369,19 +1154,32 @@ class ZetaHeader(HeaderFileFactory):
                 ZT_CHANNEL_COUNT
             }} __attribute__((packed)) zt_channel_e;
             ''').format(channel_names=channel_names)
+        services_ids = ''.join(
+            [f"    {service.id},\n" for service in self.zeta.services])
+        self.substitutions['services_enum'] = (
+            f"\ntypedef enum {{\n"
+            f"{services_ids}"
+            f"    ZT_SERVICE_COUNT\n"
+            f"}} __attribute__((packed)) zt_service_e;\n\n"
+            f"#define ZT_SERVICE_MASK_SIZE {self.zeta.services_mask_size}\n")
         for service in self.zeta.services:
-            name = service.name
-            priority = service.priority
-            stack_size = service.stack_size
-            self.services_reference += textwrap.dedent(f'''
-                /* BEGIN {name} SECTION */
-                extern zt_service_t {name}_service;
-                #define {name}_TASK_PRIORITY {priority}
-                #define {name}_STACK_SIZE {stack_size}
-                /* END {name} SECTION */
-                ''')
+            self.services_reference.append(
+                self.SERVICE_REFERENCE.format(name=service.name,
+                                              priority=service.priority,
+                                              stack_size=service.stack_size))
         self.substitutions['services_reference'] = self.services_reference
+        self.gen_accessors()
+        self.substitutions['channels_accessors'] = self.channels_accessors
         self.substitutions['storage_period'] = self.zeta.config.storage_period
+        self.substitutions['dispatch_coalescing'] = int(
+            self.zeta.config.queue_mode == 'coalescing')
+        self.substitutions['queue_depth'] = self.zeta.config.queue_depth
+        self.substitutions['stats'] = int(self.zeta.config.stats)
+        self.substitutions['trace'] = int(self.zeta.config.trace)
+        self.substitutions['trace_buffer_size'] = max(
+            1, self.zeta.config.trace_buffer_size)
+        self.substitutions['backend_posix'] = int(
+            self.context.backend == 'posix')
 
 
 class ZetaSource(SourceFileFactory):
@@ -389,128 +1187,314 @@ class ZetaSource(SourceFileFactory):
     goal to assigns all the substitutions needed to Zeta works
     properly.
     """
-    def __init__(self, zeta: Zeta) -> None:
+    CHANNEL_SEM = "\nK_SEM_DEFINE({sem}, 1, 1);\n"
+    CHANNEL_SEQ = "\nstatic atomic_t {seq} = ATOMIC_INIT(0);\n"
+    CHANNEL_POOL = ("\n"
+                    "/* BEGIN CHANNELS DATA POOL */\n"
+                    "#define ZT_CHANNELS_POOL_SIZE {size}\n"
+                    "static u8_t __zt_channels_pool[ZT_CHANNELS_POOL_SIZE]"
+                    " __aligned(8) = {{\n")
+    CHANNEL_RELATIONS = ("\n"
+                         "/* BEGIN {name} RELATIONS */\n"
+                         "static zt_service_t *const {publishers}[] = {{{services}}};\n"
+                         "{subscribers}"
+                         "static const zt_route_t {routes}[] = {{\n"
+                         "{routes_items}"
+                         "    {{.dispatcher = NULL, .subscribers = NULL}}\n"
+                         "}};\n"
+                         "/* END {name} RELATIONS */\n")
+    DISPATCHER_QUEUE = (
+        "K_MSGQ_DEFINE({msgq}, sizeof(u8_t), ZT_DISPATCH_QUEUE_DEPTH, 4);\n"
+        "static ATOMIC_DEFINE({pending}, ZT_CHANNEL_COUNT);\n")
+    DISPATCHER_EVENT = ("K_SEM_DEFINE({event}, 0, 1);\n"
+                        "static ATOMIC_DEFINE({pending}, ZT_CHANNEL_COUNT);\n")
+    DISPATCHER_THREAD = (
+        "K_THREAD_DEFINE({thread}, ZT_CHANNELS_THREAD_STACK_SIZE,\n"
+        "                __zt_dispatcher_thread, &__zt_dispatchers[{index}],"
+        " NULL, NULL,\n"
+        "                {priority}, 0, 0);\n")
+    CHANNEL_CREATION = ("\n"
+                        "    {{\n"
+                        "        ZT_CHANNEL_NAME(\"{name}\")\n"
+                        "        .read_only = {read_only},\n"
+                        "        .flag = {{.data = {flag}}},\n"
+                        "        .size = {size},\n"
+                        "        .persistent = {persistent},\n"
+                        "        .sem = {sem_ref},\n"
+                        "        .seq = {seq_ref},\n"
+                        "        .pub_mask = {{{pub_mask}}},\n"
+                        "        .id = {id},\n"
+                        "        .data = {data},\n"
+                        "        .publishers = {publishers},\n"
+                        "        .routes = {routes}\n"
+                        "    }},\n")
+
+    def __init__(self, zeta: Zeta, context: ZetaContext = None) -> None:
         """ZetaSource constructor.
 
         :param zeta: Zeta object
+        :param context: Generation context
         :returns: None
         :rtype: None
 
         """
-        super().__init__('zeta.template.c', zeta)
-        self.channels_creation = ''
-        self.channels_sems = ''
+        super().__init__('zeta.template.c', zeta, context)
+        self.channels_creation = []
+        self.channels_sems = []
         self.sector_size = ''
         self.sector_count = ''
         self.storage_offset = ''
-        self.set_publishers = ''
-        self.set_subscribers = ''
-        self.arrays_init = ''
+        self.channels_relations = []
+        self.dispatchers_creation = []
+        self.arrays_init = []
+        self.storage_config = []
+        self.channels_accessors = []
+        self.services_table = []
+
+    @staticmethod
+    def services_array(services: list) -> str:
+        """Formats a NULL terminated array initializer of services.
+
+        :param services: Service objects
+        :returns: Array items
+        :rtype: str
+
+        """
+        return ', '.join([f"&{service.name}_service"
+                          for service in services] + ['NULL'])
 
     def gen_sems(self) -> None:
-        """Responsible for assigns the channel semaphores.
+        """Responsible for assigns the channel synchronization objects: a
+        semaphore for sem channels and a sequence counter for seqlock
+        channels.
 
         :returns: None
         :rtype: None
 
         """
-        self.channels_sems += textwrap.dedent('''
-            /* BEGIN INITIALIZING CHANNEL SEMAPHORES */
-            ''')
+        self.channels_sems.append(
+            "\n/* BEGIN INITIALIZING CHANNEL SEMAPHORES */\n")
         for channel in self.zeta.channels:
-            self.channels_sems += textwrap.dedent(f'''
-                K_SEM_DEFINE({channel.sem}, 1, 1);
-                ''')
+            if channel.sync == 'seqlock':
+                channel.sem_ref = "NULL"
+                channel.seq_ref = f"&{channel.seq}"
+                self.channels_sems.append(
+                    self.CHANNEL_SEQ.format(seq=channel.seq))
+            else:
+                channel.sem_ref = f"&{channel.sem}"
+                channel.seq_ref = "NULL"
+                self.channels_sems.append(
+                    self.CHANNEL_SEM.format(sem=channel.sem))
+        self.channels_sems.append(
+            "\n/* END INITIALIZING CHANNEL SEMAPHORES */\n")
 
-        self.channels_sems += textwrap.dedent('''
-            /* END INITIALIZING CHANNEL SEMAPHORES */
-            ''')
+    def gen_dispatchers(self) -> None:
+        """Responsible for creates the dispatchers threads, their
+        changed channels queues and pending bitmaps.
+
+        :returns: None
+        :rtype: None
+
+        """
+        dispatchers = self.zeta.dispatchers
+        coalescing = self.zeta.config.queue_mode == 'coalescing'
+        queue = self.DISPATCHER_EVENT if coalescing else self.DISPATCHER_QUEUE
+        self.dispatchers_creation.append(
+            "\n/* BEGIN INITIALIZING DISPATCHERS */\n")
+        for dispatcher in dispatchers:
+            self.dispatchers_creation.append(queue.format(**vars(dispatcher)))
+        self.dispatchers_creation.append(
+            f"\n#define ZT_DISPATCHER_COUNT {len(dispatchers)}\n"
+            f"static zt_dispatcher_t __zt_dispatchers[ZT_DISPATCHER_COUNT] = {{\n"
+        )
+        for dispatcher in dispatchers:
+            notification = (f".event = &{dispatcher.event}" if coalescing
+                            else f".msgq = &{dispatcher.msgq}")
+            self.dispatchers_creation.append(
+                f"    {{{notification}, .pending = {dispatcher.pending}}},\n")
+        self.dispatchers_creation.append("};\n\n")
+        for dispatcher in dispatchers:
+            self.dispatchers_creation.append(
+                self.DISPATCHER_THREAD.format(**vars(dispatcher)))
+        self.dispatchers_creation.append(
+            "/* END INITIALIZING DISPATCHERS */\n")
+
+    def gen_relations(self, channel: Channel) -> None:
+        """Responsible for creates the publishers array and the
+        subscribers routes of the channel. Each route holds the
+        subscribers whose callbacks are called by one dispatcher.
+
+        :param channel: Channel object
+        :returns: None
+        :rtype: None
+
+        """
+        name = channel.name.lower()
+        channel.publishers = f"__{name}_publishers"
+        channel.routes = f"__{name}_routes"
+        subscribers = []
+        routes_items = []
+        for dispatcher in self.zeta.dispatchers:
+            services = [
+                service for service in channel.sub_services_obj
+                if service.dispatcher is dispatcher
+            ]
+            if services:
+                array = f"__{name}_{dispatcher.name}_subscribers"
+                subscribers.append(f"static zt_service_t *const {array}[] ="
+                                   f" {{{self.services_array(services)}}};\n")
+                routes_items.append(
+                    f"    {{.dispatcher = &__zt_dispatchers[{dispatcher.index}],"
+                    f" .subscribers = {array}}},\n")
+        self.channels_relations.append(
+            self.CHANNEL_RELATIONS.format(
+                name=channel.name,
+                publishers=channel.publishers,
+                services=self.services_array(channel.pub_services_obj),
+                subscribers=''.join(subscribers),
+                routes=channel.routes,
+                routes_items=''.join(routes_items)))
+
+    def gen_pool(self) -> None:
+        """Responsible for creates the data pool with the initial value
+        of every channel at its offset and assigns the channels data
+        references.
+
+        :returns: None
+        :rtype: None
+
+        """
+        size, _, offsets = self.zeta.data_pool()
+        self.arrays_init.append(self.CHANNEL_POOL.format(size=size))
+        position = 0
+        for channel in sorted(self.zeta.channels,
+                              key=lambda c: offsets[c.name]):
+            offset = offsets[channel.name]
+            channel.data = f"&__zt_channels_pool[{offset}]"
+            if offset > position:
+                self.arrays_init.append(
+                    f"    /* padding */ {', '.join(['0x0'] * (offset - position))},\n"
+                )
+            self.arrays_init.append(
+                f"    /* {channel.name} */ {', '.join(channel.initial_value)},\n"
+            )
+            position = offset + channel.size
+        self.arrays_init.append("};\n/* END CHANNELS DATA POOL */\n")
 
     def gen_creation(self) -> None:
         """Responsible for creates all the channels that will be used by
-        Zeta.
+        Zeta. Every piece of code is appended as a chunk to the
+        respective list, so the generation cost stays linear on the
+        number of channels.
 
         :returns: None
         :rtype: None
 
         """
-        channels = ''
+        self.gen_pool()
+        self.channels_creation.append(
+            "\n/* BEGIN INITIALIZING CHANNELS */\n"
+            "static const zt_channel_t __zt_channels[ZT_CHANNEL_COUNT] = {\n")
         for channel in self.zeta.channels:
-            data_alloc = (f"static u8_t __{channel.name.lower()}_data[] ="
-                          f"{{{', '.join(channel.initial_value)}}};")
-            channel.data = f"__{channel.name.lower()}_data"
             channel.flag = 0x00
             if channel.on_changed:
-                channel.flag = channel.flag | (1 << 2)
-
-            subscribers_alloc = "NULL"
-            if len(channel.sub_services_obj) > 0:
-                subscribers_alloc = [
-                    f"&{service.name}_service"
-                    for service in channel.sub_services_obj
-                ]
-                subscribers_alloc.append('NULL')
-                subscribers_alloc = ', '.join(subscribers_alloc)
-            name_subscribers = f"{channel.name.lower()}_subscribers"
-            channel.subscribers = f"__{channel.name.lower()}_subcribers"
-            self.arrays_init += textwrap.dedent(f'''
-                /* BEGIN {channel.name} CHANNEL INIT ARRAYS */
-                {data_alloc}
-                /* END {channel.name} INIT ARRAYS */
-                ''')
-            self.set_subscribers += textwrap.dedent(f'''
-                /* BEGIN {channel.name} SUBSCRIBERS INIT */
-                    zt_service_t *{name_subscribers}[] = {{{subscribers_alloc}}};
-                    __zt_channels[{channel.id}].subscribers = {name_subscribers};
-                /* END {channel.name} SUBSCRIBERS INIT */
-                ''')
-            channel.publishers = "NULL"
-            if len(channel.pub_services_obj) > 0:
-                channel.publishers = [
-                    f"&{service.name}_service"
-                    for service in channel.pub_services_obj
-                ]
-                channel.publishers.append("NULL")
-                channel.publishers = ', '.join(channel.publishers)
-            channel.publishers = f"{{{channel.publishers}}}"
-
-            name_publishers = f"{channel.name.lower()}_publishers"
-            self.set_publishers += textwrap.dedent(f'''
-                /* BEGIN {channel.name} PUBLISHERS INIT */
-                    zt_service_t *{name_publishers}[] = {channel.publishers};
-                    __zt_channels[{channel.id}].publishers = {name_publishers};
-                /* END {channel.name} PUBLISHERS INIT */
-                ''')
-            channels += textwrap.indent(
-                '''
-                {{
-                    .name = "{name}",
-                    .read_only = {read_only},
-                    .flag = {{.data = {flag}}},
-                    .size = {size},
-                    .persistent = {persistent},
-                    .sem = &{sem},
-                    .id = {id},
-                    .data = {data}
-                }},\n'''.format(**vars(channel)), '')
-
-        self.channels_creation = textwrap.dedent(f'''
-            /* BEGIN INITIALIZING CHANNELS */
-            static zt_channel_t __zt_channels[ZT_CHANNEL_COUNT] = {{
-                {channels}
-            }};
-            /* END INITIALIZING CHANNELS */
-            ''')
+                channel.flag = channel.flag | (1 << 0)
+            pub_mask = [0] * self.zeta.services_mask_size
+            for service in channel.pub_services_obj:
+                pub_mask[service.index >> 3] |= 1 << (service.index & 0x7)
+            channel.pub_mask = ', '.join([hex(x) for x in pub_mask])
+            self.gen_relations(channel)
+            self.channels_creation.append(
+                self.CHANNEL_CREATION.format(**vars(channel)))
+        self.channels_creation.append(
+            "\n};\n/* END INITIALIZING CHANNELS */\n")
+
+    def gen_accessors(self) -> None:
+        """Responsible for creates the typed publish and read functions of
+        the channels. They call the channel operations with a constant
+        channel, so the size dependent code is resolved at compile time.
+
+        :returns: None
+        :rtype: None
+
+        """
+        for channel in self.zeta.typed_channels():
+            pub_parameter, read_parameter = ZetaHeader.accessors_parameters(
+                channel)
+            value = "value" if channel.size not in ZetaHeader.SCALAR_TYPES else "&value"
+            self.channels_accessors.append(
+                f"\n/* BEGIN {channel.name} ACCESSORS */\n")
+            if not channel.read_only:
+                self.channels_accessors.append(
+                    f"int zt_pub_{channel.name}({pub_parameter})\n"
+                    f"{{\n"
+                    f"    ZT_CHECK(!__zt_is_publisher(&__zt_channels[{channel.id}]),"
+                    f" -EACCES,\n"
+                    f"             \"The current thread has not the permission to"
+                    f" change channel #%d!\", {channel.id});\n"
+                    f"    return __zt_chan_pub(&__zt_channels[{channel.id}],"
+                    f" (const u8_t *) {value});\n"
+                    f"}}\n\n")
+            self.channels_accessors.append(
+                f"int zt_read_{channel.name}({read_parameter})\n"
+                f"{{\n"
+                f"    return __zt_channel_read(&__zt_channels[{channel.id}],"
+                f" (u8_t *) value, K_MSEC(200));\n"
+                f"}}\n"
+                f"/* END {channel.name} ACCESSORS */\n")
+
+    def gen_services_table(self) -> None:
+        """Responsible for creates the services table indexed by the
+        service index, used to check the publisher service of the current
+        thread and to name the services statistics.
+
+        :returns: None
+        :rtype: None
+
+        """
+        items = ''.join(
+            [f"    &{service.name}_service,\n" for service in self.zeta.services])
+        self.services_table.append(
+            "\nstatic zt_service_t *const __zt_services[ZT_SERVICE_COUNT] = {\n"
+            f"{items}"
+            "};\n")
 
     def gen_nvs_config(self) -> None:
-        """Responsible for assigns the nvs config.
+        """Responsible for assigns the nvs config, the persistence mode,
+        the packed record size and layout key and the channels write rate
+        limits.
 
         :returns: None
         :rtype: None
 
         """
-        self.sector_count = self.zeta.config.sector_count
-        self.storage_partition = self.zeta.config.storage_partition
+        config = self.zeta.config
+        self.sector_count = config.sector_count
+        self.storage_partition = config.storage_partition
+        record_size = self.zeta.data_pool()[1]
+        intervals = [(config.storage_min_interval
+                      if channel.storage_min_interval is None else
+                      channel.storage_min_interval) if channel.persistent else 0
+                     for channel in self.zeta.channels]
+        rate_limit = int(any(intervals))
+        self.storage_config.append(
+            f"\n#define ZT_STORAGE_PACKED"
+            f" {int(config.storage_mode == 'packed')}\n"
+            f"#define ZT_STORAGE_RECORD_SIZE {max(1, record_size)}\n"
+            f"#define ZT_STORAGE_LAYOUT_KEY"
+            f" 0x{self.zeta.storage_layout_key():08x}U\n"
+            f"#define ZT_STORAGE_SIM_SIZE {2 * record_size + 8}\n"
+            f"#define ZT_STORAGE_RATE_LIMIT {rate_limit}\n")
+        if rate_limit:
+            items = ', '.join([
+                f"{interval} * MSEC_PER_SEC" if interval else "0"
+                for interval in intervals
+            ])
+            self.storage_config.append(
+                "\n#ifdef CONFIG_ZETA_STORAGE\n"
+                "static const u32_t"
+                f" __zt_storage_min_interval[ZT_CHANNEL_COUNT] = {{{items}}};\n"
+                "#endif\n")
 
     def create_substitutions(self) -> None:
         """Responsible for assigns the needed substitutions to be written
@@ -522,16 +1506,960 @@ class ZetaSource(SourceFileFactory):
         """
         self.gen_nvs_config()
         self.gen_sems()
+        self.gen_dispatchers()
         self.gen_creation()
+        self.gen_accessors()
+        self.gen_services_table()
+        self.substitutions['channels_accessors'] = self.channels_accessors
+        self.substitutions['services_table'] = self.services_table
         self.substitutions['channels_creation'] = self.channels_creation
         self.substitutions['channels_sems'] = self.channels_sems
         self.substitutions['sector_count'] = self.sector_count
         self.substitutions['storage_partition'] = self.storage_partition
-        self.substitutions['set_publishers'] = self.set_publishers
-        self.substitutions['set_subscribers'] = self.set_subscribers
+        self.substitutions['storage_config'] = self.storage_config
+        self.substitutions['dispatchers_creation'] = self.dispatchers_creation
+        self.substitutions['channels_relations'] = self.channels_relations
         self.substitutions['arrays_init'] = self.arrays_init
 
 
+class ZetaFootprint(object):
+    """Represents the static memory used by the code generated from a
+    Zeta object. RAM and ROM are estimated for a 32-bit target with the
+    channels names enabled, the Zephyr kernel objects sizes are
+    approximations for a build without tracing or userspace.
+    """
+    POINTER_SIZE = 4
+    ATOMIC_SIZE = 4
+    K_SEM_SIZE = 16
+    K_MUTEX_SIZE = 20
+    K_MSGQ_SIZE = 40
+    K_THREAD_SIZE = 128
+    K_THREAD_DATA_SIZE = 48
+    NVS_FS_SIZE = 40
+    CHANNELS_THREAD_STACK_SIZE = 512
+    STORAGE_THREAD_STACK_SIZE = 512
+    STORAGE_BUFFER_SIZE = 255
+    STORAGE_RECORD_HEADER_SIZE = 8
+    STORAGE_STATS_SIZE = 12
+    CHANNEL_STATS_SIZE = 16
+    SERVICE_STATS_SIZE = 16
+
+    def __init__(self, zeta: Zeta) -> None:
+        """ZetaFootprint constructor.
+
+        :param zeta: Zeta object
+        :returns: None
+        :rtype: None
+
+        """
+        self.zeta = zeta
+        self.channels = [{
+            'name': channel.name,
+            'ram': self.channel_ram(channel),
+            'rom': self.channel_rom(channel)
+        } for channel in zeta.channels]
+        # The services keep their index when it is needed by the stats or
+        # the trace
+        pointer = (self.POINTER_SIZE, self.POINTER_SIZE)
+        service_id = self.enum_size(len(zeta.services))
+        service_descriptor = self.struct_size(
+            [pointer, pointer, pointer] +
+            ([(service_id, service_id)] if zeta.config.stats
+             or zeta.config.trace else []))
+        self.services = [{
+            'name': service.name,
+            'ram': (service.stack_size + self.K_THREAD_SIZE +
+                    service_descriptor),
+            'rom': self.K_THREAD_DATA_SIZE + self.POINTER_SIZE,
+            'stack': service.stack_size
+        } for service in zeta.services]
+        self.dispatchers = [{
+            'name': dispatcher.name,
+            'ram': self.dispatcher_ram(),
+            'rom': self.K_THREAD_DATA_SIZE,
+            'stack': self.CHANNELS_THREAD_STACK_SIZE
+        } for dispatcher in zeta.dispatchers]
+        self.storage = self.storage_footprint()
+        self.stats = self.stats_footprint()
+        self.trace = self.trace_footprint()
+        padding = zeta.data_pool()[0] - sum(
+            [channel.size for channel in zeta.channels])
+        self.shared = {
+            'ram': self.bitmap_size() + padding,
+            'rom': padding,
+            'padding': padding
+        }
+        parts = self.channels + self.services + self.dispatchers + [
+            self.shared
+        ] + [part for part in (self.storage, self.stats, self.trace) if part]
+        self.ram = sum([part['ram'] for part in parts])
+        self.rom = sum([part['rom'] for part in parts])
+
+    @staticmethod
+    def enum_size(count: int) -> int:
+        """Computes the size of a packed enum whose last value, the
+        count, is the given one.
+
+        :param count: Number of values before the count value
+        :returns: Enum size in bytes
+        :rtype: int
+
+        """
+        if count <= 0xff:
+            return 1
+        return 2 if count <= 0xffff else 4
+
+    @staticmethod
+    def struct_size(fields: list) -> int:
+        """Computes the size of a C struct with the natural alignment of
+        its fields.
+
+        :param fields: Pairs of size and alignment of the fields
+        :returns: Struct size in bytes
+        :rtype: int
+
+        """
+        size = 0
+        alignment = 1
+        for field_size, field_alignment in fields:
+            size = -(-size // field_alignment) * field_alignment + field_size
+            alignment = max(alignment, field_alignment)
+        return -(-size // alignment) * alignment
+
+    def bitmap_size(self) -> int:
+        """Computes the size of an atomic bitmap with a bit per channel.
+
+        :returns: Bitmap size in bytes
+        :rtype: int
+
+        """
+        bits = self.ATOMIC_SIZE * 8
+        return -(-len(self.zeta.channels) // bits) * self.ATOMIC_SIZE
+
+    def channel_ram(self, channel: Channel) -> int:
+        """Computes the RAM of a channel: its data and its
+        synchronization object.
+
+        :param channel: Channel object
+        :returns: RAM in bytes
+        :rtype: int
+
+        """
+        sync = self.ATOMIC_SIZE if channel.sync == 'seqlock' else self.K_SEM_SIZE
+        return channel.size + sync
+
+    def channel_rom(self, channel: Channel) -> int:
+        """Computes the ROM of a channel: its constant descriptor, name,
+        data initial value and relations arrays.
+
+        :param channel: Channel object
+        :returns: ROM in bytes
+        :rtype: int
+
+        """
+        pointer = (self.POINTER_SIZE, self.POINTER_SIZE)
+        channel_id = self.enum_size(len(self.zeta.channels))
+        descriptor = self.struct_size([
+            pointer, pointer, (1, 1), (1, 1), (1, 1),
+            (channel_id, channel_id), (1, 1), pointer, pointer,
+            (self.zeta.services_mask_size, 1), pointer, pointer
+        ])
+        routes = 1
+        subscribers = 0
+        for dispatcher in self.zeta.dispatchers:
+            services = [
+                service for service in channel.sub_services_obj
+                if service.dispatcher is dispatcher
+            ]
+            if services:
+                routes += 1
+                subscribers += (len(services) + 1) * self.POINTER_SIZE
+        publishers = (len(channel.pub_services_obj) + 1) * self.POINTER_SIZE
+        return (descriptor + len(channel.name) + 1 + channel.size +
+                publishers + routes * 2 * self.POINTER_SIZE + subscribers)
+
+    def dispatcher_ram(self) -> int:
+        """Computes the RAM of a dispatcher: thread, stack, queue,
+        pending bitmap and descriptor.
+
+        :returns: RAM in bytes
+        :rtype: int
+
+        """
+        config = self.zeta.config
+        if config.queue_mode == 'coalescing':
+            queue = self.K_SEM_SIZE
+        else:
+            queue = self.K_MSGQ_SIZE + config.queue_depth
+        return (self.CHANNELS_THREAD_STACK_SIZE + self.K_THREAD_SIZE + queue +
+                self.bitmap_size() + 2 * self.POINTER_SIZE)
+
+    def storage_footprint(self) -> dict:
+        """Computes the memory used by the storage when some channel is
+        persistent.
+
+        :returns: Storage RAM and ROM or None without persistent channels
+        :rtype: dict
+
+        """
+        config = self.zeta.config
+        persistent = [
+            channel for channel in self.zeta.channels if channel.persistent
+        ]
+        if not persistent:
+            return None
+        if config.storage_mode == 'packed':
+            buffer = (self.zeta.data_pool()[1] +
+                      self.STORAGE_RECORD_HEADER_SIZE)
+        else:
+            buffer = self.STORAGE_BUFFER_SIZE
+        rate_limit = any(
+            config.storage_min_interval if channel.storage_min_interval is None
+            else channel.storage_min_interval for channel in persistent)
+        intervals = len(self.zeta.channels) * 4 if rate_limit else 0
+        return {
+            'ram': (self.STORAGE_THREAD_STACK_SIZE + self.K_THREAD_SIZE +
+                    2 * self.K_SEM_SIZE + self.K_MUTEX_SIZE + self.NVS_FS_SIZE +
+                    buffer + self.STORAGE_STATS_SIZE + intervals),
+            'rom': self.K_THREAD_DATA_SIZE + intervals,
+            'stack': self.STORAGE_THREAD_STACK_SIZE
+        }
+
+    def stats_footprint(self) -> dict:
+        """Computes the memory used by the runtime counters when the
+        stats are enabled: the channels and services counters.
+
+        :returns: Stats RAM and ROM or None with the stats disabled
+        :rtype: dict
+
+        """
+        if not self.zeta.config.stats:
+            return None
+        services = len(self.zeta.services)
+        return {
+            'ram': (len(self.zeta.channels) * self.CHANNEL_STATS_SIZE +
+                    services * self.SERVICE_STATS_SIZE),
+            'rom': 0
+        }
+
+    def trace_footprint(self) -> dict:
+        """Computes the memory used by the trace records buffer and its
+        counters when the trace is enabled.
+
+        :returns: Trace RAM and ROM or None with the trace disabled
+        :rtype: dict
+
+        """
+        if not self.zeta.config.trace:
+            return None
+        return {
+            'ram': max(1, self.zeta.config.trace_buffer_size) + 2 * 4,
+            'rom': 0
+        }
+
+    def as_dict(self) -> dict:
+        """Builds the JSON report content.
+
+        :returns: Footprint report
+        :rtype: dict
+
+        """
+        config = self.zeta.config
+        return {
+            'target': '32-bit estimate',
+            'channels': self.channels,
+            'services': self.services,
+            'dispatchers': self.dispatchers,
+            'shared': self.shared,
+            'storage': self.storage,
+            'stats': self.stats,
+            'trace': self.trace,
+            'total': {
+                'ram': self.ram,
+                'rom': self.rom
+            },
+            'budgets': {
+                'ram': config.ram_budget,
+                'rom': config.rom_budget
+            }
+        }
+
+    def text(self) -> str:
+        """Builds the text report content.
+
+        :returns: Footprint report
+        :rtype: str
+
+        """
+        lines = [
+            "Zeta static footprint (bytes, estimated for a 32-bit target)",
+            f"{'':<32} {'RAM':>8} {'ROM':>8} {'stack':>8}"
+        ]
+        for title, parts in (("Channels", self.channels),
+                             ("Services", self.services),
+                             ("Dispatchers", self.dispatchers)):
+            lines.append(title)
+            for part in parts:
+                lines.append(f"  {part['name']:<30} {part['ram']:>8}"
+                             f" {part['rom']:>8} {part.get('stack', ''):>8}")
+        lines.append(f"{'Bitmaps and pool padding':<32} {self.shared['ram']:>8}"
+                     f" {self.shared['rom']:>8}")
+        if self.storage:
+            lines.append(f"{'Storage':<32} {self.storage['ram']:>8}"
+                         f" {self.storage['rom']:>8}"
+                         f" {self.storage['stack']:>8}")
+        if self.stats:
+            lines.append(f"{'Stats':<32} {self.stats['ram']:>8}"
+                         f" {self.stats['rom']:>8}")
+        if self.trace:
+            lines.append(f"{'Trace':<32} {self.trace['ram']:>8}"
+                         f" {self.trace['rom']:>8}")
+        lines.append(f"{'Total':<32} {self.ram:>8} {self.rom:>8}")
+        for budget, value in self.budgets():
+            lines.append(f"{budget} budget {value['budget']}: "
+                         f"{'EXCEEDED' if value['exceeded'] else 'OK'}")
+        return "\n".join(lines) + "\n"
+
+    def budgets(self) -> list:
+        """Lists the configured budgets against the estimated totals.
+
+        :returns: Pairs of budget name and its state
+        :rtype: list
+
+        """
+        config = self.zeta.config
+        return [(name, {
+            'budget': budget,
+            'total': total,
+            'exceeded': total > budget
+        }) for name, budget, total in (("RAM", config.ram_budget, self.ram),
+                                       ("ROM", config.rom_budget, self.rom))
+                if budget]
+
+    def check_budgets(self) -> None:
+        """Checks the estimated totals against the configured budgets.
+
+        :returns: None
+        :rtype: None
+        :raise ZetaCLIError: Some budget was exceeded
+
+        """
+        exceeded = [
+            f"{name} {value['total']} > {value['budget']}"
+            for name, value in self.budgets() if value['exceeded']
+        ]
+        if exceeded:
+            raise ZetaCLIError(
+                f"Zeta footprint budget exceeded: {', '.join(exceeded)}",
+                EZTBUDGET)
+
+
+class ZetaManifest(object):
+    """Represents the content-hash manifest saved on the build folder
+    after a successful generation. It allows the gen command to skip
+    the whole generation when neither the YAML file, the templates nor
+    the ZetaCLI version and modules have changed since the last run.
+    """
+    templates_digests = {}
+    modules_digests = {}
+
+    def __init__(self,
+                 manifest_file: str,
+                 yamlfile: str,
+                 templates_dir: str = None,
+                 backend: str = "zephyr") -> None:
+        """ZetaManifest constructor.
+
+        :param manifest_file: Path of the manifest file
+        :param yamlfile: Zeta yaml file path used to generate the files
+        :param templates_dir: Templates folder used to generate the files
+        :param backend: Runtime backend the files are generated for
+        :returns: None
+        :rtype: None
+
+        """
+        self.manifest_file = manifest_file
+        self.yamlfile = yamlfile
+        self.templates_dir = templates_dir or ZETA_TEMPLATES_DIR
+        self.backend = backend
+        self.digest = self.compute_digest()
+
+    def compute_digest(self) -> str:
+        """Computes the hash of all the generation inputs: ZetaCLI
+        version and modules, backend, YAML file content and every template
+        file.
+
+        :returns: Hexadecimal digest
+        :rtype: str
+
+        """
+        digest = hashlib.sha256()
+        digest.update(__version__.encode())
+        digest.update(self.modules_digest().encode())
+        digest.update(self.backend.encode())
+        with open(self.yamlfile, 'rb') as yaml_file:
+            digest.update(yaml_file.read())
+        digest.update(self.templates_digest(self.templates_dir).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def files_digest(folder: Path, files: list, digests: dict) -> str:
+        """Computes the hash of the files names and contents. The result
+        is cached on digests by folder along with the files mtimes and
+        sizes, so the files are read again only when one of them changes.
+
+        :param folder: Folder the files names are relative to
+        :param files: Sorted files paths
+        :param digests: Cache of the digests by folder
+        :returns: Hexadecimal digest
+        :rtype: str
+
+        """
+        signature = []
+        for file in files:
+            stat = file.stat()
+            signature.append((str(file), stat.st_mtime_ns, stat.st_size))
+        cached = digests.get(folder)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        for file in files:
+            digest.update(str(file.relative_to(folder)).encode())
+            digest.update(file.read_bytes())
+        digests[folder] = (signature, digest.hexdigest())
+        return digests[folder][1]
+
+    @classmethod
+    def modules_digest(cls) -> str:
+        """Computes the hash of the ZetaCLI modules, the same ones listed
+        on the depfile, so a generator change is not reported as up to
+        date.
+
+        :returns: Hexadecimal digest
+        :rtype: str
+
+        """
+        modules_dir = Path(__file__).parent
+        return cls.files_digest(modules_dir,
+                                sorted(modules_dir.glob('*.py')),
+                                cls.modules_digests)
+
+    @classmethod
+    def templates_digest(cls, templates_dir: str) -> str:
+        """Computes the hash of every file of the templates folder.
+
+        :param templates_dir: Templates folder
+        :returns: Hexadecimal digest
+        :rtype: str
+
+        """
+        templates = Path(templates_dir)
+        return cls.files_digest(templates, [
+            template
+            for template in sorted(templates.rglob('*')) if template.is_file()
+        ], cls.templates_digests)
+
+    def inputs(self) -> list:
+        """Lists every file the generation depends on: the YAML file,
+        the template files and the ZetaCLI modules.
+
+        :returns: Absolute paths of the inputs
+        :rtype: list
+
+        """
+        inputs = [os.path.abspath(self.yamlfile)]
+        inputs += [
+            str(template.resolve())
+            for template in sorted(Path(self.templates_dir).rglob('*'))
+            if template.is_file()
+        ]
+        inputs += [
+            str(module.resolve())
+            for module in sorted(Path(__file__).parent.glob('*.py'))
+        ]
+        return inputs
+
+    def save_depfile(self, depfile: str, target: str = None) -> None:
+        """Writes a Makefile style depfile, as read by ninja and the
+        CMake DEPFILE option, with the generation inputs.
+
+        :param depfile: Path of the depfile
+        :param target: Target of the depfile rule, the manifest file by
+        default
+        :returns: None
+        :rtype: None
+
+        """
+        def escape(path):
+            return path.replace(' ', '\\ ').replace('#', '\\#').replace(
+                '$', '$$')
+
+        dependencies = " \\\n  ".join(map(escape, self.inputs()))
+        write_if_changed(
+            depfile,
+            f"{escape(target or self.manifest_file)}: \\\n  {dependencies}\n")
+
+    def is_up_to_date(self) -> bool:
+        """Checks if the saved manifest matches the current inputs and
+        all the outputs recorded on it still exist.
+
+        :returns: True if the generation can be skipped
+        :rtype: bool
+
+        """
+        try:
+            with open(self.manifest_file, 'r') as manifest:
+                content = json.load(manifest)
+        except (FileNotFoundError, ValueError):
+            return False
+        if content.get('digest') != self.digest:
+            return False
+        return all(os.path.exists(output) for output in content['outputs'])
+
+    def save(self, outputs: list) -> None:
+        """Writes the manifest file.
+
+        :param outputs: Files generated from the current inputs
+        :returns: None
+        :rtype: None
+
+        """
+        write_if_changed(
+            self.manifest_file,
+            json.dumps(
+                {
+                    'version': __version__,
+                    'backend': self.backend,
+                    'digest': self.digest,
+                    'inputs': self.inputs(),
+                    'outputs': outputs
+                },
+                indent=4))
+
+
+CMAKE_COMMENT_RE = re.compile(r'#[^\n]*')
+CMAKE_INCLUDE_RE = re.compile(
+    r'^[ \t]*include\(\s*zeta\.cmake\s+NO_POLICY_SCOPE\s*\)', re.M)
+CMAKE_SOURCES_RE = re.compile(r'^[ \t]*list\(\s*APPEND\s+SOURCES\b([^)]*)\)',
+                              re.M)
+CMAKE_ARGUMENT_RE = re.compile(r'"([^"]*)"|([^\s"]+)')
+SERVICE_INIT_RE = re.compile(r'^[ \t]*ZT_SERVICE_INIT\(\s*(\w+)\s*,', re.M)
+
+
+def line_of(text: str, position: int) -> int:
+    """Returns the line number, starting at 1, of position at text.
+
+    :param text: Source text
+    :param position: Character index at text
+    :returns: Line number
+    :rtype: int
+
+    """
+    return text.count("\n", 0, position) + 1
+
+
+_cmake_cache = {}
+
+
+def parse_cmake(cmake_file: Path) -> dict:
+    """Parses a CMake file once, caching the result while the file is
+    not modified. Commented lines are ignored.
+
+    :param cmake_file: CMake file path
+    :returns: None if the file does not exist, otherwise a dict with the
+        line where zeta.cmake is included (None when it is not) and the
+        set of source file names appended to SOURCES
+    :rtype: dict
+
+    """
+    try:
+        stat = cmake_file.stat()
+    except FileNotFoundError:
+        return None
+    key = (str(cmake_file.resolve()), stat.st_mtime_ns, stat.st_size)
+    parsed = _cmake_cache.get(key)
+    if parsed is None:
+        content = cmake_file.read_text()
+        include = CMAKE_INCLUDE_RE.search(content)
+        sources = set()
+        for source_list in CMAKE_SOURCES_RE.finditer(content):
+            for quoted, bare in CMAKE_ARGUMENT_RE.findall(
+                    CMAKE_COMMENT_RE.sub("", source_list.group(1))):
+                sources.add(Path(quoted or bare).name)
+        parsed = {
+            "include_line":
+            line_of(content, include.start()) if include else None,
+            "sources": sources
+        }
+        _cmake_cache[key] = parsed
+    return parsed
+
+
+def find_service_init(service_file: Path, service_name: str) -> int:
+    """Looks for the ZT_SERVICE_INIT of service_name at service_file,
+    ignoring the ones commented out by // or inside a /* */ block.
+
+    :param service_file: Service source file path
+    :param service_name: Service name
+    :returns: The line of the initialization, 0 if the service is not
+        initialized and -1 if the file does not exist
+    :rtype: int
+
+    """
+    try:
+        content = service_file.read_text()
+    except FileNotFoundError:
+        return -1
+    for service_init in SERVICE_INIT_RE.finditer(content):
+        position = service_init.start()
+        if (service_init.group(1) == service_name and
+                content.rfind("/*", 0, position) <= content.rfind(
+                    "*/", 0, position)):
+            return line_of(content, position)
+    return 0
+
+
+def check_project(project_dir: str = ".",
+                  src_dir: str = "./src/",
+                  zeta: Zeta = None,
+                  cache_dir: str = None,
+                  as_json: bool = False) -> tuple:
+    """Checks if the needed steps were made by user in order to Zeta
+    works properly on the project. The CMake files are parsed only once
+    and the service files are scanned concurrently.
+
+    :param project_dir: Project root folder
+    :param src_dir: Services source directory, relative to project_dir
+    :param zeta: Zeta object, loaded from the project zeta.yaml if None
+    :param cache_dir: Directory of the model cache used to load zeta.yaml
+    :param as_json: Report the checks as a JSON document
+    :returns: Exit code and the check report
+    :rtype: tuple
+
+    """
+    checks = []
+
+    def report(item: str, status: str, message: str, location=None):
+        checks.append({
+            "item": item,
+            "status": status,
+            "message": message,
+            "location": location
+        })
+
+    zeta_cmake = Path(project_dir, 'zeta.cmake')
+    zeta_cmake_path = zeta_cmake.resolve()
+    zeta_cmake_parsed = parse_cmake(zeta_cmake)
+    if zeta_cmake_parsed is not None:
+        report("zeta.cmake", "ok", "zeta.cmake found", str(zeta_cmake_path))
+    else:
+        report("zeta.cmake", "fail", "zeta.cmake not found")
+
+    zeta_yaml = Path(project_dir, 'zeta.yaml')
+    zeta_yaml_path = zeta_yaml.resolve()
+    if zeta_yaml.exists():
+        report("zeta.yaml", "ok", "zeta.yaml found", str(zeta_yaml_path))
+    else:
+        report("zeta.yaml", "fail", "zeta.yaml not found")
+
+    cmakelists = Path(project_dir, 'CMakeLists.txt')
+    cmakelists_path = cmakelists.resolve()
+    cmakelists_parsed = parse_cmake(cmakelists)
+    if cmakelists_parsed is None:
+        report("CMakeLists.txt", "fail", "CMakeLists.txt not found")
+    elif cmakelists_parsed["include_line"] is not None:
+        report("CMakeLists.txt", "ok", "zeta.cmake included properly",
+               f"{cmakelists_path}:{cmakelists_parsed['include_line']}")
+    else:
+        report(
+            "CMakeLists.txt", "fail",
+            "zeta.cmake NOT included properly into the CMakeLists.txt file")
+
+    if zeta is None:
+        try:
+            zeta = Zeta.load(zeta_yaml, cache_dir)
+        except (ZetaCLIError, FileNotFoundError):
+            pass
+    if zeta and zeta_cmake_parsed is not None:
+        service_files = [
+            Path(project_dir, src_dir, f"{service.name.lower()}.c")
+            for service in zeta.services
+        ]
+        with ThreadPoolExecutor(
+                max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+            init_lines = list(
+                executor.map(find_service_init, service_files,
+                             [service.name for service in zeta.services]))
+        for service, service_file, init_line in zip(zeta.services,
+                                                     service_files,
+                                                     init_lines):
+            service_path = service_file.resolve()
+            if init_line < 0:
+                report(service.name, "warning",
+                       f"Service {service.name} file was NOT found")
+                continue
+            if init_line > 0:
+                report(service.name, "ok",
+                       f"Service {service.name} was initialized properly",
+                       f"{service_path}:{init_line}")
+            else:
+                report(
+                    service.name, "fail", f"Service {service.name} was NOT"
+                    f" initialized properly into the {service_path.name}"
+                    " file")
+            if service_file.name in zeta_cmake_parsed["sources"]:
+                report(service.name, "ok", f"{service_file.name} added to"
+                       " be compiled at the zeta.cmake file")
+            elif (cmakelists_parsed is not None
+                  and service_file.name in cmakelists_parsed["sources"]):
+                report(service.name, "ok", f"{service_file.name} added to"
+                       " be compiled at the CMakeLists.txt file")
+            else:
+                report(service.name, "fail",
+                       f"{service_file.name} was NOT added to be compiled")
+    # A service file not found is reported as a warning, but the project
+    # is not ready to be built anyway
+    ecode = EZTCHECKFAILED if any(
+        check["status"] != "ok" for check in checks) else 0
+    if as_json:
+        return ecode, json.dumps({"ecode": ecode, "checks": checks}, indent=2)
+    status_colored = {
+        "ok": "\033[0;42m \033[1;97mOK \033[0m",
+        "fail": "\033[0;41m \033[1;97mFAIL \033[0m",
+        "warning": "\033[1;43m \033[1;97mWARNING \033[0m"
+    }
+    check_output = ["[ZETA]: Zeta project configuration check..."]
+    for check in checks:
+        location = f" ({check['location']})" if check["location"] else ""
+        check_output.append(f" {status_colored[check['status']]}"
+                            f" {check['message']}{location}")
+    return ecode, "\n".join(check_output)
+
+
+def check_generated(yamlfile: str,
+                    context: ZetaContext,
+                    zeta: Zeta = None,
+                    strict: bool = False) -> None:
+    """Checks the project of the yaml file after the generation and
+    logs the check report. The project check looks for the Zephyr build
+    files (zeta.cmake), so it is skipped on the other backends.
+
+    :param yamlfile: Zeta yaml file path
+    :param context: Generation context
+    :param zeta: Zeta object, loaded from the project zeta.yaml if None
+    :param strict: Fails when the project check fails
+    :returns: None
+    :rtype: None
+    :raise ZetaCLIError: Project check failed on strict mode
+
+    """
+    if context.backend != "zephyr":
+        return
+    project_dir = os.path.dirname(os.path.abspath(yamlfile))
+    ecode, check_output = check_project(project_dir,
+                                        zeta=zeta,
+                                        cache_dir=context.project_dir)
+    context.log(check_output)
+    if ecode and strict:
+        raise ZetaCLIError(
+            f"Zeta project check failed on {project_dir}, the files were"
+            f" generated", ecode)
+
+
+def generate(yamlfile: str,
+             build_dir: str = ".",
+             force: bool = False,
+             check: bool = True,
+             strict: bool = False,
+             context: ZetaContext = None,
+             depfile: str = None,
+             depfile_target: str = None) -> list:
+    """Generates all the internal files that represents Zeta system on
+    the build folder, without using the module globals or running
+    other processes.
+
+    :param yamlfile: Zeta yaml file path
+    :param build_dir: The folder where the files will be generated,
+    ignored when a context is given
+    :param force: Regenerates the files even if the inputs have not
+    changed
+    :param check: Checks the project of the yaml file after generating
+    :param strict: Fails with the check exit code when the project
+    check fails, the files are generated anyway
+    :param context: Generation context
+    :param depfile: Path of a depfile to be written with the generation
+    inputs, even when the generation is skipped
+    :param depfile_target: Target of the depfile rule, the manifest file
+    by default
+    :returns: Files written by this generation
+    :rtype: list
+    :raise ZetaCLIError: Yaml file not found or invalid or project check
+    failed on strict mode
+
+    """
+    if context is None:
+        context = ZetaContext(build_dir)
+    if not os.path.exists(yamlfile):
+        raise ZetaCLIError(f"Zeta YAML file {yamlfile} does not exist",
+                           EZTFILE)
+    os.makedirs(context.project_dir, exist_ok=True)
+    manifest = ZetaManifest(f"{context.project_dir}/zeta_manifest.json",
+                            yamlfile, context.templates_dir, context.backend)
+    if depfile:
+        manifest.save_depfile(depfile, depfile_target)
+    if not force and manifest.is_up_to_date():
+        context.log("[ZETA]: Zeta files are up to date, nothing to generate")
+        if check:
+            check_generated(yamlfile, context, strict=strict)
+        return []
+    context.log("[ZETA]: Creating Zeta project folder")
+    # The posix backend folder replaces the Zephyr module files by the
+    # pthread shim and a host CMake library
+    module_dir = "zeta" if context.backend == "zephyr" else context.backend
+    written, skipped = sync_tree(f"{context.templates_dir}/{module_dir}",
+                                 context.zeta_dir)
+    outputs = sorted(written + skipped)
+    zeta = Zeta.load(yamlfile, context.project_dir)
+    factories = [("zeta.h", ZetaHeader), ("zeta.c", ZetaSource),
+                 ("zeta.conf", ZetaConf)]
+    if zeta.config.trace:
+        factories.append(("trace metadata", ZetaTraceMetadata))
+    for name, factory in factories:
+        generated_file = factory(zeta, context)
+        generated_file.run()
+        outputs.append(generated_file.destination_file)
+        if generated_file.written:
+            written.append(generated_file.destination_file)
+        else:
+            skipped.append(generated_file.destination_file)
+        context.log(f"[ZETA]: Generating {name}..." +
+                    ("[OK]" if generated_file.written else "[UNCHANGED]"))
+    footprint = ZetaFootprint(zeta)
+    for report_file, content in (
+        (f"{context.project_dir}/zeta_footprint.txt", footprint.text()),
+        (f"{context.project_dir}/zeta_footprint.json",
+         json.dumps(footprint.as_dict(), indent=4))):
+        outputs.append(report_file)
+        if write_if_changed(report_file, content):
+            written.append(report_file)
+        else:
+            skipped.append(report_file)
+    context.log(f"[ZETA]: Footprint RAM {footprint.ram} bytes,"
+                f" ROM {footprint.rom} bytes (zeta_footprint.txt)")
+    footprint.check_budgets()
+    manifest.save(outputs)
+    context.log(f"[ZETA]: {len(written)} files written,"
+                f" {len(skipped)} unchanged")
+    if check:
+        check_generated(yamlfile, context, zeta, strict)
+    return written
+
+
+def expand_targets(specs: list) -> list:
+    """Expands the gen-many targets specifications. Each one is a yaml
+    file path or glob, optionally followed by ":build_dir". Without a
+    build folder, the build folder next to each yaml file is used, as
+    zeta.cmake does. A glob with a build folder generates each match on
+    a subfolder named after the yaml file folder.
+
+    :param specs: Targets specifications
+    :returns: Pairs of yaml file and build folder
+    :rtype: list
+    :raise ZetaCLIError: No yaml file found or build folder shared by
+    two targets
+
+    """
+    targets = []
+    for spec in specs:
+        pattern, _, build_dir = spec.partition(':')
+        is_glob = any(char in pattern for char in '*?[')
+        yamlfiles = sorted(glob.glob(pattern)) if is_glob else [pattern]
+        if not yamlfiles or not all(map(os.path.isfile, yamlfiles)):
+            raise ZetaCLIError(f"No Zeta YAML file found for {pattern}",
+                               EZTFILE)
+        for yamlfile in yamlfiles:
+            if not build_dir:
+                target_dir = os.path.join(os.path.dirname(yamlfile), "build")
+            elif is_glob:
+                target_dir = os.path.join(build_dir,
+                                          Path(yamlfile).parent.name)
+            else:
+                target_dir = build_dir
+            targets.append((yamlfile, target_dir))
+    build_dirs = [os.path.realpath(target_dir) for _, target_dir in targets]
+    for build_dir in build_dirs:
+        if build_dirs.count(build_dir) > 1:
+            raise ZetaCLIError(
+                f"The build folder {build_dir} is used by more than one"
+                f" target", EZTFILE)
+    return targets
+
+
+def generate_target(target: tuple, force: bool = False,
+                    strict: bool = False) -> dict:
+    """Generates one gen-many target, catching its errors so they can
+    be reported with the other targets results.
+
+    :param target: Pair of yaml file and build folder
+    :param force: Regenerates the files even if the inputs have not
+    changed
+    :param strict: Fails the target when its project check fails
+    :returns: Target result with the written files, elapsed time and
+    error
+    :rtype: dict
+
+    """
+    yamlfile, build_dir = target
+    result = {'yamlfile': yamlfile, 'build_dir': build_dir, 'written': []}
+    start = time.perf_counter()
+    try:
+        result['written'] = generate(yamlfile,
+                                     build_dir,
+                                     force,
+                                     strict=strict)
+    except ZetaCLIError as zterr:
+        result['error'] = (zterr.message, zterr.errcode)
+    except Exception as err:
+        result['error'] = (f"{type(err).__name__}: {err}", EZTUNEXP)
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def generate_many(targets: list,
+                  jobs: int = None,
+                  force: bool = False,
+                  strict: bool = False) -> Iterator[dict]:
+    """Generates several targets across a process pool. The templates
+    are compiled before the pool is created, so the forked workers
+    inherit them instead of reading the templates again.
+
+    :param targets: Pairs of yaml file and build folder
+    :param jobs: Number of processes, the CPU count by default
+    :param force: Regenerates the files even if the inputs have not
+    changed
+    :param strict: Fails the targets whose project check fails
+    :returns: Targets results, in the targets order
+    :rtype: Iterator[dict]
+
+    """
+    context = ZetaContext()
+    TemplateRegistry.preload(context.templates_dir)
+    ZetaManifest.templates_digest(context.templates_dir)
+    jobs = min(jobs or os.cpu_count() or 1, len(targets))
+    if jobs <= 1:
+        for target in targets:
+            yield generate_target(target, force, strict)
+        return
+    try:
+        mp_context = multiprocessing.get_context('fork')
+    except ValueError:
+        mp_context = None
+    with ProcessPoolExecutor(jobs, mp_context=mp_context) as executor:
+        yield from executor.map(generate_target, targets,
+                                [force] * len(targets),
+                                [strict] * len(targets))
+
+
 class ZetaCLI(object):
     """Represents the ZetaCLI and has all the callbacks that will be
     called when the user type zeta on the terminal.
@@ -549,17 +2477,19 @@ class ZetaCLI(object):
             (f"zeta <command> [<args>]\r\nCommands\r\n"
              f"  init - for creating the need files.\r\n"
              f"  gen - for generating the zeta code based on the zeta.yaml file.\r\n"
+             f"  gen-many - for generating the zeta code of several zeta.yaml files in parallel.\r\n"
              f"  check -  for checking the needed configuration and initialization of zeta.\r\n"
              f"  services - for generating the code-template based for services defined on the zeta.yaml file.\r\n"
              f"  version - for getting the current ZetaCLI version."))
         parser.add_argument('command', help='Subcommand to run')
         args = parser.parse_args(sys.argv[1:2])
-        if not hasattr(self, args.command):
+        command = args.command.replace('-', '_')
+        if command.startswith('_') or not hasattr(self, command):
             print('Unrecognized command')
             parser.print_help()
             exit(1)
         # use dispatch pattern to invoke method with same name
-        exit(getattr(self, args.command)())
+        exit(getattr(self, command)())
 
     def init(self) -> int:
         """Called when the user type "zeta init" and is responsible for
@@ -581,15 +2511,15 @@ class ZetaCLI(object):
         global PROJECT_DIR
         PROJECT_DIR = project_dir
         global ZETA_TEMPLATES_DIR
-        ZETA_TEMPLATES_DIR = f"{ZETA_MODULE_DIR}/templates"
+        ZETA_TEMPLATES_DIR = TemplateRegistry.default_dir()
 
         try:
             zeta_yaml_path = Path(f'{PROJECT_DIR}/zeta.yaml')
             if not zeta_yaml_path.exists():
                 with open(f'{ZETA_TEMPLATES_DIR}/zeta.template.yaml',
                           'r') as header_template:
-                    with zeta_yaml_path.open(mode='w') as zeta_yaml:
-                        zeta_yaml.write(header_template.read())
+                    write_if_changed(str(zeta_yaml_path),
+                                     header_template.read())
                 print("[ZETA]: Generating yaml file on", project_dir)
         except FileNotFoundError:
             raise ZetaCLIError(
@@ -598,14 +2528,14 @@ class ZetaCLI(object):
         zeta = None
         zeta_yaml_path = Path('./zeta.yaml')
         if zeta_yaml_path.exists():
-            with zeta_yaml_path.open() as zeta_yaml:
-                zeta = Zeta(zeta_yaml)
+            zeta = Zeta.load(zeta_yaml_path)
         try:
             cmake_file = FileFactory(".", "zeta.template.cmake", zeta,
                                      "zeta.cmake")
             cmake_file.substitutions['services_sources'] = ""
             cmake_file.run()
-            print("[ZETA]: Generating cmake file on", project_dir)
+            print("[ZETA]: Generating cmake file on", project_dir,
+                  "[OK]" if cmake_file.written else "[UNCHANGED]")
         except FileNotFoundError:
             raise ZetaCLIError(
                 "Failed to generate service files. Error opening and creating zeta.cmake",
@@ -633,14 +2563,10 @@ class ZetaCLI(object):
         :rtype: int
 
         """
-        ecode = 0
-        OK_COLORED = "\033[0;42m \033[1;97mOK \033[0m"
-        FAIL_COLORED = "\033[0;41m \033[1;97mFAIL \033[0m"
-        WARNING_COLORED = "\033[1;43m \033[1;97mWARNING \033[0m"
         parser = argparse.ArgumentParser(
             description=
             '''Run this command to check all the zeta configuration''',
-            usage='zeta check')
+            usage='zeta check [-s SRC_DIR] [-b BUILD_DIR] [--json]')
         parser.add_argument(
             '-s',
             '--src_dir',
@@ -648,126 +2574,22 @@ class ZetaCLI(object):
             default="./src/",
             help='Services source directory',
         )
+        parser.add_argument(
+            '-b',
+            '--build_dir',
+            type=str,
+            default="./build",
+            help='Build folder with the model cache (default: ./build)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the check report as JSON',
+        )
         args = parser.parse_args(sys.argv[2:])
-        zeta_cmake = Path('./zeta.cmake')
-        zeta_cmake_path = zeta_cmake.resolve()
-        if zeta_cmake.exists():
-            zeta_cmake_output = (
-                f" {OK_COLORED} zeta.cmake found ({zeta_cmake_path})")
-        else:
-            ecode = EZTCHECKFAILED
-            zeta_cmake_output = f" {FAIL_COLORED} zeta.cmake not found"
-
-        zeta_yaml = Path('./zeta.yaml')
-        zeta_yaml_path = zeta_yaml.resolve()
-        if zeta_yaml.exists():
-            zeta_yaml_output = (
-                f" {OK_COLORED} zeta.yaml found ({zeta_yaml_path})")
-        else:
-            ecode = EZTCHECKFAILED
-            zeta_yaml_output = f" {FAIL_COLORED} zeta.yaml not found"
-
-        cmakelists = Path('./CMakeLists.txt')
-        cmakelists_path = cmakelists.resolve()
-        if cmakelists.exists():
-            with cmakelists.open() as cmakelists_file:
-                for line, line_content in enumerate(
-                        cmakelists_file.readlines()):
-                    # @todo: check it with an regex. Maybe the line is comment
-                    # out and it will not be true that it is setup ok
-                    if "include(zeta.cmake NO_POLICY_SCOPE)" in line_content:
-                        cmakelists_output = (
-                            f" {OK_COLORED} zeta.cmake included properly"
-                            f" ({cmakelists_path}:{line + 1})")
-                        break
-                else:
-                    ecode = EZTCHECKFAILED
-                    cmakelists_output = (
-                        f" {FAIL_COLORED} zeta.cmake NOT included properly"
-                        " into the CMakeLists.txt file")
-        services_output = ""
-        services_output_list = []
-
-        zeta = None
-        try:
-            with open(f'{PROJECT_DIR}/zeta.yaml', 'r') as f:
-                zeta = Zeta(f)
-        except ZetaCLIError as zerr:
-            #  print("[ZETA]: Could not found zeta.yaml file. Maybe it is not a zeta project.")
-            pass
-        if zeta and zeta_cmake.exists():
-            for service_info in zeta.services:
-                service = Path(f'{args.src_dir}',
-                               f"{service_info.name.lower()}.c")
-                service_path = service.resolve()
-                ok_hit = 0
-                service_init_output = (
-                    f" {FAIL_COLORED} Service"
-                    f" {service_info.name} was NOT initialized properly into"
-                    f" the {service_path.name} file")
-                service_included_output = (
-                    f"\n {FAIL_COLORED} Service {service_info.name} was NOT"
-                    " added to be compiled into the CMakeLists.txt file")
-                if service.exists():
-                    with service.open() as service_file:
-                        for line, line_content in enumerate(
-                                service_file.readlines()):
-                            # @todo: check it with an regex. Maybe the line is
-                            # comment out and it will not be true that it is setup ok
-                            if f"ZT_SERVICE_INIT({service_info.name}," in line_content:
-                                ok_hit += 1
-                                service_init_output = (
-                                    f" {OK_COLORED} Service "
-                                    f"{service_info.name} was initialized"
-                                    f" properly ({service_path}:{line + 1})")
-                                break
-                    with zeta_cmake.open() as zeta_cmake_file:
-                        sources = re.search(
-                            r'list\(APPEND SOURCES(\s*\n?\".*\"\s*\n?)+\)',
-                            zeta_cmake_file.read())
-                        if sources and f"{service_info.name.lower()}.c" in sources.group(
-                        ):
-                            ok_hit += 1
-                            service_included_output = (
-                                f"\n {OK_COLORED}"
-                                f" {service_info.name.lower()}.c added to be"
-                                f" compiled at the zeta.cmake file")
-                        else:
-                            cmakelists = Path('./CMakeLists.txt')
-                            cmakelists_path = cmakelists.resolve()
-                            if cmakelists.exists():
-                                with cmakelists.open() as cmakelists_file:
-                                    sources = re.search(
-                                        r'list\(APPEND SOURCES(\s*\n?\".*\"\s*\n?)+\)',
-                                        cmakelists_file.read())
-                                    if sources and f"{service_info.name.lower()}.c" in sources.group(
-                                    ):
-                                        ok_hit += 1
-                                        service_included_output = (
-                                            f"\n {OK_COLORED}"
-                                            " {service_info.name.lower()}.c"
-                                            " added to be compiled at the"
-                                            " CMakeLists.txt file")
-                                    else:
-                                        service_included_output = (
-                                            f"\n {FAIL_COLORED}"
-                                            " {service_info.name.lower()}.c"
-                                            " was NOT added to be compiled")
-                else:
-                    service_init_output = (
-                        f" {WARNING_COLORED} Service"
-                        f" {service_info.name} file was NOT found")
-                    service_included_output = ""
-                ecode = 0 if ((ecode != EZTCHECKFAILED) and
-                              (ok_hit == 2)) else EZTCHECKFAILED
-                services_output_list.append(
-                    f"""{service_init_output}{service_included_output}""")
-        services_output = "\n" + "\n".join(services_output_list)
-        check_output = textwrap.dedent(f'''\
-                [ZETA]: Zeta project configuration check...
-                {zeta_cmake_output}
-                {zeta_yaml_output}
-                {cmakelists_output}''') + services_output
+        context = ZetaContext(args.build_dir)
+        ecode, check_output = check_project(".", args.src_dir, None,
+                                            context.project_dir, args.json)
         print(check_output)
         return ecode
 
@@ -782,7 +2604,7 @@ class ZetaCLI(object):
         """
         parser = argparse.ArgumentParser(
             description='Verify or create services files on the src folder',
-            usage='zeta services [-g] <src dir>')
+            usage='zeta services [-g] [-b build_dir] <src dir>')
         parser.add_argument(
             '-g',
             '--generate',
@@ -797,6 +2619,13 @@ class ZetaCLI(object):
             default="./src/",
             help='Services source directory',
         )
+        parser.add_argument(
+            '-b',
+            '--build_dir',
+            type=str,
+            default="./build",
+            help='Build folder with the model cache (default: ./build)',
+        )
         project_dir = "."
         args = parser.parse_args(sys.argv[2:])
         global ZETA_MODULE_DIR
@@ -804,11 +2633,11 @@ class ZetaCLI(object):
         global PROJECT_DIR
         PROJECT_DIR = project_dir
         global ZETA_TEMPLATES_DIR
-        ZETA_TEMPLATES_DIR = f"{ZETA_MODULE_DIR}/templates"
+        ZETA_TEMPLATES_DIR = TemplateRegistry.default_dir()
         zeta = None
         try:
-            with open(f'{PROJECT_DIR}/zeta.yaml', 'r') as f:
-                zeta = Zeta(f)
+            zeta = Zeta.load(f'{PROJECT_DIR}/zeta.yaml',
+                             ZetaContext(args.build_dir).project_dir)
         except FileNotFoundError:
             raise ZetaCLIError("Error opening zeta.yaml file, file not found",
                                EZTFILE)
@@ -849,7 +2678,8 @@ class ZetaCLI(object):
                         " ".join(services_sources))
                 cmake_file.run()
                 print(
-                    "[ZETA]: Inject services sources into the zeta.cmake file")
+                    "[ZETA]: Inject services sources into the zeta.cmake file",
+                    "[OK]" if cmake_file.written else "[UNCHANGED]")
             except FileNotFoundError:
                 raise ZetaCLIError(
                     "Failed to generate service files. Error opening and creating zeta.cmake",
@@ -866,7 +2696,8 @@ class ZetaCLI(object):
         """
         parser = argparse.ArgumentParser(
             description='Generate zeta files on the build folder',
-            usage='zeta gen [-p] yamlfile')
+            usage=('zeta gen [-b build_dir] [-f] [-s] [--backend backend]'
+                   ' [--depfile file [--depfile-target target]] yamlfile'))
         # prefixing the argument with -- means it's optional
         parser.add_argument(
             '-b',
@@ -874,60 +2705,109 @@ class ZetaCLI(object):
             type=str,
             help='The project root folder where the files will be generated',
             default=".")
+        parser.add_argument(
+            '-f',
+            '--force',
+            action='store_true',
+            help='Regenerate the files even if the inputs have not changed')
+        parser.add_argument(
+            '-s',
+            '--strict',
+            action='store_true',
+            help='Fail with the check exit code when the project check fails')
+        parser.add_argument(
+            '--backend',
+            choices=ZETA_BACKENDS,
+            default="zephyr",
+            help=('Runtime backend: zephyr or posix, a pthread shim to build'
+                  ' and load-test the files as a host program'))
+        parser.add_argument(
+            '--depfile',
+            type=str,
+            help='Write a Makefile style depfile with the generation inputs')
+        parser.add_argument(
+            '--depfile-target',
+            type=str,
+            help='Target of the depfile rule (default: the manifest file)')
         parser.add_argument(
             'yamlfile',
             help='Yaml that must be read in order to mount system.')
         args = parser.parse_args(sys.argv[2:])
         if os.path.exists(args.yamlfile):
+            context = ZetaContext(args.build_dir,
+                                  verbose=True,
+                                  backend=args.backend)
             print("[ZETA]: Current dir =", os.getcwd())
-            global ZETA_MODULE_DIR
-            ZETA_MODULE_DIR = os.path.dirname(os.path.realpath(__file__))
-            print("[ZETA]: ZETA_MODULE_DIR =", ZETA_MODULE_DIR)
-            global PROJECT_DIR
-            PROJECT_DIR = args.build_dir
-            print("[ZETA]: PROJECT_DIR =", PROJECT_DIR)
-            global ZETA_DIR
-            ZETA_DIR = f"{PROJECT_DIR}/zeta"
-            print("[ZETA]: ZETA_DIR = ", ZETA_DIR)
-            global ZETA_SRC_DIR
-            ZETA_SRC_DIR = f"{PROJECT_DIR}/zeta/src"
-            print("[ZETA]: ZETA_SRC_DIR =", ZETA_SRC_DIR)
-            global ZETA_INCLUDE_DIR
-            ZETA_INCLUDE_DIR = f"{PROJECT_DIR}/zeta/include"
-            print("[ZETA]: ZETA_INCLUDE_DIR =", ZETA_INCLUDE_DIR)
-            global ZETA_TEMPLATES_DIR
-            ZETA_TEMPLATES_DIR = f"{ZETA_MODULE_DIR}/templates"
-            print("[ZETA]: ZETA_TEMPLATES_DIR =", ZETA_TEMPLATES_DIR)
-
-            try:
-                os.makedirs(PROJECT_DIR)
-            except FileExistsError:
-                pass
-
-            try:
-                print("[ZETA]: Creating Zeta project folder")
-                shutil.copytree(f"{ZETA_TEMPLATES_DIR}/zeta",
-                                f"{PROJECT_DIR}/zeta")
-            except FileExistsError:
-                pass
-
-            YamlRefLoader.add_constructor('!ref', YamlRefLoader.ref)
-            with open(args.yamlfile, 'r') as f:
-                zeta = Zeta(f)
-                print("[ZETA]: Generating zeta.h...", end="")
-                ZetaHeader(zeta).run()
-                print("[OK]")
-                print("[ZETA]: Generating zeta.c...", end="")
-                ZetaSource(zeta).run()
-                print("[OK]")
-                print("[ZETA]: Generating zeta.conf...", end="")
-                ZetaConf(zeta).run()
-                print("[OK]")
-            subprocess.run("zeta check", shell=True)
+            print("[ZETA]: ZETA_MODULE_DIR =", context.module_dir)
+            print("[ZETA]: PROJECT_DIR =", context.project_dir)
+            print("[ZETA]: ZETA_DIR = ", context.zeta_dir)
+            print("[ZETA]: ZETA_SRC_DIR =", context.src_dir)
+            print("[ZETA]: ZETA_INCLUDE_DIR =", context.include_dir)
+            print("[ZETA]: ZETA_TEMPLATES_DIR =", context.templates_dir)
+            print("[ZETA]: ZETA_BACKEND =", context.backend)
+            generate(args.yamlfile,
+                     force=args.force,
+                     strict=args.strict,
+                     context=context,
+                     depfile=args.depfile,
+                     depfile_target=args.depfile_target)
         else:
             print("[ZETA]: Error. Zeta YAML file does not exist!")
         return 0
 
+    def gen_many(self) -> int:
+        """Called when the user type "zeta gen-many" and is responsible
+        for generating the Zeta files of several targets in parallel.
+
+        :returns: Exit code
+        :rtype: int
+        :raise ZetaCLIError: Invalid targets
+
+        """
+        parser = argparse.ArgumentParser(
+            description='Generate zeta files of several yaml files',
+            usage='zeta gen-many [-j jobs] [-f] [-s] target [target ...]')
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            type=int,
+            help='Number of parallel processes (default: CPU count)')
+        parser.add_argument(
+            '-f',
+            '--force',
+            action='store_true',
+            help='Regenerate the files even if the inputs have not changed')
+        parser.add_argument(
+            '-s',
+            '--strict',
+            action='store_true',
+            help='Fail the targets whose project check fails')
+        parser.add_argument(
+            'targets',
+            nargs='+',
+            help=('Yaml file or glob, optionally followed by :build_dir'
+                  ' (default: the build folder next to the yaml file)'))
+        args = parser.parse_args(sys.argv[2:])
+        targets = expand_targets(args.targets)
+        print(f"[ZETA]: Generating {len(targets)} targets")
+        ecode = 0
+        start = time.perf_counter()
+        for result in generate_many(targets, args.jobs, args.force,
+                                    args.strict):
+            if 'error' in result:
+                message, errcode = result['error']
+                status = f"[FAIL] {message}"
+                ecode = ecode or errcode
+            elif result['written']:
+                status = f"[OK] {len(result['written'])} files written"
+            else:
+                status = "[UNCHANGED]"
+            print(f"[ZETA]: {result['yamlfile']} -> {result['build_dir']}"
+                  f" {status} ({result['elapsed'] * 1e3:.1f} ms)")
+        print(f"[ZETA]: {len(targets)} targets generated in"
+              f" {(time.perf_counter() - start) * 1e3:.1f} ms")
+        return ecode
+
 
 def run():
     try:
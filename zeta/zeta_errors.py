@@ -1,6 +1,9 @@
 EZTFILE = 1  # Error related a file and directory name
 EZTFIELD = 2
 EZTCHECKFAILED = 3
+EZTINVREF = 4  # Reference to a nonexistent channel
+EZTTEMPLATE = 5  # Invalid template or placeholder without substitution
+EZTBUDGET = 6  # Estimated footprint exceeds a configured budget
 EZTUNEXP = 10
 
 